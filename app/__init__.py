@@ -1,4 +1,6 @@
+import atexit
 import csv
+import gc
 import os
 from collections import defaultdict
 from datetime import datetime
@@ -6,24 +8,27 @@ from functools import wraps
 
 import flask_restful as restful
 import requests
-import json, yaml
+import json
 from flask import Flask, redirect, Blueprint, g, request, jsonify, render_template
-from flask_compress import Compress
+from gevent import monkey
 from redislite import Redis
 from app.common.auth import AuthKey
+from app.common.compression import ResponseCompressor
 from app.common.signals import IP2Org, MixPanelStore, esStore
 from app.common.datatypes import DataTypes
 from app.common.proxy import ProxyHandler
 from app.common.scoring_conf import DataSourceScoring
 from config import config, Config
 from elasticsearch import Elasticsearch
-from app.common.elasticsearchclient import esQuery, InternalCache
+from app.common.elasticsearchclient import esQuery, InternalCache, UWSGICache
+from app.common import get_tissue_map
+from app.common.ipresolver import IPResolver
+from app.common.knowndrug import KnownDrugStore
+from app.common.openapi import load_openapi
+from app.common.utils import StartupTimer
 from api import create_api
 from werkzeug.contrib.cache import FileSystemCache
 from app.common.signals import LogException
-from ipaddr import IPNetwork
-from mixpanel import Mixpanel
-from mixpanel_async import AsyncBufferedConsumer
 
 # from flask.ext.cors import CORS
 # from flask_limiter import Limiter
@@ -59,7 +64,47 @@ def do_not_cache(request):
     return False
 
 
+def preload_reference_data(app):
+    '''
+    loads what is still loaded lazily on first use, so that under uwsgi it is
+    built once in the master and inherited by every forked worker, which then
+    starts ready to serve. The collection afterwards avoids forking garbage
+    that the first collection in each worker would copy
+    '''
+    tissue_map = get_tissue_map()
+    if tissue_map is None:
+        app.logger.warning('tissue map not available, tissue data will not be injected')
+    gc.collect()
+
+
+def restore_cache_snapshot(app, cache):
+    '''loads the last snapshot of the internal cache in a background thread, so the app serves meanwhile'''
+    def restore():
+        try:
+            restored = cache.restore()
+            if restored is not None:
+                app.logger.info('%i keys restored in the internal cache from %s' % (restored, cache.get_snapshot_path()))
+        except Exception as e:
+            app.logger.warning('cannot restore the internal cache snapshot: %s' % str(e))
+    # a real thread, also when gevent patched the thread module, so the uwsgi master runs it
+    start_new_thread = monkey.get_original('thread', 'start_new_thread')
+    start_new_thread(restore, ())
+
+
+def snapshot_cache_on_exit(app, cache, pid):
+    '''saves the internal cache at exit, only in the process that created the app (the uwsgi master)'''
+    if os.getpid() != pid:
+        return
+    try:
+        saved = cache.snapshot()
+        if saved is not None:
+            app.logger.info('%i keys of the internal cache saved in %s' % (saved, cache.get_snapshot_path()))
+    except Exception as e:
+        app.logger.warning('cannot save the internal cache snapshot: %s' % str(e))
+
+
 def create_app(config_name):
+    timer = StartupTimer()
     app = Flask(__name__, static_url_path='')
     # This first loads the configuration from eg. config['development'] which corresponds to the DevelopmentConfig class in the config.py
     app.config.from_object(config[config_name])
@@ -79,6 +124,7 @@ def create_app(config_name):
     api_version_minor = app.config['API_VERSION_MINOR']
 
 
+    timer.mark('config')
     app.logger.info('looking for elasticsearch at: %s' % app.config['ELASTICSEARCH_URL'])
 
 
@@ -90,7 +136,22 @@ def create_app(config_name):
     app.extensions['redis-service'].config_set('appendonly', 'no')
     icache = InternalCache(app.extensions['redis-service'],
                            str(api_version_minor))
+    if app.config['UWSGI_CACHE']:
+        try:
+            icache = UWSGICache(app.config['UWSGI_CACHE'],
+                                str(api_version_minor),
+                                max_item_size=app.config['UWSGI_CACHE_MAX_ITEM_SIZE'])
+            app.logger.info('internal cache shared by the workers in uwsgi cache %s' % app.config['UWSGI_CACHE'])
+        except (ImportError, ValueError) as e:
+            app.logger.info('internal cache in redis, uwsgi cache not available: %s' % str(e))
+    # the uwsgi cache is persisted by uwsgi itself, with the store option of --cache2
+    if not isinstance(icache, UWSGICache):
+        if app.config['CACHE_SNAPSHOT_RESTORE_ON_START']:
+            restore_cache_snapshot(app, icache)
+        if app.config['CACHE_SNAPSHOT_ON_EXIT']:
+            atexit.register(snapshot_cache_on_exit, app, icache, os.getpid())
     ip2org = IP2Org(icache)
+    timer.mark('redis')
     if app.config['ELASTICSEARCH_URL']:
         es = Elasticsearch(app.config['ELASTICSEARCH_URL'],
                            # # sniff before doing anything
@@ -119,6 +180,7 @@ def create_app(config_name):
         index_association=app.config['ELASTICSEARCH_DATA_ASSOCIATION_INDEX_NAME'],
         index_search=app.config['ELASTICSEARCH_DATA_SEARCH_INDEX_NAME'],
         index_relation=app.config['ELASTICSEARCH_DATA_RELATION_INDEX_NAME'],
+        index_uniprot_kw_lookup=app.config['ELASTICSEARCH_UNIPROT_KW_LOOKUP_INDEX_NAME'],
         docname_data=app.config['ELASTICSEARCH_DATA_DOC_NAME'],
         docname_drug=app.config['ELASTICSEARCH_DRUG_DOC_NAME'],
         docname_efo=app.config['ELASTICSEARCH_EFO_LABEL_DOC_NAME'],
@@ -132,8 +194,16 @@ def create_app(config_name):
         # docname_search_disease=app.config['ELASTICSEARCH_DATA_SEARCH_DISEASE_DOC_NAME'],
         docname_relation=app.config['ELASTICSEARCH_DATA_RELATION_DOC_NAME'],
         log_level=app.logger.getEffectiveLevel(),
-        cache=icache
+        cache=icache,
+        known_drug_store=KnownDrugStore.load()
         )
+    timer.mark('elasticsearch handlers')
+    '''load the indexes precomputed from elasticsearch before the workers are forked'''
+    try:
+        app.extensions['esquery'].load_reference_indexes(build=app.config['REFERENCE_INDEXES_BUILD_ON_START'])
+    except Exception as e:
+        app.logger.warning('cannot load reference indexes, falling back to elasticsearch: %s' % str(e))
+    timer.mark('reference indexes')
 
     app.extensions['es_access_store'] = esStore(es,
         eventlog_index=app.config['ELASTICSEARCH_LOG_EVENT_INDEX_NAME'],
@@ -142,6 +212,8 @@ def create_app(config_name):
 
     '''mixpanel handlers'''
     if Config.MIXPANEL_TOKEN:
+        from mixpanel import Mixpanel
+        from mixpanel_async import AsyncBufferedConsumer
         mp = Mixpanel(Config.MIXPANEL_TOKEN, consumer=AsyncBufferedConsumer())
         app.extensions['mixpanel']= mp
         app.extensions['mp_access_store'] = MixPanelStore(
@@ -167,25 +239,22 @@ def create_app(config_name):
     app.cache = FileSystemCache('/tmp/cttv-rest-api-cache', threshold=100000, default_timeout=60*60, mode=777)
 
     '''load ip name resolution'''
-    ip_resolver = defaultdict(lambda: "PUBLIC")
+    ip_resolver = IPResolver()
     ip_list_file = app.config['IP_RESOLVER_LIST_PATH']
     if not os.path.exists(ip_list_file):
         ip_list_file = '../' + ip_list_file
     if os.path.exists(ip_list_file):
-        with open(ip_list_file) as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                net = IPNetwork(row['ip'])
-                ip_resolver[net] = row['org']
+        ip_resolver = IPResolver.from_file(ip_list_file)
     else:
         app.logger.warning('cannot find IP list for IP resolver. All traffic will be logged as PUBLIC')
     app.config['IP_RESOLVER'] = ip_resolver
+    timer.mark('ip resolver')
 
 
 
     '''compress http response'''
-    compress = Compress()
-    compress.init_app(app)
+    compress = ResponseCompressor()
+    compress.init_app(app, cache=icache)
 
     latest_blueprint = Blueprint('latest', __name__)
     current_version_blueprint = Blueprint(str(api_version), __name__)
@@ -204,6 +273,7 @@ def create_app(config_name):
     create_api(latest_blueprint, api_version, specpath)
     create_api(current_version_blueprint, api_version, specpath)
     create_api(current_minor_version_blueprint, api_version_minor, specpath)
+    timer.mark('blueprints')
 
     # app.register_blueprint(latest_blueprint, url_prefix='/latest/platform')
     app.register_blueprint(current_version_blueprint, url_prefix='/v'+str(api_version) + '/platform')
@@ -211,21 +281,20 @@ def create_app(config_name):
 
 
     '''serve the static docs'''
-    openapi_def = yaml.load(file('app/static/openapi.template.yaml', 'r'))
-    app.logger.info('parsing swagger from app/static/openapi.template.yaml')
-
-    #inject the description into the docs
-    with open("api-description.md", "r") as f:
-        desc = f.read()
-    openapi_def['info']['description'] = desc
+    openapi_def, openapi_source = load_openapi()
+    app.logger.info('parsing swagger from %s' % openapi_source)
     openapi_def['basePath'] = '/v%s' % str(api_version)
+    # serialised once, workers share the string instead of the parsed definition
+    openapi_json = json.dumps(openapi_def, indent=2)
+    del openapi_def
     @app.route('/v%s/platform/swagger' % str(api_version))
     def serve_swagger(apiversion=api_version):
-        return jsonify(openapi_def)
+        return app.response_class(openapi_json, mimetype='application/json')
 
     @app.route('/v%s/platform/docs/swagger-ui' % str(api_version))
     def render_swaggerui(apiversion=api_version):
         return render_template('swaggerui.html',api_version=apiversion)
+    timer.mark('openapi')
 
     '''pre and post-request'''
 
@@ -260,6 +329,11 @@ def create_app(config_name):
 
     # Override the HTTP exception handler.
     app.handle_http_exception = get_http_exception_handler(app)
+    timer.mark('request handlers')
+    preload_reference_data(app)
+    timer.mark('preload')
+    app.extensions['startup_phases'] = timer.phases
+    app.logger.info('app created in %.3fs' % timer.total)
     return app
 
 
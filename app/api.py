@@ -2,7 +2,6 @@ from app.resources.enrichment import EnrichmentTargets
 from app.resources.relation import  Relations
 from app.resources.utils import LogEvent
 from config import Config
-from app.common import load_tissue_map
 
 __author__ = 'andreap'
 
@@ -12,7 +11,6 @@ from flask_restful import Api
 def create_api(app, api_version = '0.0', specpath = '' ):
     # app.config['CORS_HEADERS'] = 'Content-Type,Auth-Token'
 
-    Config.ES_TISSUE_MAP = load_tissue_map()
     'custom errors for flask-restful'
     # errors = {'SignatureExpired': {
     #     'message': "Authentication expired.",
@@ -35,7 +33,7 @@ def create_api(app, api_version = '0.0', specpath = '' ):
     from app.resources.datasets import DatasetList, Datasets
     from app.resources.proxy import ProxyEnsembl, ProxyGXA, ProxyPDB, ProxyGeneric
     from app.resources.cache import ClearCache
-    from app.resources.utils import Ping, Version
+    from app.resources.utils import Ping, Version, CompressionStats
     from app.resources.relation import RelationTargetSingle, RelationDiseaseSingle
     from app.resources.stats import Stats
     from app.resources.metrics import Metrics
@@ -102,6 +100,8 @@ def create_api(app, api_version = '0.0', specpath = '' ):
                      '/public/utils/metrics')
     api.add_resource(LogEvent,
                      '/private/utils/logevent')
+    api.add_resource(CompressionStats,
+                     '/private/utils/compression')
     api.add_resource(RelationTargetSingle,
                      '/private/relation/target/<string:target_id>')
     api.add_resource(Relations,
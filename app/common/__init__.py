@@ -3,10 +3,13 @@ import sys
 import io
 import json
 import csv
+import os
+import time
 from contextlib import contextmanager
 import tempfile as tmp
 import requests as r
 from config import Config
+from app.common.snapshots import snapshot_path
 import flask_restful as restful
 
 __author__ = 'andreap'
@@ -43,14 +46,20 @@ def url_to_tmpfile(url, delete=True, *args, **kwargs):
         f.close()
 
 
-def load_tissue_map():
+TISSUE_MAP_CACHE = 'tissue_map.json'
+_tissue_map = {}
+
+
+def _fetch_tissue_map():
+    '''returns the tissue map and whether it is the one tagged with DATA_VERSION,
+    rather than the master fallback. The map is None if neither can be downloaded
+    '''
     def __generate_tissue_map(url):
         t2m = {'tissues': {} ,
                'codes': {}}
 
-        with url_to_tmpfile(url) as r_file:
+        with url_to_tmpfile(url, timeout=30) as r_file:
             t2m['tissues'] = json.load(r_file)['tissues']
-
         for _, v in t2m['tissues'].iteritems():
             code = v['efo_code']
             t2m['codes'][code] = v
@@ -58,8 +67,10 @@ def load_tissue_map():
         return t2m
 
     tmap = None
+    tagged = False
     try:
         tmap = __generate_tissue_map(Config.ES_TISSUE_MAP_URL.format(Config.DATA_VERSION))
+        tagged = True
         print('generate tissue map from DATA_VERSION tag on',
               Config.ES_TISSUE_MAP_URL.format(Config.DATA_VERSION))
     except:
@@ -70,4 +81,41 @@ def load_tissue_map():
               Config.ES_TISSUE_MAP_URL.format('master'),
               file=sys.stderr)
     finally:
+        return tmap, tagged
+
+
+def load_tissue_map():
+    '''returns the tissue map of the current DATA_VERSION from the local cache
+    file, downloading it and filling the cache first if it is not there yet.
+    The master fallback is returned but not cached, so the tagged map is tried
+    again by the next process. Returns None if the cache is empty and the map
+    cannot be downloaded
+    '''
+    start = time.time()
+    cache_path = snapshot_path(TISSUE_MAP_CACHE)
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            tmap = json.load(f)
+        print('tissue map loaded from', cache_path, 'in %.3fs' % (time.time() - start))
         return tmap
+
+    tmap, tagged = _fetch_tissue_map()
+    if tmap is not None and tagged:
+        tmp_path = '%s.%i.tmp' % (cache_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(tmap, f)
+        os.rename(tmp_path, cache_path)
+        print('tissue map downloaded and cached in', cache_path, 'in %.3fs' % (time.time() - start))
+    elif tmap is not None:
+        print('tissue map for DATA_VERSION', Config.DATA_VERSION, 'not available, using master without caching it',
+              file=sys.stderr)
+    else:
+        print('tissue map not available for DATA_VERSION', Config.DATA_VERSION, file=sys.stderr)
+    return tmap
+
+
+def get_tissue_map():
+    '''the tissue map, loaded once per process the first time it is needed'''
+    if 'map' not in _tissue_map:
+        _tissue_map['map'] = load_tissue_map()
+    return _tissue_map['map']
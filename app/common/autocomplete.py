@@ -0,0 +1,145 @@
+import numpy as np
+
+from app.common.snapshots import save_arrays, load_arrays, pack_strings, StringTable
+
+
+class AutocompleteIndex(object):
+    '''
+    prefix index over the completion inputs stored in `private.suggestions` of
+    the search index. Inputs are kept lowercase and sorted, so the matches of a
+    prefix are a contiguous range found by binary search, and the top weighted
+    document within that range are the suggestions.
+
+    The arrays are built once per data version and memory mapped, so every
+    worker reads the same pages.
+    '''
+    NAME = 'autocomplete'
+    # inputs are sorted on their first KEY_LENGTH bytes only, longer prefixes are
+    # checked against the full text
+    KEY_LENGTH = 64
+
+    def __init__(self, arrays, meta):
+        self.keys = arrays['keys']
+        self.weights = arrays['weights']
+        self.docs = arrays['docs']
+        self.texts = StringTable(arrays['text_offsets'], arrays['text_blob'])
+        self.doc_ids = StringTable(arrays['id_offsets'], arrays['id_blob'])
+        self.index = meta['index']
+
+    @classmethod
+    def load(cls):
+        loaded = load_arrays(cls.NAME)
+        if loaded is not None:
+            return cls(*loaded)
+        return None
+
+    @classmethod
+    def build(cls, es_query):
+        entries = []
+        doc_ids = []
+        for doc_id, suggestions in es_query.get_search_suggestions():
+            doc = len(doc_ids)
+            doc_ids.append(doc_id)
+            for text, weight in cls._parse_suggestions(suggestions):
+                entries.append((cls.normalise(text), -weight, doc, text))
+        entries.sort()
+
+        keys = np.array([key.encode('utf-8')[:cls.KEY_LENGTH] for key, _, _, _ in entries],
+                        dtype='S%i' % cls.KEY_LENGTH)
+        weights = np.array([-weight for _, weight, _, _ in entries], dtype=np.int32)
+        docs = np.array([doc for _, _, doc, _ in entries], dtype=np.int32)
+        text_offsets, text_blob = pack_strings([text for _, _, _, text in entries])
+        id_offsets, id_blob = pack_strings(doc_ids)
+
+        save_arrays(cls.NAME,
+                    dict(keys=keys,
+                         weights=weights,
+                         docs=docs,
+                         text_offsets=text_offsets,
+                         text_blob=text_blob,
+                         id_offsets=id_offsets,
+                         id_blob=id_blob),
+                    meta=dict(index=es_query._index_search))
+        return cls.load()
+
+    @staticmethod
+    def normalise(text):
+        '''lowercases and collapses whitespace, keeping one trailing space so that
+        "breast " only matches inputs with a word following "breast"
+        '''
+        normalised = u' '.join(text.lower().split())
+        if normalised and text[-1:].isspace():
+            normalised += u' '
+        return normalised
+
+    @staticmethod
+    def _parse_suggestions(suggestions):
+        '''yields (text, weight) from any of the shapes accepted by a completion field'''
+        if not suggestions:
+            return
+        if not isinstance(suggestions, list):
+            suggestions = [suggestions]
+        for suggestion in suggestions:
+            if isinstance(suggestion, dict):
+                inputs = suggestion.get('input') or []
+                if not isinstance(inputs, list):
+                    inputs = [inputs]
+                weight = int(suggestion.get('weight', 1))
+            else:
+                inputs = [suggestion]
+                weight = 1
+            for text in inputs:
+                if text:
+                    yield text, weight
+
+    def complete(self, prefix, size):
+        '''
+        :return: up to `size` options shaped like the ones of the completion
+        suggester, one per document, or an empty list if nothing matches `prefix`
+        '''
+        prefix = self.normalise(prefix)
+        key = prefix.encode('utf-8')
+        lo = self.keys.searchsorted(key[:self.KEY_LENGTH], 'left')
+        if len(key) < self.KEY_LENGTH:
+            # utf-8 never contains \xff, so this sorts after every key starting with `key`
+            hi = self.keys.searchsorted(key + b'\xff', 'left')
+        else:
+            hi = self.keys.searchsorted(key[:self.KEY_LENGTH], 'right')
+        n = hi - lo
+        if n <= 0 or size <= 0:
+            return []
+
+        weights = np.asarray(self.weights[lo:hi])
+        # a document can match with several inputs, so look at a few more
+        # candidates than needed and widen the window if they collapse
+        wanted = min(n, size * 4)
+        while True:
+            if wanted < n:
+                top = np.argpartition(-weights, wanted - 1)[:wanted]
+            else:
+                top = np.arange(n)
+            top = top[np.lexsort((top, -weights[top]))]
+            options = self._get_options(lo + top, prefix, len(key) >= self.KEY_LENGTH, size)
+            if len(options) == size or wanted == n:
+                return options
+            wanted = min(n, wanted * 4)
+
+    def _get_options(self, positions, prefix, check_text, size):
+        options = []
+        seen = set()
+        for position in positions:
+            doc = int(self.docs[position])
+            if doc in seen:
+                continue
+            text = self.texts[position]
+            if check_text and not self.normalise(text).startswith(prefix):
+                continue
+            seen.add(doc)
+            options.append({'text': text,
+                            '_index': self.index,
+                            '_id': self.doc_ids[doc],
+                            '_score': float(self.weights[position]),
+                            })
+            if len(options) == size:
+                break
+        return options
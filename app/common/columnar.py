@@ -0,0 +1,315 @@
+'''
+rows of a result as columns: a column is the name of a flattened field, the
+key path reading it from a row and the kind of its values. Association
+columns come from the score data structure and the configured datatypes and
+datasources, the columns of other results are inferred from the rows.
+
+Columns are encoded as json field arrays, with repeated ids and labels
+dictionary encoded, or as Apache Arrow record batches, written as an Arrow IPC
+stream or a Parquet file. pyarrow is imported only by the arrow and parquet
+outputs, which are unavailable without it, see pyarrow_available.
+'''
+
+import collections
+import itertools
+from operator import itemgetter
+from io import BytesIO
+
+from app.common.flattening import convert
+from config import Config
+
+__author__ = 'andreap'
+
+# rows encoded in each record batch, and row group of parquet files
+ARROW_BATCH_ROWS = 1000
+
+Column = collections.namedtuple('Column', ['name', 'path', 'kind'])
+
+STRING = 'string'
+FLOAT = 'float'
+INT = 'int'
+BOOL = 'bool'
+STRING_LIST = 'string_list'
+
+# association columns with few distinct values repeated across the rows
+DICTIONARY_COLUMNS = frozenset(['target.id',
+                                'target.gene_info.symbol',
+                                'target.gene_info.name',
+                                'disease.id',
+                                'disease.efo_info.label',
+                                'disease.efo_info.therapeutic_area.codes',
+                                'disease.efo_info.therapeutic_area.labels',
+                                ])
+
+
+def _column(name, kind):
+    return Column(name, tuple(name.split('.')), kind)
+
+
+def get_datatypes():
+    '''configured datatypes in display order, and their datasources'''
+    datatypes = list(Config.DATATYPE_ORDERED)
+    datatypes.extend(sorted(dt for dt in Config.DATATYPES if dt not in datatypes))
+    datasources = []
+    for dt in datatypes:
+        for ds in Config.DATATYPES[dt]:
+            if ds not in datasources:
+                datasources.append(ds)
+    return datatypes, datasources
+
+
+def association_columns():
+    '''the columns of the association score data structure'''
+    datatypes, datasources = get_datatypes()
+    columns = [_column('id', STRING),
+               _column('is_direct', BOOL),
+               _column('target.id', STRING),
+               _column('target.gene_info.symbol', STRING),
+               _column('target.gene_info.name', STRING),
+               _column('disease.id', STRING),
+               _column('disease.efo_info.label', STRING),
+               _column('disease.efo_info.therapeutic_area.codes', STRING_LIST),
+               _column('disease.efo_info.therapeutic_area.labels', STRING_LIST),
+               _column('association_score.overall', FLOAT),
+               ]
+    for score in ['association_score', 'evidence_count']:
+        if score == 'evidence_count':
+            columns.append(_column('evidence_count.total', FLOAT))
+        columns.extend(_column('%s.datatypes.%s' % (score, dt), FLOAT) for dt in datatypes)
+        columns.extend(_column('%s.datasources.%s' % (score, ds), FLOAT) for ds in datasources)
+    return columns
+
+
+def _leaves(d, path=()):
+    for k, v in d.items():
+        if isinstance(v, collections.Mapping):
+            for leaf in _leaves(v, path + (k,)):
+                yield leaf
+        else:
+            yield path + (k,), v
+
+
+def _kind(values):
+    kinds = set()
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, bool):
+            kinds.add(BOOL)
+        elif isinstance(v, (int, long)):
+            kinds.add(INT)
+        elif isinstance(v, float):
+            kinds.add(FLOAT)
+        elif isinstance(v, list) and all(isinstance(i, basestring) for i in v):
+            kinds.add(STRING_LIST)
+        else:
+            kinds.add(STRING)
+    if kinds == set([INT, FLOAT]):
+        return FLOAT
+    if len(kinds) == 1:
+        return kinds.pop()
+    return STRING
+
+
+def infer_columns(rows):
+    '''the columns of all the leaves of the rows, sorted by name, with the kind of their values'''
+    values = {}
+    for row in rows:
+        for path, v in _leaves(row):
+            values.setdefault(path, []).append(v)
+    return sorted((Column('.'.join(path), path, _kind(values[path])) for path in values),
+                  key=lambda c: c.name)
+
+
+def select_columns(columns, fields):
+    '''the columns of the requested fields, in the order they were requested'''
+    if not fields:
+        return columns
+    by_name = dict((c.name, c) for c in columns)
+    return [by_name[f] if f in by_name else _column(f, STRING) for f in fields]
+
+
+def _coerce(v, kind):
+    if v is None:
+        return None
+    if kind == FLOAT:
+        return float(v) if isinstance(v, (int, long, float)) and not isinstance(v, bool) else None
+    if kind == INT:
+        return v if isinstance(v, (int, long)) and not isinstance(v, bool) else None
+    if kind == BOOL:
+        return v if isinstance(v, bool) else None
+    if kind == STRING_LIST:
+        return [i if i.__class__ is unicode else unicode(i) for i in v] if isinstance(v, list) else [unicode(v)]
+    if isinstance(v, unicode):
+        return v
+    if isinstance(v, collections.Mapping):
+        return None
+    return convert(v)
+
+
+# the class values of a kind usually have, kept as they are
+_KIND_CLASSES = {FLOAT: float, INT: int, BOOL: bool, STRING: unicode}
+
+
+def _column_values(rows, columns):
+    '''
+    the values of the columns of the rows, a list per column. The columns
+    sharing a mapping, e.g. association_score.datatypes, are read together
+    with an itemgetter, and the mappings read on the way are kept
+    '''
+    parents = {(): rows}
+
+    def get_parents(path):
+        if path not in parents:
+            key = path[-1]
+            parents[path] = [p.get(key) if isinstance(p, dict) else None for p in get_parents(path[:-1])]
+        return parents[path]
+
+    siblings = collections.OrderedDict()
+    for column in columns:
+        keys = siblings.setdefault(column.path[:-1], [])
+        if column.path[-1] not in keys:
+            keys.append(column.path[-1])
+
+    values = {}
+    for path, keys in siblings.items():
+        single = len(keys) == 1
+        get = itemgetter(*keys)
+        got = []
+        for p in get_parents(path):
+            try:
+                if p.__class__ is not dict:
+                    raise TypeError()
+                got.append(get(p))
+            except (KeyError, TypeError):
+                # a missing key, or not a plain dict
+                missing = tuple(p.get(k) for k in keys) if isinstance(p, dict) else (None,) * len(keys)
+                got.append(missing[0] if single else missing)
+        if single:
+            got = [got]
+        else:
+            got = zip(*got) if got else [[] for _ in keys]
+        for key, column_values in zip(keys, got):
+            values[path + (key,)] = column_values
+
+    batch = []
+    for column in columns:
+        column_values = values[column.path]
+        cls = _KIND_CLASSES.get(column.kind)
+        # checking the set of the classes is done in C, usually all the values already are of their kind
+        if cls is None or not set(map(type, column_values)) <= set([cls, type(None)]):
+            column_values = [v if v.__class__ is cls or v is None else _coerce(v, column.kind)
+                             for v in column_values]
+        batch.append(column_values if isinstance(column_values, list) else list(column_values))
+    return batch
+
+
+def iter_column_batches(rows, columns, batch_rows=ARROW_BATCH_ROWS):
+    '''yields the values of the columns for every `batch_rows` rows (all of them if None), a list per column'''
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_rows))
+        if not batch:
+            return
+        yield _column_values(batch, columns)
+
+
+def _dictionary_encode(values, kind):
+    '''the positions of the values in a list of the distinct values, and the list'''
+    dictionary = []
+    positions = {}
+
+    def encode(v):
+        if v is None:
+            return None
+        if v not in positions:
+            positions[v] = len(dictionary)
+            dictionary.append(v)
+        return positions[v]
+
+    if kind == STRING_LIST:
+        return [[encode(i) for i in v] if v is not None else None for v in values], dictionary
+    return [encode(v) for v in values], dictionary
+
+
+def encode_columns(rows, columns, dictionary_columns=DICTIONARY_COLUMNS):
+    '''
+    the rows as a json serialisable dict of field arrays: `fields` lists the
+    column names in order, `columns` has an array per column and the columns
+    in `dictionary_columns` are arrays of positions in their `dictionaries`
+    '''
+    encoded = dict(fields=[c.name for c in columns],
+                   columns={},
+                   dictionaries={})
+    batch = next(iter_column_batches(rows, columns, batch_rows=None), [[] for _ in columns])
+    for values, column in zip(batch, columns):
+        if column.name in dictionary_columns:
+            values, encoded['dictionaries'][column.name] = _dictionary_encode(values, column.kind)
+        encoded['columns'][column.name] = values
+    return encoded
+
+
+def pyarrow_available():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return False
+    return True
+
+
+def arrow_schema(columns):
+    import pyarrow as pa
+    types = {STRING: pa.string(),
+             FLOAT: pa.float64(),
+             INT: pa.int64(),
+             BOOL: pa.bool_(),
+             STRING_LIST: pa.list_(pa.string()),
+             }
+    return pa.schema([pa.field(c.name, types[c.kind]) for c in columns])
+
+
+def _iter_record_batches(rows, columns, schema, batch_rows):
+    import pyarrow as pa
+    for batch in iter_column_batches(rows, columns, batch_rows):
+        yield pa.RecordBatch.from_arrays([pa.array(values, type=field.type) for values, field in zip(batch, schema)],
+                                         schema=schema)
+
+
+def _drain(output):
+    chunk = output.getvalue()
+    output.seek(0)
+    output.truncate()
+    return chunk
+
+
+def iter_arrow_stream(rows, columns, batch_rows=ARROW_BATCH_ROWS):
+    '''yields an Arrow IPC stream of the rows, each record batch as soon as it is encoded'''
+    import pyarrow as pa
+    schema = arrow_schema(columns)
+    output = BytesIO()
+    writer = pa.RecordBatchStreamWriter(output, schema)
+    yield _drain(output)
+    for batch in _iter_record_batches(rows, columns, schema, batch_rows):
+        writer.write_batch(batch)
+        yield _drain(output)
+    writer.close()
+    yield _drain(output)
+
+
+def iter_parquet(rows, columns, batch_rows=ARROW_BATCH_ROWS):
+    '''
+    yields a Parquet file of the rows with a row group per record batch, each
+    row group as soon as it is written. The footer comes last, so the file can
+    only be read once it is complete, but it is never held in memory as a whole
+    '''
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = arrow_schema(columns)
+    output = BytesIO()
+    writer = pq.ParquetWriter(output, schema)
+    for batch in _iter_record_batches(rows, columns, schema, batch_rows):
+        writer.write_table(pa.Table.from_batches([batch], schema=schema))
+        yield _drain(output)
+    writer.close()
+    yield _drain(output)
@@ -0,0 +1,221 @@
+'''
+compression of the responses in place of Flask-Compress: the encoding is
+negotiated from Accept-Encoding among zstd, br and gzip (zstd and br only
+if zstandard and brotli are installed), bodies smaller than
+COMPRESS_MIN_SIZE are sent as they are, and bodies of COMPRESS_LARGE_SIZE
+or more and streamed responses are compressed at the faster levels of
+COMPRESS_FAST_LEVELS.
+
+Compressed bodies are stored in the internal cache keyed by encoding, level
+and digest of the body, so a hot response is compressed once and then read
+back by every worker. The cpu time spent compressing, and saved by the
+cache, is sent in the X-API-Compress-Took and X-API-Compress-Saved headers
+(milliseconds) and summed in `stats`. Streamed responses are compressed while
+they are sent, after their headers, so their cpu time is only in `stats`.
+'''
+import hashlib
+import struct
+import time
+import zlib
+from collections import defaultdict
+
+from flask import request
+
+__author__ = 'andreap'
+
+# cpu seconds spent compressing the cached body, followed by the body
+CACHED_HEADER = struct.Struct('>d')
+
+
+class _GzipCompressor(object):
+    def __init__(self, level):
+        # wbits 31: a gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+class _BrotliCompressor(object):
+    def __init__(self, level):
+        import brotli
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+class _ZstdCompressor(object):
+    def __init__(self, level):
+        import zstandard
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+COMPRESSORS = {'gzip': _GzipCompressor,
+               'br': _BrotliCompressor,
+               'zstd': _ZstdCompressor,
+               }
+
+
+def available_encodings(encodings):
+    '''the encodings of `encodings` whose library can be imported, in the same order'''
+    available = []
+    for encoding in encodings:
+        try:
+            COMPRESSORS[encoding](1)
+        except (ImportError, KeyError):
+            continue
+        available.append(encoding)
+    return available
+
+
+def choose_encoding(accept_encoding, encodings):
+    '''
+    the encoding with the highest quality in the Accept-Encoding header, the
+    first of `encodings` among equal ones, None for identity
+    '''
+    qualities = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.partition(';')
+        name = name.strip()
+        if not name:
+            continue
+        quality = 1.
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    pass
+        qualities[name] = quality
+
+    best, best_quality = None, 0.
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get('*', 0.))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, level):
+    compressor = COMPRESSORS[encoding](level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def iter_compressed(chunks, encoding, level, stats=None):
+    '''
+    compresses `chunks` as they come, adding the cpu seconds spent compressing
+    and the bytes before and after to `stats`, if given, chunk by chunk
+    '''
+    if stats is None:
+        stats = defaultdict(float)
+    compressor = COMPRESSORS[encoding](level)
+    for chunk in chunks:
+        start = time.clock()
+        compressed = compressor.compress(chunk)
+        stats['cpu'] += time.clock() - start
+        stats['bytes'] += len(chunk)
+        if compressed:
+            stats['compressed_bytes'] += len(compressed)
+            yield compressed
+    start = time.clock()
+    compressed = compressor.flush()
+    stats['cpu'] += time.clock() - start
+    stats['compressed_bytes'] += len(compressed)
+    yield compressed
+
+
+class ResponseCompressor(object):
+
+    def __init__(self, app=None, cache=None):
+        self.stats = defaultdict(float)
+        if app is not None:
+            self.init_app(app, cache)
+
+    def init_app(self, app, cache=None):
+        self.config = app.config
+        self.cache = cache if app.config['COMPRESS_CACHE_TTL'] else None
+        self.encodings = available_encodings(app.config['COMPRESS_ENCODINGS'])
+        app.extensions['compression'] = self
+        app.after_request(self.after_request)
+
+    def after_request(self, response):
+        config = self.config
+        vary = response.headers.get('Vary')
+        if not vary:
+            response.headers['Vary'] = 'Accept-Encoding'
+        elif 'accept-encoding' not in vary.lower():
+            response.headers['Vary'] = '%s, Accept-Encoding' % vary
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''), self.encodings)
+        if (encoding is None or
+                response.mimetype not in config['COMPRESS_MIMETYPES'] or
+                not 200 <= response.status_code < 300 or
+                'Content-Encoding' in response.headers or
+                response.direct_passthrough or
+                (response.is_streamed and not config['COMPRESS_STREAMS'])):
+            return response
+
+        if response.is_streamed:
+            level = config['COMPRESS_FAST_LEVELS'][encoding]
+            response.response = iter_compressed(response.iter_encoded(), encoding, level, self.stats)
+            response.headers.pop('Content-Length', None)
+            self.stats['streamed'] += 1
+        else:
+            data = response.get_data()
+            if len(data) < config['COMPRESS_MIN_SIZE']:
+                return response
+            took, saved, compressed = self._compress(data, encoding)
+            response.set_data(compressed)
+            response.headers['X-API-Compress-Took'] = '%.1f' % (took * 1000)
+            response.headers['X-API-Compress-Saved'] = '%.1f' % (saved * 1000)
+
+        response.headers['Content-Encoding'] = encoding
+        etag = response.headers.get('ETag')
+        if etag:
+            response.headers['ETag'] = '%s:%s"' % (etag[:-1], encoding)
+        return response
+
+    def _compress(self, data, encoding):
+        '''cpu seconds spent and saved compressing data, and the compressed data'''
+        config = self.config
+        levels = config['COMPRESS_FAST_LEVELS'] if len(data) >= config['COMPRESS_LARGE_SIZE'] else \
+            config['COMPRESS_LEVELS']
+        level = levels[encoding]
+        stats = self.stats
+        stats['bytes'] += len(data)
+
+        key = None
+        if self.cache is not None and len(data) >= config['COMPRESS_CACHE_MIN_SIZE']:
+            key = 'compressed:%s:%i:%s' % (encoding, level, hashlib.sha1(data).hexdigest())
+            cached = self.cache.get_bytes(key)
+            if cached:
+                saved, = CACHED_HEADER.unpack_from(cached)
+                compressed = cached[CACHED_HEADER.size:]
+                stats['cache_hits'] += 1
+                stats['cpu_saved'] += saved
+                stats['compressed_bytes'] += len(compressed)
+                return 0., saved, compressed
+
+        start = time.clock()
+        compressed = compress(data, encoding, level)
+        took = time.clock() - start
+        stats['compressed'] += 1
+        stats['cpu'] += took
+        stats['compressed_bytes'] += len(compressed)
+        if key is not None:
+            self.cache.set_bytes(key, CACHED_HEADER.pack(took) + compressed, config['COMPRESS_CACHE_TTL'])
+        return took, 0., compressed
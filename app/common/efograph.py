@@ -0,0 +1,121 @@
+import numpy as np
+
+from app.common.snapshots import save_arrays, load_arrays, pack_strings, StringTable
+
+
+def _to_csr(lists):
+    '''offsets and values of a list of lists of ints'''
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    if lists:
+        offsets[1:] = np.cumsum([len(l) for l in lists])
+    values = np.array([v for l in lists for v in l], dtype=np.int32)
+    return offsets, values
+
+
+class EfoGraph(object):
+    '''
+    the EFO ontology as a DAG of integer nodes: codes are sorted, so a node is
+    the position of its code, and parents, children and therapeutic areas of
+    every node are stored as CSR arrays built from the `path_codes` and
+    `therapeutic_codes` of the efo index.
+    '''
+    NAME = 'efo_graph'
+    CODE_LENGTH = 32
+
+    def __init__(self, arrays, meta):
+        self.codes = arrays['codes']
+        self.labels = StringTable(arrays['label_offsets'], arrays['label_blob'])
+        self.parent_offsets = arrays['parent_offsets']
+        self.parents = arrays['parents']
+        self.child_offsets = arrays['child_offsets']
+        self.children = arrays['children']
+        self.ta_offsets = arrays['ta_offsets']
+        self.tas = arrays['tas']
+
+    @classmethod
+    def load(cls):
+        loaded = load_arrays(cls.NAME)
+        if loaded is not None:
+            return cls(*loaded)
+        return None
+
+    @classmethod
+    def build(cls, es_query):
+        docs = sorted(es_query.get_efo_nodes())
+        codes = [code for code, _, _, _ in docs]
+        positions = dict((code, i) for i, code in enumerate(codes))
+
+        parents = [set() for _ in codes]
+        children = [set() for _ in codes]
+        tas = []
+        for node, (code, _, path_codes, therapeutic_codes) in enumerate(docs):
+            for path in path_codes:
+                if len(path) > 1 and path[-2] in positions:
+                    parent = positions[path[-2]]
+                    parents[node].add(parent)
+                    children[parent].add(node)
+            tas.append(sorted(set(positions[ta] for ta in therapeutic_codes if ta in positions)))
+
+        parent_offsets, parent_values = _to_csr([sorted(p) for p in parents])
+        child_offsets, child_values = _to_csr([sorted(c) for c in children])
+        ta_offsets, ta_values = _to_csr(tas)
+        label_offsets, label_blob = pack_strings([label or code for code, label, _, _ in docs])
+
+        save_arrays(cls.NAME,
+                    dict(codes=np.array([code.encode('utf-8') for code in codes], dtype='S%i' % cls.CODE_LENGTH),
+                         label_offsets=label_offsets,
+                         label_blob=label_blob,
+                         parent_offsets=parent_offsets,
+                         parents=parent_values,
+                         child_offsets=child_offsets,
+                         children=child_values,
+                         ta_offsets=ta_offsets,
+                         tas=ta_values))
+        return cls.load()
+
+    def _node(self, code):
+        if isinstance(code, unicode):
+            code = code.encode('utf-8')
+        position = self.codes.searchsorted(code)
+        if position < len(self.codes) and self.codes[position] == code:
+            return int(position)
+        return None
+
+    def _code(self, node):
+        return self.codes[node].decode('utf-8')
+
+    def _walk(self, code, offsets, edges):
+        node = self._node(code)
+        if node is None:
+            return []
+        seen = set()
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            for following in edges[offsets[current]:offsets[current + 1]]:
+                following = int(following)
+                if following not in seen:
+                    seen.add(following)
+                    stack.append(following)
+        return [self._code(n) for n in sorted(seen)]
+
+    def __contains__(self, code):
+        return self._node(code) is not None
+
+    def get_label(self, code):
+        node = self._node(code)
+        if node is not None:
+            return self.labels[node]
+        return None
+
+    def get_ancestors(self, code):
+        return self._walk(code, self.parent_offsets, self.parents)
+
+    def get_descendants(self, code):
+        return self._walk(code, self.child_offsets, self.children)
+
+    def get_therapeutic_areas(self, code):
+        node = self._node(code)
+        if node is None:
+            return []
+        return [self._code(int(ta)) for ta in self.tas[self.ta_offsets[node]:self.ta_offsets[node + 1]]]
@@ -1,29 +1,40 @@
 import ast
 import datetime
+import gzip
 import hashlib
 import json as json
 import logging
+import os
+import struct
 import sys
 import time
 from collections import defaultdict
 
 import addict
-import jmespath
 import numpy as np
 from elasticsearch import TransportError
-from elasticsearch import helpers
 from flask import current_app, request
 from flask_restful import abort
-from scipy.stats import hypergeom
-
+import gevent
+from gevent.pool import Pool
+
+from app.common import get_tissue_map
+from app.common.autocomplete import AutocompleteIndex
+from app.common.efograph import EfoGraph
+from app.common.encoding import split_raw_hits
+from app.common.identifiers import IdentifierIndex
+from app.common.reactome import ReactomeIndex
+from app.common.spelling import SpellingIndex
+from app.common.uniprotkw import UniprotKeywordIndex
 from app.common.request_templates import FilterTypes
 from app.common.request_templates import SourceDataStructureOptions, AssociationSortOptions
 from app.common.response_templates import Association, DataStats, Relation, SearchMetadataObject, DataMetrics, \
-    TherapeuticArea
+    TherapeuticArea, ResponseType, transform_association_hits
 from app.common.results import PaginatedResult, SimpleResult, RawResult, EmptySimpleResult, \
     EmptyPaginatedResult
 from app.common.scoring import Scorer
 from app.common.scoring_conf import ScoringMethods
+from app.common.snapshots import snapshot_path
 from config import Config
 
 __author__ = 'andreap'
@@ -86,6 +97,24 @@ def _copy_and_mutate_dict(d, del_k, **add_ks):
     return d
 
 
+def _canonical(obj):
+    '''
+    obj with the lists of terms sorted, so the same filters given in a different
+    order give the same json. Lists of mappings, e.g. ranges, keep their order
+    '''
+    if isinstance(obj, dict):
+        return dict((k, _canonical(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        if all(isinstance(i, (basestring, int, long, float)) for i in obj):
+            return sorted(obj)
+        return [_canonical(i) for i in obj]
+    return obj
+
+
+def canonical_json(obj):
+    return json.dumps(_canonical(obj), sort_keys=True)
+
+
 def _inject_tissue_data(response, t2m):
     def __clean_id(id):
         if not id[0].isdigit():
@@ -165,6 +194,68 @@ class ESResultStatus(object):
         self.status = ['ok']
 
 
+class FreeTextQueryTemplate(object):
+    '''
+    A free text query compiled once with a placeholder in place of the search
+    phrase. Rendering copies only the dicts and lists on the path to each
+    placeholder and shares every other node with the skeleton, that must
+    therefore never be mutated.
+    '''
+    PHRASE = object()
+
+    def __init__(self, skeleton):
+        self.skeleton = skeleton
+        self.slots = {}
+        for path in self._find_slots(skeleton, ()):
+            node = self.slots
+            for key in path[:-1]:
+                node = node.setdefault(key, {})
+            node[path[-1]] = True
+
+    @classmethod
+    def _find_slots(cls, node, path):
+        if isinstance(node, dict):
+            items = node.iteritems()
+        elif isinstance(node, list):
+            items = enumerate(node)
+        else:
+            return
+        for key, value in items:
+            if value is cls.PHRASE:
+                yield path + (key,)
+            else:
+                for slot in cls._find_slots(value, path + (key,)):
+                    yield slot
+
+    def render(self, searchphrase):
+        return self._render(self.skeleton, self.slots, searchphrase)
+
+    @classmethod
+    def _render(cls, node, slots, searchphrase):
+        if slots is True:
+            return searchphrase
+        rendered = dict(node) if isinstance(node, dict) else list(node)
+        for key, sub_slots in slots.iteritems():
+            rendered[key] = cls._render(node[key], sub_slots, searchphrase)
+        return rendered
+
+
+SNAPSHOT_HEADER = struct.Struct('>d')
+SNAPSHOT_RECORD = struct.Struct('>IqI')
+SNAPSHOT_BATCH_SIZE = 1000
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 class InternalCache(object):
     NAMESPACE = 'CTTV_REST_API_CACHE'
 
@@ -176,14 +267,22 @@ class InternalCache(object):
         self.default_ttl = default_ttl
 
     def get(self, key):
-        value = self.r_server.get(self._get_namespaced_key(key))
+        value = self.get_bytes(key)
         if value:
             return self._decode(value)
 
     def set(self, key, value, ttl=None):
+        return self.set_bytes(key, self._encode(value), ttl)
+
+    def get_bytes(self, key):
+        '''a value stored with set_bytes, not decoded'''
+        return self.r_server.get(self._get_namespaced_key(key))
+
+    def set_bytes(self, key, value, ttl=None):
+        '''stores a str as it is, e.g. a compressed response'''
         _ttl = ttl if ttl else self.default_ttl
         return self.r_server.setex(self._get_namespaced_key(key),
-                                   _ttl, self._encode(value))
+                                   _ttl, value)
 
     def _get_namespaced_key(self, key):
         # try cityhash for better performance (fast and non cryptographic hash library) from cityhash import CityHash64
@@ -199,8 +298,146 @@ class InternalCache(object):
         # return pickle.loads(base64.decodestring(obj))
         return json.loads(obj)
 
+    def get_snapshot_path(self):
+        '''snapshot file of this cache, bound to the data version and to the api version'''
+        return snapshot_path('internal_cache_%s.gz' % (self.app_version or 'default'))
+
+    def snapshot(self, path=None, batch_size=SNAPSHOT_BATCH_SIZE):
+        '''
+        saves every key of this cache, with its remaining ttl, in a gzip file:
+        the time of the snapshot, then (key length, ttl in ms, value length, key,
+        value) records with the values serialised by redis DUMP
+        :return: number of keys saved
+        '''
+        path = path or self.get_snapshot_path()
+        tmp_path = '%s.%i.tmp' % (path, os.getpid())
+        count = 0
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(time.time()))
+            keys = self.r_server.scan_iter(match=':'.join([self.NAMESPACE, self.app_version, '*']),
+                                           count=batch_size)
+            for batch in _batches(keys, batch_size):
+                pipe = self.r_server.pipeline(transaction=False)
+                for key in batch:
+                    pipe.pttl(key)
+                    pipe.dump(key)
+                results = pipe.execute()
+                for key, ttl, value in zip(batch, results[::2], results[1::2]):
+                    # keys expired in the meantime or without expiry are left out
+                    if value is None or ttl is None or ttl <= 0:
+                        continue
+                    f.write(SNAPSHOT_RECORD.pack(len(key), ttl, len(value)))
+                    f.write(key)
+                    f.write(value)
+                    count += 1
+        os.rename(tmp_path, path)
+        return count
+
+    def restore(self, path=None, batch_size=SNAPSHOT_BATCH_SIZE):
+        '''
+        loads the keys saved by `snapshot`, less the time elapsed since then. Keys
+        already in the cache are kept as they are
+        :return: number of keys restored, None if there is no snapshot
+        '''
+        path = path or self.get_snapshot_path()
+        if not os.path.exists(path):
+            return None
+        count = 0
+        with gzip.open(path, 'rb') as f:
+            saved_at, = SNAPSHOT_HEADER.unpack(f.read(SNAPSHOT_HEADER.size))
+            elapsed = int((time.time() - saved_at) * 1000)
+            pipe = self.r_server.pipeline(transaction=False)
+            queued = 0
+            while True:
+                record = f.read(SNAPSHOT_RECORD.size)
+                if len(record) < SNAPSHOT_RECORD.size:
+                    break
+                key_length, ttl, value_length = SNAPSHOT_RECORD.unpack(record)
+                key = f.read(key_length)
+                value = f.read(value_length)
+                if ttl - elapsed > 0:
+                    pipe.restore(key, ttl - elapsed, value)
+                    queued += 1
+                if queued == batch_size:
+                    count += self._count_restored(pipe.execute(raise_on_error=False))
+                    queued = 0
+            if queued:
+                count += self._count_restored(pipe.execute(raise_on_error=False))
+        return count
+
+    @staticmethod
+    def _count_restored(results):
+        # keys already there fail with BUSYKEY and are not counted
+        return sum(1 for r in results if not isinstance(r, Exception))
+
+
+class UWSGICache(InternalCache):
+    '''
+    InternalCache stored in a uwsgi cache2, a shared memory area of the uwsgi
+    master, so a response cached by a worker is read by the others without a
+    round trip to redis. uwsgi takes care of the size limits (items and blocks
+    of the cache), of the LRU eviction (purge_lru) and of replacing values
+    atomically under the cache lock.
+
+    Only available under uwsgi, and only if `cache_name` is configured.
+    '''
+
+    def __init__(self, cache_name,
+                 app_version='',
+                 default_ttl=60,
+                 max_item_size=None):
+        import uwsgi
+        if not self._is_configured(uwsgi, cache_name):
+            raise ValueError('uwsgi cache %s is not configured' % cache_name)
+        self.uwsgi = uwsgi
+        self.cache_name = cache_name
+        self.app_version = app_version
+        self.default_ttl = default_ttl
+        self.max_item_size = max_item_size
+
+    @staticmethod
+    def _is_configured(uwsgi, cache_name):
+        caches = uwsgi.opt.get('cache2') or []
+        if not isinstance(caches, list):
+            caches = [caches]
+        return any(('name=%s' % cache_name) in c.split(',') for c in caches)
+
+    def get_bytes(self, key):
+        return self.uwsgi.cache_get(self._get_namespaced_key(key), self.cache_name)
+
+    def set_bytes(self, key, value, ttl=None):
+        _ttl = ttl if ttl else self.default_ttl
+        if isinstance(_ttl, datetime.timedelta):
+            _ttl = _ttl.total_seconds()
+        if self.max_item_size and len(value) > self.max_item_size:
+            return False
+        return bool(self.uwsgi.cache_update(self._get_namespaced_key(key),
+                                            value, max(int(_ttl), 1), self.cache_name))
+
+    def snapshot(self, path=None, batch_size=None):
+        '''
+        uwsgi caches cannot be listed from python, they are persisted by the
+        `store` option of --cache2 instead, see docker/supervisord.conf
+        '''
+        return None
+
+    def restore(self, path=None, batch_size=None):
+        '''see snapshot'''
+        return None
+
 
 class esQuery():
+    # (attribute, class) of the indexes loaded by load_reference_indexes
+    REFERENCE_INDEXES = [('autocomplete_index', AutocompleteIndex),
+                         ('identifier_index', IdentifierIndex),
+                         ('spelling_index', SpellingIndex),
+                         ('uniprot_kw_index', UniprotKeywordIndex),
+                         ('efo_graph', EfoGraph),
+                         ('reactome_index', ReactomeIndex),
+                         ]
+    # fields resolved exactly by the identifier index, in order of precedence
+    IDENTIFIER_FIELDS = KEYWORD_MAPPING_FIELDS
+
     def __init__(self,
                  handler,
                  datatypes,
@@ -215,6 +452,7 @@ class esQuery():
                  index_association=None,
                  index_search=None,
                  index_relation=None,
+                 index_uniprot_kw_lookup=None,
                  docname_data=None,
                  docname_drug=None,
                  docname_efo=None,
@@ -226,6 +464,7 @@ class esQuery():
                  docname_search=None,
                  docname_relation=None,
                  cache=None,
+                 known_drug_store=None,
                  log_level=logging.DEBUG):
         '''
 
@@ -235,6 +474,7 @@ class esQuery():
         :param index_efo:
         :param index_eco:
         :param index_genename:
+        :param known_drug_store: precomputed KnownDrugStore for the current data version, if any
         :param log_level:
         :return:
         '''
@@ -250,11 +490,17 @@ class esQuery():
         self._index_association = index_association
         self._index_search = index_search
         self._index_relation = index_relation
+        self._index_uniprot_kw_lookup = index_uniprot_kw_lookup
 
         self.datatypes = datatypes
         self.datatource_scoring = datatource_scoring
         self.scorer = Scorer(datatource_scoring)
         self.cache = cache
+        self.known_drug_store = known_drug_store
+        # free text query skeletons, compiled once per search profile and doc types
+        self._free_text_templates = {}
+        for attribute, _ in self.REFERENCE_INDEXES:
+            setattr(self, attribute, None)
 
     def free_text_search(self, searchphrase, doc_filter, **kwargs):
         '''
@@ -294,9 +540,8 @@ class esQuery():
                     datapoint['highlight'] = highlight
                 data.append(datapoint)
             return PaginatedResult(res, params, data)
-        elif 'suggest' in res:
-            suggestions = self._digest_suggest(res)
-            return EmptyPaginatedResult(None, suggest=suggestions)
+        elif 'hits' in res:
+            return EmptyPaginatedResult(None, suggest=self._get_search_suggestions(searchphrase))
         else:
             return EmptyPaginatedResult(None)
 
@@ -318,6 +563,9 @@ class esQuery():
         Returns:
 
         '''
+        import jmespath
+        from elasticsearch import helpers
+        from scipy.stats import hypergeom
 
         params = SearchParams(targets=targets,
                               pvalue=pvalue_threshold,
@@ -475,10 +723,31 @@ class esQuery():
         '''
 
         params = SearchParams(**kwargs)
-        results = self._best_hit_query(searchphrases, doc_filter, params)
-        data = []
-
-        # there are len(params.q) responses - one per query
+        data = [None] * len(searchphrases)
+
+        # identifiers are resolved locally, so their query only has to score one document
+        resolved = {}
+        if self.identifier_index is not None and \
+                not params.start_from and \
+                self._get_free_text_profile(params) != 'drug':
+            resolved = self._resolve_identifiers(searchphrases, doc_filter)
+
+        doc_ids = None
+        if resolved:
+            doc_ids = [resolved.get(i) for i in range(len(searchphrases))]
+        results = self._best_hit_query(searchphrases, doc_filter, params, doc_ids=doc_ids)
+
+        # the index is out of sync with elasticsearch, let the plain query decide
+        missed = [i for i in sorted(resolved)
+                  if 'hits' in results['responses'][i] and not results['responses'][i]['hits']['hits']]
+        if missed:
+            retried = self._best_hit_query([searchphrases[i] for i in missed], doc_filter, params)
+            for i, res in zip(missed, retried['responses']):
+                results['responses'][i] = res
+                resolved.pop(i)
+            results['failed'] += retried['failed']
+
+        # there are len(searchphrases) responses - one per query
         for i, res in enumerate(results['responses']):
             searchphrase = searchphrases[
                 i]  # even though we are guaranteed that responses come back in order, and can match query to the result - this might be convenient to have
@@ -494,6 +763,8 @@ class esQuery():
                                 if string.lower() == '<em>%s</em>' % lower_name:
                                     exact_match = True
                                     break
+                if i in resolved:
+                    exact_match = True
 
                 datapoint = dict(type='search-object-target',
                                  data=hit['_source'],
@@ -506,9 +777,24 @@ class esQuery():
             else:
                 datapoint = dict(id=None,
                                  q=searchphrase)
-            data.append(datapoint)
+            data[i] = datapoint
 
-        return SimpleResult(results, params, data)
+        status = ['ok']
+        if results['failed']:
+            status = ['%i search phrases could not be searched in time' % results['failed']]
+        return SimpleResult(results, params, data, status=status)
+
+    def _resolve_identifiers(self, searchphrases, doc_filter):
+        '''
+        :return: a dict with the position of the search phrases that the
+        identifier index resolves to a single document, and the id of that document
+        '''
+        resolved = {}
+        for i, searchphrase in enumerate(searchphrases):
+            match = self.identifier_index.resolve(searchphrase)
+            if match is not None and (not doc_filter or match[1] in doc_filter):
+                resolved[i] = match[0]
+        return resolved
 
     def quick_search(self,
                      searchphrase,
@@ -583,14 +869,28 @@ class esQuery():
                                 data[opt].append(format_datapoint(hit))
         else:
             suggestions = []
-            if 'suggest' in res:
-                suggestions = self._digest_suggest(res)
+            if 'hits' in res:
+                suggestions = self._get_search_suggestions(searchphrase)
 
             return EmptySimpleResult(None, data={}, suggest=suggestions)
 
 
         return SimpleResult(None, params, data)
 
+    def _get_search_suggestions(self, searchphrase):
+        '''
+        "did you mean" suggestions for a search without hits, from the local
+        spelling index or, if it was not built, from the elasticsearch term suggester
+        '''
+        if self.spelling_index is not None:
+            return self.spelling_index.suggest(searchphrase)
+        res = self._cached_search(index=self._index_search,
+                                  body={"size": 0,
+                                        "suggest": self._get_free_text_suggestions(searchphrase)})
+        if 'suggest' in res:
+            return self._digest_suggest(res)
+        return []
+
     def _digest_suggest(self, res):
         suggestions = []
         for suggest_field in res['suggest'].values():
@@ -607,22 +907,154 @@ class esQuery():
         searchphrase = searchphrase.lower()
         params = SearchParams(**kwargs)
 
-        res = self.handler.suggest(
-                index=[self._index_search],
+        if self.autocomplete_index is not None:
+            data = self.autocomplete_index.complete(searchphrase, params.size)
+            if data:
+                return SimpleResult(None, params, data)
+
+        res = self._cached_search(
+                index=self._index_search,
                 body={
+                    "_source": False,
                     "suggest": {
-                        "text": searchphrase,
-                        "completion": {
-                            "field": "private.suggestions"
+                        "autocomplete": {
+                            "prefix": searchphrase,
+                            "completion": {
+                                "field": "private.suggestions",
+                                "size": params.size
+                            }
                         }
                     }
                 }
             )
         data = []
         if 'suggest' in res:
-            data = res['suggest'][0]['options']
+            data = res['suggest']['autocomplete'][0]['options']
         return SimpleResult(None, params, data)
 
+    def get_search_suggestions(self):
+        '''yields the id and the completion inputs of every document in the search index'''
+        from elasticsearch import helpers
+        for hit in helpers.scan(client=self.handler,
+                                query={"_source": ["private.suggestions"],
+                                       "query": {"match_all": {}}},
+                                index=self._index_search,
+                                size=1000,
+                                request_timeout=60 * 20,
+                                ):
+            yield hit['_id'], hit['_source'].get('private', {}).get('suggestions')
+
+    def get_search_identifiers(self, fields):
+        '''yields the id, the type and a dict with the values of `fields` of every document in the search index'''
+        from elasticsearch import helpers
+        for hit in helpers.scan(client=self.handler,
+                                query={"_source": fields + ["type"],
+                                       "query": {"match_all": {}}},
+                                index=self._index_search,
+                                size=1000,
+                                request_timeout=60 * 20,
+                                ):
+            identifiers = {}
+            for field in fields:
+                values = hit['_source'].get(field)
+                if values:
+                    identifiers[field] = values if isinstance(values, list) else [values]
+            yield hit['_id'], hit['_source'].get('type'), identifiers
+
+    def get_search_words(self):
+        '''yields the names and the target symbols of the search index, the source of the spelling suggestions'''
+        from elasticsearch import helpers
+        for hit in helpers.scan(client=self.handler,
+                                query={"_source": ["name", "approved_symbol"],
+                                       "query": {"match_all": {}}},
+                                index=self._index_search,
+                                size=1000,
+                                request_timeout=60 * 20,
+                                ):
+            for field in ["name", "approved_symbol"]:
+                if hit['_source'].get(field):
+                    yield hit['_source'][field]
+
+    def get_gene_uniprot_keywords(self):
+        '''yields the id and the uniprot keywords of every gene'''
+        from elasticsearch import helpers
+        for hit in helpers.scan(client=self.handler,
+                                query={"_source": ["private.facets.uniprot_keywords"],
+                                       "query": {"match_all": {}}},
+                                index=self._index_genename,
+                                size=1000,
+                                request_timeout=60 * 20,
+                                ):
+            keywords = hit['_source'].get('private', {}).get('facets', {}).get('uniprot_keywords') or []
+            yield hit['_id'], keywords
+
+    def store_uniprot_kw_lookup(self, docs):
+        '''
+        stores the (id, {keyword, genes}) `docs` in the uniprot keyword lookup index
+        :return: the index name, or None if it is not configured or cannot be written
+        '''
+        from elasticsearch import helpers
+        if not self._index_uniprot_kw_lookup:
+            return None
+        try:
+            if not self.handler.indices.exists(self._index_uniprot_kw_lookup):
+                self.handler.indices.create(index=self._index_uniprot_kw_lookup,
+                                            body={"mappings": {
+                                                "properties": {
+                                                    "keyword": {"type": "keyword"},
+                                                    "genes": {"type": "keyword", "index": False}
+                                                }}})
+            helpers.bulk(self.handler,
+                         ({"_index": self._index_uniprot_kw_lookup,
+                           "_id": doc_id,
+                           "_source": doc} for doc_id, doc in docs),
+                         request_timeout=60 * 20)
+            self.handler.indices.refresh(index=self._index_uniprot_kw_lookup)
+        except TransportError:
+            return None
+        return self._index_uniprot_kw_lookup
+
+    def get_efo_nodes(self):
+        '''yields code, label, path codes and therapeutic area codes of every efo term'''
+        from elasticsearch import helpers
+        for hit in helpers.scan(client=self.handler,
+                                query={"_source": ["label", "path_codes", "therapeutic_codes"],
+                                       "query": {"match_all": {}}},
+                                index=self._index_efo,
+                                size=1000,
+                                request_timeout=60 * 20,
+                                ):
+            yield (hit['_id'],
+                   hit['_source'].get('label'),
+                   hit['_source'].get('path_codes') or [],
+                   hit['_source'].get('therapeutic_codes') or [])
+
+    def get_reactome_nodes(self):
+        '''yields code, label and whether it is a top level pathway for every reactome pathway'''
+        from elasticsearch import helpers
+        for hit in helpers.scan(client=self.handler,
+                                query={"_source": ["label", "is_root"],
+                                       "query": {"match_all": {}}},
+                                index=self._index_reactome,
+                                size=1000,
+                                request_timeout=60 * 20,
+                                ):
+            yield (hit['_id'],
+                   hit['_source'].get('label'),
+                   hit['_source'].get('is_root', False))
+
+    def load_reference_indexes(self, build=False):
+        '''
+        loads the indexes precomputed from elasticsearch for the current data
+        version. Missing indexes are built first if `build` is True, otherwise the
+        corresponding queries keep going to elasticsearch
+        '''
+        for attribute, index_class in self.REFERENCE_INDEXES:
+            index = index_class.load()
+            if index is None and build and self.handler is not None:
+                index = index_class.build(self)
+            setattr(self, attribute, index)
+
     def get_gene_info(self, gene_ids, **kwargs):
         params = SearchParams(**kwargs)
 
@@ -852,6 +1284,15 @@ class esQuery():
             q.search_after = params.pagination_index
         q.sort.append({"id.keyword": "desc"})
 
+        if Config.ES_RAW_SOURCE_SPLICING and params.format in (ResponseType.JSON, ResponseType.NDJSON) and \
+                params.datastructure != SourceDataStructureOptions.SIMPLE:
+            res, evidence, last_sort = self._raw_search_sources(index=self._index_data,
+                                                                body=q.to_dict(),
+                                                                timeout="10m")
+            if evidence and len(evidence) == params.size:
+                params.next_ = last_sort
+            return PaginatedResult(res, params, data=evidence)
+
         res = self._cached_search(index=self._index_data,
                                   body=q.to_dict(),
                                   timeout="10m",
@@ -869,6 +1310,74 @@ class esQuery():
                      diseases=None
                      ):
 
+        #single target or single disease summaries are precomputed per data version
+        if self.known_drug_store is not None:
+            stored = self.known_drug_store.lookup(targets, diseases)
+            if stored is not None:
+                return SimpleResult(None, data=stored['data'], facets=stored['facets'])
+
+        #this will output the query used
+        #print(json.dumps(self._get_known_drug_query(targets, diseases), indent=2, sort_keys=True))
+        res = self._cached_search(
+                index=self._index_data,
+                body = self._get_known_drug_query(targets, diseases),
+                timeout="10m",
+            )
+        #this will output the results returned
+        #print(json.dumps(res, indent=2, sort_keys=True))
+
+        data, facets = self._digest_known_drug_response(res)
+
+        return SimpleResult(res, data=data, facets=facets)
+
+    def compute_known_drug_summary(self,
+                                   targets=None,
+                                   diseases=None
+                                   ):
+        '''
+        computes the known drug rows and summary facets straight from elasticsearch,
+        skipping both the cache and the precomputed store. Used to build the store.
+        :return: data, facets
+        '''
+        res = self.handler.search(index=self._index_data,
+                                  body=self._get_known_drug_query(targets, diseases),
+                                  timeout="10m",
+                                  request_timeout=60 * 20,
+                                  )
+        return self._digest_known_drug_response(res)
+
+    def get_known_drug_entities(self, page_size=1000):
+        '''
+        yields a (kind, id) tuple for every target and every disease with known drug
+        evidence. Diseases are enumerated from private.efo_codes so that the
+        indirect evidence of the parent terms is counted too
+        '''
+        for kind, field in [('target', 'target.id'),
+                            ('disease', 'private.efo_codes')]:
+            after_key = None
+            while True:
+                q = addict.Dict()
+                q.size = 0
+                q.query.bool.filter = [{"match": {"type": "known_drug"}}]
+                q.aggs.entities.composite.size = page_size
+                q.aggs.entities.composite.sources = [{"id": {"terms": {"field": field}}}]
+                if after_key is not None:
+                    q.aggs.entities.composite.after = after_key
+                res = self.handler.search(index=self._index_data,
+                                          body=q.to_dict(),
+                                          request_timeout=60 * 20,
+                                          )
+                entities = res['aggregations']['entities']
+                for bucket in entities['buckets']:
+                    yield kind, bucket['key']['id']
+                after_key = entities.get('after_key')
+                if not entities['buckets'] or after_key is None:
+                    break
+
+    def _get_known_drug_query(self,
+                              targets=None,
+                              diseases=None
+                              ):
 
         q = addict.Dict()
         q.size = 0
@@ -956,16 +1465,9 @@ class esQuery():
         q.aggs.drug_type.terms.field = "drug.molecule_type.keyword"
         q.aggs.drug_type.aggs.drug_type_activity.terms.field = "target.activity"
 
+        return q.to_dict()
 
-        #this will output the query used
-        #print(json.dumps(q.to_dict(), indent=2, sort_keys=True))
-        res = self._cached_search(
-                index=self._index_data,
-                body = q.to_dict(),
-                timeout="10m",
-            )
-        #this will output the results returned
-        #print(json.dumps(res, indent=2, sort_keys=True))
+    def _digest_known_drug_response(self, res):
 
         data = []
 
@@ -1109,7 +1611,7 @@ class esQuery():
                 facets["drug_type_activity"][drug_type][subbucket["key"]] = subbucket["doc_count"]
 
 
-        return SimpleResult(res, data=data, facets=facets)
+        return data, facets
 
     def get_associations_by_id(self, associationid, **kwargs):
 
@@ -1129,11 +1631,9 @@ class esQuery():
                                         'from': params.start_from,
                                         }
                                   )
-        data = [Association(a,
-                            params.association_score_method,
-                            self.datatypes,
-                            cap_scores=params.cap_scores).data
-                    for a in res['hits']['hits']]
+        data = transform_association_hits(res['hits']['hits'],
+                                          params.association_score_method,
+                                          cap_scores=params.cap_scores)
 
         return PaginatedResult(res,
                                params,
@@ -1184,11 +1684,39 @@ class esQuery():
             ass_query_body['search_after'] = params.pagination_index
         ass_query_body['sort'].append({"id.keyword": "desc"})
 
-
-
-        # calculate aggregation using proper ad hoc filters
+        # calculate aggregation using proper ad hoc filters, in a request of their own
+        # depending only on the filters, so paging and sorting find the facets cached
+        facets_search = None
         if aggs:
-            ass_query_body['aggs'] = aggs
+            no_cache = Config.NO_CACHE_PARAMS in request.values
+            if current_app.config['ASSOCIATION_FACETS_SPLIT']:
+                # a sub-request per group of facets, each with its own budget
+                timeouts = current_app.config['ASSOCIATION_FACET_TIMEOUTS']
+                default_timeout = current_app.config['ASSOCIATION_FACET_TIMEOUT']
+                facet_bodies = []
+                request_timeouts = []
+                for group in agg_builder.get_agg_groups(current_app.config['ASSOCIATION_FACET_GROUPS']):
+                    budget = max(timeouts.get(agg, default_timeout) for agg in group)
+                    facet_bodies.append({"query": query_body,
+                                         "size": 0,
+                                         "aggs": group,
+                                         "timeout": "%is" % budget,
+                                         })
+                    # elasticsearch stops collecting at the budget, the client waits a bit longer for the response
+                    request_timeouts.append(budget + 5)
+                facets_search = gevent.spawn(self._cached_facets,
+                                             facet_bodies,
+                                             no_cache=no_cache,
+                                             request_timeouts=request_timeouts,
+                                             allow_partial=True)
+            else:
+                facets_search = gevent.spawn(self._cached_facets,
+                                             [{"query": query_body,
+                                               "size": 0,
+                                               "aggs": aggs,
+                                               "timeout": "20m",
+                                               }],
+                                             no_cache=no_cache)
         # filter out the results as requested, this will not be applied to the aggregation
         if filter_data_conditions:
             ass_query_body['post_filter'] = {
@@ -1217,31 +1745,45 @@ class esQuery():
         if ass_data['timed_out']:
             raise Exception('elasticsearch query timed out')
 
-        associations = (Association(h,
-                                    params.association_score_method,
-                                    self.datatypes,
-                                    cap_scores=params.cap_scores)
-                        for h in ass_data['hits']['hits'])
+        associations = transform_association_hits(ass_data['hits']['hits'],
+                                                  params.association_score_method,
+                                                  cap_scores=params.cap_scores)
                         # for h in ass_data['hits']['hits'] if h['_source']['disease']['id'] != 'cttv_root']
-        scores = [a.data for a in associations if a.data]
+        scores = [a for a in associations if a]
         # efo_with_data = list(set([a.data['disease']['id'] for a in associations if a.is_direct]))
-        if 'aggregations' in ass_data:
-            aggregation_results = ass_data['aggregations']
+        facets_pending = False
+        incomplete_facets = []
+        if facets_search is not None:
+            if params.facets_wait or facets_search.ready():
+                aggregation_results, incomplete_facets = facets_search.get()
+            else:
+                # left running to cache the facets for the next request
+                facets_pending = True
 
         if ass_data['hits']['hits'] and len(ass_data['hits']['hits']) == params.size:
             params.next_ = ass_data['hits']['hits'][-1]['sort']
 
         '''build data structure to return'''
         data = self._return_association_flat_data_structures(scores, aggregation_results)
+        status = ['ok']
+        if incomplete_facets:
+            # partial buckets of the facets that ran out of time, or none if they failed
+            for facet in incomplete_facets:
+                data['facets'].setdefault(facet, {'buckets': []})['incomplete'] = True
+            status = ['%i facets could not be computed in time' % len(incomplete_facets)]
 
         # inject tissue information: anatomical part and organs
-        data = _inject_tissue_data(data, Config.ES_TISSUE_MAP)
+        data = _inject_tissue_data(data, get_tissue_map())
 
         if params.target:
             try:
                 therapeutic_areas = set()
                 for s in scores:
-                    for ta_code in s['disease']['efo_info']['therapeutic_area']['codes']:
+                    if self.efo_graph is not None and s['disease']['id'] in self.efo_graph:
+                        ta_codes = self.efo_graph.get_therapeutic_areas(s['disease']['id'])
+                    else:
+                        ta_codes = s['disease']['efo_info']['therapeutic_area']['codes']
+                    for ta_code in ta_codes:
                         therapeutic_areas.add(s['target']['id'] + '-' + ta_code)
                 therapeutic_areas = list(therapeutic_areas)
                 ta_data = self._cached_search(index=self._index_association,
@@ -1252,13 +1794,10 @@ class esQuery():
                                                     '_source': source,
                                                     },
                                                 )
-                ta_associations = (Association(h,
-                                               params.association_score_method,
-                                               self.datatypes,
-                                               cap_scores=params.cap_scores
-                                               )
-                                   for h in ta_data['hits']['hits'] if h['_source']['disease']['id'] != 'cttv_root')
-                ta_scores = [a.data for a in ta_associations]
+                ta_scores = transform_association_hits((h for h in ta_data['hits']['hits']
+                                                        if h['_source']['disease']['id'] != 'cttv_root'),
+                                                       params.association_score_method,
+                                                       cap_scores=params.cap_scores)
                 # ta_scores.extend(scores)
 
 
@@ -1268,6 +1807,8 @@ class esQuery():
                                        facets=data['facets'],
                                        available_datatypes=self.datatypes.available_datatypes,
                                        therapeutic_areas=ta_scores,
+                                       facets_pending=facets_pending,
+                                       status=status,
                                        )
 
             except KeyError:
@@ -1278,6 +1819,8 @@ class esQuery():
                                data['data'],
                                facets=data['facets'],
                                available_datatypes=self.datatypes.available_datatypes,
+                               facets_pending=facets_pending,
+                               status=status,
                                )
 
     def get_complex_target_filter(self,
@@ -1550,7 +2093,26 @@ class esQuery():
         ]
         return func_score.to_dict()
 
+    @staticmethod
+    def _get_free_text_profile(params):
+        '''reduces the search_profile parameter to the profile used to build the query'''
+        if params:
+            for profile in ['drug', 'target', 'batch']:
+                if profile in params.search_profile:
+                    return profile
+        return ''
+
     def _get_free_text_query(self, searchphrase, params, doc_types):
+        profile = self._get_free_text_profile(params)
+        key = (profile, tuple(doc_types) if doc_types is not None else None)
+        template = self._free_text_templates.get(key)
+        if template is None:
+            template = FreeTextQueryTemplate(
+                self._build_free_text_query(FreeTextQueryTemplate.PHRASE, profile, doc_types))
+            self._free_text_templates[key] = template
+        return template.render(searchphrase)
+
+    def _build_free_text_query(self, searchphrase, profile, doc_types):
         score_function = self._generate_avg_function
 
         ngram_analyzer = "edgeNGram_analyzer"
@@ -1612,8 +2174,8 @@ class esQuery():
                           "ensembl_gene_id^100"]
 
 
-        if params:
-            if 'drug' in params.search_profile:
+        if profile:
+            if profile == 'drug':
                 ngram_analyzer = None
 
                 keyword_fields = [
@@ -1626,7 +2188,7 @@ class esQuery():
                     "drugs.chembl_drugs.synonyms"
                 ]
 
-            elif 'target' in params.search_profile:
+            elif profile == 'target':
                 score_function = self._generate_noop_function
                 ngram_analyzer = None
                 # whitespace_analyzer = None
@@ -1639,7 +2201,7 @@ class esQuery():
                                   "hgnc_id.keyword^100"
                                   ]
 
-            elif 'batch' in params.search_profile:
+            elif profile == 'batch':
                 score_function = self._generate_noop_function
 
                 ngram_analyzer = None
@@ -1815,7 +2377,7 @@ class esQuery():
                                       )
             if aggregate:
                 data = {'tissues': _compat_aggregated_expression(res['aggregations'])}
-                data = _inject_tissue_data(data, Config.ES_TISSUE_MAP)
+                data = _inject_tissue_data(data, get_tissue_map())
             else:
                 data = dict([(hit['_id'], hit['_source']) for hit in res['hits']['hits']])
 
@@ -1826,8 +2388,6 @@ class esQuery():
         reactome_ids = []
         therapeutic_areas = []
 
-        # TODO: implement disease name injection
-
         '''get data'''
         for facet in facets:
             if 'buckets' in facets[facet]:
@@ -1852,19 +2412,23 @@ class esQuery():
                                     if 'label' in sub_bucket:
                                         sub_bucket['label'] = sub_bucket['label']['buckets'][0]['key']
 
-        reactome_ids = list(set(reactome_ids))
-        reactome_labels = self._get_labels_for_reactome_ids(reactome_ids)
+        reactome_labels, reactome_types = {}, {}
+        if self.reactome_index is None:
+            reactome_labels, reactome_types = self._get_reactome_nodes_for_ids(list(set(reactome_ids)))
 
         efo_data = {}
         therapeutic_area_labels = {}
 
-        t_areas = self.get_efo_info_from_code(therapeutic_areas, size=len(therapeutic_areas))
+        if self.efo_graph is not None:
+            therapeutic_area_labels = self._get_efo_labels(therapeutic_areas)
+        else:
+            t_areas = self.get_efo_info_from_code(therapeutic_areas, size=len(therapeutic_areas))
 
-        if t_areas:
-            efo_data = t_areas.toDict()['data']
+            if t_areas:
+                efo_data = t_areas.toDict()['data']
 
-        if efo_data:
-            therapeutic_area_labels = dict([(efo['path_codes'][0][-1], efo['label']) for efo in efo_data])
+            if efo_data:
+                therapeutic_area_labels = dict([(efo['path_codes'][0][-1], efo['label']) for efo in efo_data])
 
         '''alter data'''
         for facet in facets:
@@ -1872,13 +2436,12 @@ class esQuery():
                 facet_buckets = facets[facet]['buckets']
                 for bucket in facet_buckets:
                     if facet == FilterTypes.PATHWAY:  # reactome data
-                        bucket['label'] = reactome_labels[bucket['key'].upper()] or bucket['key']
+                        self._decorate_pathway_bucket(bucket, reactome_labels, reactome_types)
                         if 'pathway' in bucket:
                             if 'buckets' in bucket['pathway']:
                                 sub_facet_buckets = bucket['pathway']['buckets']
                                 for sub_bucket in sub_facet_buckets:
-                                    sub_bucket['label'] = reactome_labels[sub_bucket['key'].upper()] or sub_bucket[
-                                        'key']
+                                    self._decorate_pathway_bucket(sub_bucket, reactome_labels, reactome_types)
                     elif facet == FilterTypes.DATATYPE:  # need to filter out wrong datasource. an alternative is to map these object as nested in elasticsearch
                         dt = bucket["key"]
                         if 'datasource' in bucket:
@@ -1889,6 +2452,8 @@ class esQuery():
                                     if sub_bucket['key'] in self.datatypes.get_datasources(dt):
                                         new_sub_buckets.append(sub_bucket)
                                 bucket['datasource']['buckets'] = new_sub_buckets
+                    elif facet == FilterTypes.DISEASE and self.efo_graph is not None:
+                        bucket['label'] = self.efo_graph.get_label(bucket['key']) or bucket['key']
                     elif facet == FilterTypes.THERAPEUTIC_AREA:
                         try:
                             bucket['label'] = therapeutic_area_labels[bucket['key'].upper()]
@@ -1900,8 +2465,39 @@ class esQuery():
 
         return facets
 
-    def _get_labels_for_reactome_ids(self, reactome_ids):
-        labels = defaultdict(str)
+    def _get_efo_labels(self, efo_codes):
+        '''labels from the efo graph, keyed by code as given and uppercase'''
+        labels = {}
+        for code in efo_codes:
+            label = self.efo_graph.get_label(code)
+            if label is None:
+                label = self.efo_graph.get_label(code.upper())
+            if label is not None:
+                labels[code] = label
+                labels[code.upper()] = label
+        return labels
+
+    def _decorate_pathway_bucket(self, bucket, reactome_labels, reactome_types):
+        '''
+        adds the label of the pathway, and its type: pathway_type for top level
+        pathways, pathway otherwise. From the reactome index, or from the
+        pathways fetched from elasticsearch if it is not available
+        '''
+        code = bucket['key']
+        if self.reactome_index is not None:
+            label = self.reactome_index.get_label(code)
+            pathway_type = self.reactome_index.get_type(code)
+        else:
+            label = reactome_labels.get(code.upper())
+            pathway_type = reactome_types.get(code.upper())
+        bucket['label'] = label or code
+        if pathway_type is not None:
+            bucket['type'] = pathway_type
+
+    def _get_reactome_nodes_for_ids(self, reactome_ids):
+        '''labels and types of the pathways, keyed by code'''
+        labels = {}
+        types = {}
         if reactome_ids:
             res = self._cached_search(index=self._index_reactome,
                                       body={"query": {
@@ -1909,7 +2505,7 @@ class esQuery():
                                                   "values": reactome_ids
                                                   }
                                               },
-                                          '_source': {"includes": ['label']},
+                                          '_source': {"includes": ['label', 'is_root']},
                                           'size': 10000,
                                           'from': 0,
                                           }
@@ -1917,7 +2513,9 @@ class esQuery():
             if res['hits']['total']['value'] > 0:
                 for hit in res['hits']['hits']:
                     labels[hit['_id']] = hit['_source']['label']
-        return labels
+                    types[hit['_id']] = ReactomeIndex.PATHWAY_TYPE if hit['_source'].get('is_root') \
+                        else ReactomeIndex.PATHWAY
+        return labels, types
 
     def _get_association_data_distribution(self, scores):
         histogram, bin_edges = np.histogram(scores, 5, (0., 1.))
@@ -1959,7 +2557,6 @@ class esQuery():
                 'from': params.start_from,
                 '_source': source_filter,
                 "explain": current_app.config['DEBUG'],
-                "suggest": self._get_free_text_suggestions(searchphrase)
                 #'track_total_hits': True
                 }
 
@@ -1977,15 +2574,22 @@ class esQuery():
             raise
         return res
 
-    def _best_hit_query(self, searchphrases, doc_types, params):
+    def _best_hit_query(self, searchphrases, doc_types, params, doc_ids=None):
         '''
            If  'fields' parameter is passed, only these fields would be returned
            and 'highlights' would be added only if it is of the fields parameters.
            If there is not a 'fields' parameter, then fields are included by default
 
+           If `doc_ids` is passed, the phrases with a document id in it only
+           search that document. The filter does not change the score and the
+           highlight, so they are the same the plain query would give.
+
+           Every phrase is cached on its own, and the ones not in cache are sent
+           in chunks of BEST_HIT_CHUNK_SIZE msearch requests run concurrently.
+           Responses are returned in the order of `searchphrases`, with an empty
+           response for the phrases of the chunks that failed or timed out.
         '''
         head = {'index': self._index_search}
-        multi_body = []
         highlight = self._get_mapping_highlights()
 
         source_filter = SourceDataStructureOptions.getSource(params.datastructure)
@@ -1993,8 +2597,13 @@ class esQuery():
             source_filter["includes"] = params.fields
 
         # By default ES7 returns by default just the first 10000 entries.
-        for searchphrase in searchphrases:
-            body = {'query': self._get_free_text_query(searchphrase.lower(), params, doc_types),
+        bodies = []
+        for i, searchphrase in enumerate(searchphrases):
+            query = self._get_free_text_query(searchphrase.lower(), params, doc_types)
+            if doc_ids is not None and doc_ids[i] is not None:
+                query = {'bool': {'must': query,
+                                  'filter': {'ids': {'values': [doc_ids[i]]}}}}
+            body = {'query': query,
                     'size': 1,
                     'from': params.start_from,
                     '_source': source_filter,
@@ -2002,12 +2611,48 @@ class esQuery():
                     'highlight': highlight,
                     'track_total_hits': True
                     }
+            bodies.append(body)
 
-            multi_body.append(head)
-            multi_body.append(body)
-
-        return self._cached_search(body=multi_body,
-                                   is_multi=True)
+        no_cache = Config.NO_CACHE_PARAMS in request.values
+        keys = [str(head) + str(body) for body in bodies]
+        responses = [None] * len(bodies)
+        if not no_cache:
+            for i, key in enumerate(keys):
+                responses[i] = self.cache.get(key)
+        missing = [i for i, res in enumerate(responses) if res is None]
+
+        chunk_size = current_app.config['BEST_HIT_CHUNK_SIZE']
+        chunk_timeout = current_app.config['BEST_HIT_CHUNK_TIMEOUT']
+
+        def search_chunk(chunk):
+            multi_body = []
+            for i in chunk:
+                multi_body.append(head)
+                multi_body.append(bodies[i])
+            start_time = datetime.datetime.now()
+            try:
+                res = self.handler.msearch(body=multi_body,
+                                           request_timeout=chunk_timeout)
+            except TransportError:
+                return chunk, None, None
+            return chunk, res, datetime.datetime.now() - start_time
+
+        failed = 0
+        pool = Pool(current_app.config['BEST_HIT_CONCURRENCY'])
+        chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+        for chunk, res, took in pool.imap_unordered(search_chunk, chunks):
+            if res is None:
+                failed += len(chunk)
+                for i in chunk:
+                    responses[i] = {}
+                continue
+            for i, response in zip(chunk, res['responses']):
+                responses[i] = response
+                if not no_cache and 'error' not in response:
+                    self.cache.set(keys[i], response, took + datetime.timedelta(minutes=1))
+
+        return {'responses': responses,
+                'failed': failed}
 
     def get_therapeutic_areas(self):
         therapeutic_areas = TherapeuticArea()
@@ -2282,6 +2927,33 @@ class esQuery():
         return res
 
 
+    def _raw_search_sources(self, index, body, timeout=None):
+        '''
+        search returning the `_source` of the hits as the raw json sent by
+        elasticsearch, to be spliced in the response by
+        app.common.encoding.dumps. The raw response is what gets cached
+        :return: the response without hits, the RawJSON sources and the sort values of the last hit
+        '''
+        key = 'raw' + str(index) + str(body)
+        no_cache = Config.NO_CACHE_PARAMS in request.values
+        raw = None if no_cache else self.cache.get_bytes(key)
+        if raw is None:
+            start_time = datetime.datetime.now()
+            params = {'filter_path': 'took,hits.total,hits.hits._source,hits.hits.sort'}
+            if timeout:
+                params['timeout'] = timeout
+            connection = self.handler.transport.get_connection()
+            _, _, raw = connection.perform_request('POST', '/%s/_search' % index,
+                                                   params=params,
+                                                   body=json.dumps(body))
+            if isinstance(raw, unicode):
+                raw = raw.encode('utf-8')
+            if not no_cache:
+                took = (datetime.datetime.now() - start_time) + datetime.timedelta(minutes=1)
+                # already json, stored as it is
+                self.cache.set_bytes(key, raw, took)
+        return split_raw_hits(raw)
+
     def _cached_search(self, *args, **kwargs):
         key = str(args) + str(kwargs)
         no_cache = Config.NO_CACHE_PARAMS in request.values
@@ -2314,6 +2986,57 @@ class esQuery():
             self.cache.set(key, res, took)
         return res
 
+    def _cached_facets(self, bodies, no_cache=False, request_timeouts=None, allow_partial=False):
+        '''
+        the aggregations of facets requests on the association index, and the facets
+        that could not be computed in time. The requests are sent concurrently, each
+        with its own entry of `request_timeouts` (20 minutes by default), so a slow
+        or failing request only leaves its own facets incomplete. Each request is
+        cached by its canonical body for ASSOCIATION_FACETS_CACHE_TTL seconds, if it
+        completed. Runs in a greenlet of its own, so it does not use the request
+
+        :param allow_partial: return the facets of the requests that timed out or
+        failed as incomplete instead of raising
+        '''
+        if request_timeouts is None:
+            request_timeouts = [60 * 20] * len(bodies)
+        keys = ['facets:%s:%s' % (self._index_association, canonical_json(body)) for body in bodies]
+        results = [None] * len(bodies)
+        if not no_cache:
+            for i, key in enumerate(keys):
+                results[i] = self.cache.get(key)
+        missing = [i for i, res in enumerate(results) if res is None]
+
+        def search(i):
+            try:
+                return i, self.handler.search(index=self._index_association,
+                                              body=bodies[i],
+                                              request_timeout=request_timeouts[i],
+                                              request_cache=True)
+            except TransportError as e:
+                return i, e
+
+        incomplete = []
+        if missing:
+            pool = Pool(len(missing))
+            for i, response in pool.imap_unordered(search, missing):
+                failed = isinstance(response, TransportError)
+                if failed and not allow_partial:
+                    raise response
+                # a timed out response has the buckets collected before the timeout
+                results[i] = {} if failed else response.get('aggregations', {})
+                if failed or response['timed_out']:
+                    if not allow_partial:
+                        raise Exception('elasticsearch facets query timed out')
+                    incomplete.extend(bodies[i]['aggs'])
+                elif not no_cache:
+                    self.cache.set(keys[i], results[i], Config.ASSOCIATION_FACETS_CACHE_TTL)
+
+        aggregations = {}
+        for res in results:
+            aggregations.update(res)
+        return aggregations, sorted(incomplete)
+
     @staticmethod
     def _resolve_negable_parameter_set(params, include_negative=False):
         filtered_params = []
@@ -2326,16 +3049,32 @@ class esQuery():
         return filtered_params
 
     def _get_complex_uniprot_kw_filter(self, kw, bol):
-        pass
         '''
         :param kw: list of uniprot kw strings
         :param bol: boolean operator to use for combining filters
         :return: boolean filter
         '''
         if kw:
-            genes = self.handler.get_genes_for_uniprot_kw(kw)
+            index = self.uniprot_kw_index
+            if index is None:
+                genes = self.get_genes_for_uniprot_kw(kw)
+            elif index.lookup_index and \
+                    sum(index.count(k) for k in kw) > current_app.config['UNIPROT_KW_LOOKUP_THRESHOLD']:
+                # let elasticsearch read the big gene lists from the lookup index
+                return {"bool": {
+                    bol: [{"terms": {"target.id": {"index": index.lookup_index,
+                                                   "id": index.lookup_id(k),
+                                                   "path": "genes"}}}
+                          for k in kw]
+                    }
+                }
+            elif bol == BooleanFilterOperator.AND:
+                # the genes annotated with every keyword, as the lookup filter above
+                return {"terms": {"target.id": index.get_genes(kw, all_keywords=True)}}
+            else:
+                genes = index.get_genes(kw)
             if genes:
-                return self.handler.get_complex_target_filter(genes, bol)
+                return self.get_complex_target_filter(genes, bol)
         return dict()
 
     def _get_complex_pathway_filter(self, pathway_codes):
@@ -2558,6 +3297,8 @@ class SearchParams(object):
 
         self.facets = kwargs.get('facets', "false") or "false"
         self.facets_size = kwargs.get('facets_size', None) or None
+        # False to return the hits without waiting for facets that are not cached yet
+        self.facets_wait = kwargs.get('facets_wait', True) is not False
         self.path_label = kwargs.get('path_label', None)
         self.go_term = kwargs.get('go_term', None)
 
@@ -3998,6 +4739,21 @@ class AggregationBuilder(object):
                         if self.units[agg].agg:
                             self.aggs[agg] = self.units[agg].agg
 
+    def get_agg_groups(self, groups):
+        '''
+        the aggregations split by `groups`, lists of facets computed together, and
+        one group for each of the other facets
+        '''
+        agg_groups = []
+        grouped = set()
+        for group in groups:
+            agg_group = dict((agg, self.aggs[agg]) for agg in group if agg in self.aggs)
+            if agg_group:
+                agg_groups.append(agg_group)
+            grouped.update(group)
+        agg_groups.extend({agg: self.aggs[agg]} for agg in sorted(self.aggs) if agg not in grouped)
+        return agg_groups
+
     def _get_AggregationUnit(self, str):	
         return getattr(sys.modules[__name__], str)
 
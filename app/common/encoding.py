@@ -0,0 +1,83 @@
+import json
+import uuid
+
+import ujson
+
+from config import Config
+
+__author__ = 'andreap'
+
+
+class RawJSON(str):
+    '''a fragment already encoded as json, copied as it is in the output by dumps'''
+
+
+def _ujson_dumps(obj):
+    try:
+        return ujson.dumps(obj, escape_forward_slashes=False)
+    except (TypeError, OverflowError, ValueError):
+        # objects ujson cannot encode, e.g. numpy numbers
+        return json.dumps(obj)
+
+
+ENCODERS = {'json': json.dumps,
+            'ujson': _ujson_dumps,
+            }
+
+
+def dumps(obj, encoder=None):
+    '''
+    encodes `obj` as json with the configured encoder. Lists of RawJSON values
+    of a dict are not encoded again, their fragments are spliced in the output
+    '''
+    encode = ENCODERS[encoder or Config.JSON_ENCODER]
+    if not isinstance(obj, dict):
+        return encode(obj)
+
+    raw = {}
+    for key, value in obj.items():
+        if isinstance(value, list) and value and isinstance(value[0], RawJSON):
+            raw[key] = value
+    if not raw:
+        return encode(obj)
+
+    obj = dict(obj)
+    placeholders = {}
+    for key, value in raw.items():
+        placeholder = uuid.uuid4().hex
+        placeholders[placeholder] = value
+        obj[key] = placeholder
+    encoded = encode(obj)
+    for placeholder, value in placeholders.items():
+        encoded = encoded.replace('"%s"' % placeholder, '[%s]' % ','.join(value), 1)
+    return encoded
+
+
+def split_raw_hits(raw):
+    '''
+    splits the raw json of a search run with filter_path
+    `took,hits.total,hits.hits._source,hits.hits.sort` without decoding the hits.
+
+    Elasticsearch writes compact json with `_source` first in every hit, so a
+    new hit starts at every `},{"_source":` of the hits array (a nested object
+    whose first key is `_source` would break this, none of the indices has one)
+    :return: the response without hits, the `_source` of every hit as RawJSON
+    and the sort values of the last hit
+    '''
+    start = raw.find('"hits":[')
+    if start == -1:
+        return ujson.loads(raw), [], None
+    response = ujson.loads(raw[:start] + '"hits":[]}}')
+    if raw[start + len('"hits":['):].lstrip().startswith(']'):
+        return response, [], None
+    hits = raw[start + len('"hits":[{"_source":'):raw.rindex(']')].rstrip()[:-1]
+    sources = []
+    sort = None
+    for hit in hits.split('},{"_source":'):
+        source, separator, sort = hit.rpartition(',"sort":')
+        if not separator:
+            source, sort = hit, None
+        sources.append(RawJSON(source))
+    if sort is not None:
+        sort = ujson.loads(sort)
+    return response, sources, sort
@@ -0,0 +1,241 @@
+import collections
+import json
+from threading import Lock
+
+__author__ = 'andreap'
+
+IDENTIFIERS_PREFIX = "http://identifiers.org/"
+SIMPLIFIED_PREFIX = "biological_object.properties."
+
+
+class ShapeMismatch(Exception):
+    '''the row does not have the shape the plan was compiled for'''
+
+
+def convert(v):
+    '''a flattened leaf as Result.flatten converts it'''
+    if isinstance(v, collections.MutableMapping):
+        raise ShapeMismatch()
+    if isinstance(v, list):
+        try:
+            v = '|'.join(v).encode('utf-8')
+        except:
+            if len(v) == 1:
+                v = v[0]
+            else:
+                v = json.dumps(v, encoding='utf-8')
+    if isinstance(v, str):
+        try:
+            v = unicode(v)
+        except UnicodeDecodeError:
+            pass
+    if not isinstance(v, unicode):
+        v = json.dumps(v, encoding='utf-8')
+    return unicode(v)
+
+
+# converters specialised on the type of the leaf in the sample row, falling
+# back to convert for any other type
+def _unicode(v):
+    return v if v.__class__ is unicode else convert(v)
+
+
+def _list(v):
+    if v.__class__ is list:
+        try:
+            return unicode('|'.join(v))
+        except TypeError:
+            pass
+    return convert(v)
+
+
+def _int(v):
+    return unicode(v) if v.__class__ is int else convert(v)
+
+
+def _float(v):
+    # json writes repr of finite floats
+    return unicode(repr(v)) if v.__class__ is float and v - v == 0 else convert(v)
+
+
+def _bool(v):
+    if v.__class__ is bool:
+        return u'true' if v else u'false'
+    return convert(v)
+
+
+def _none(v):
+    return u'null' if v is None else convert(v)
+
+
+CONVERTERS = {unicode: '_unicode',
+              list: '_list',
+              int: '_int',
+              float: '_float',
+              bool: '_bool',
+              type(None): '_none',
+              }
+
+
+class FlattenPlan(object):
+    '''
+    Result.flatten compiled for the shape of a sample row: the source of a
+    function reading every leaf of the row by its key path and converting it
+    with a converter chosen for its type, so rows of that shape are flattened
+    without walking them and checking the type of each value.
+
+    Every mapping of the row is checked for its size and class, so a row of a
+    different shape raises ShapeMismatch instead of being flattened wrong.
+    '''
+
+    def __init__(self, sample, simplify=False, sep='.'):
+        self.simplify = simplify
+        self.sep = sep
+        self._lines = ['def extract(row, out):']
+        self._mapping_classes = []
+        self._variables = 0
+        self._emit_mapping('row', sample, '', 0)
+        self._lines.append('    return out')
+        self.source = '\n'.join(self._lines)
+        namespace = dict(ShapeMismatch=ShapeMismatch,
+                         IDENTIFIERS_PREFIX=IDENTIFIERS_PREFIX,
+                         convert=convert,
+                         _unicode=_unicode,
+                         _list=_list,
+                         _int=_int,
+                         _float=_float,
+                         _bool=_bool,
+                         _none=_none,
+                         basestring=basestring)
+        for i, mapping_class in enumerate(self._mapping_classes):
+            namespace['mapping_class_%i' % i] = mapping_class
+        exec compile(self.source, '<flatten plan>', 'exec') in namespace
+        self._extract = namespace['extract']
+
+    def _emit(self, line):
+        self._lines.append('    ' + line)
+
+    def _emit_mapping(self, variable, mapping, parent_key, depth):
+        self._mapping_classes.append(mapping.__class__)
+        self._emit('if %s.__class__ is not mapping_class_%i or len(%s) != %i: raise ShapeMismatch()' %
+                   (variable, len(self._mapping_classes) - 1, variable, len(mapping)))
+        for k, v in mapping.items():
+            key = parent_key + self.sep + k if parent_key else k
+            self._variables += 1
+            value = 'v%i' % self._variables
+            self._emit('%s = %s[%r]' % (value, variable, k))
+            if isinstance(v, collections.MutableMapping):
+                self._emit_mapping(value, v, key, depth + 1)
+            else:
+                self._emit_leaf(value, v, key, depth)
+
+    def _emit_leaf(self, value, sample, key, depth):
+        converter = CONVERTERS.get(sample.__class__, 'convert')
+        if not self.simplify:
+            self._emit('out[%r] = %s(%s)' % (unicode(key), converter, value))
+        elif not key.startswith(SIMPLIFIED_PREFIX):
+            # as Result.flatten, identifiers.org values are dropped, testing the
+            # value as it is for the keys of the row and converted for nested keys
+            self._emit('c = %s(%s)' % (converter, value))
+            if depth:
+                self._emit('if not c.startswith(IDENTIFIERS_PREFIX): out[%r] = c' % unicode(key))
+            else:
+                self._emit('if not (isinstance(%s, basestring) and c.startswith(IDENTIFIERS_PREFIX)): out[%r] = c' %
+                           (value, unicode(key)))
+
+    def flatten(self, row):
+        return self._extract(row, collections.OrderedDict())
+
+
+# classes of the leaves of the rows, told apart from nested mappings by class only
+_LEAF_CLASSES = frozenset([unicode, str, int, long, float, bool, list, type(None)])
+
+
+def shape_of(mapping):
+    '''
+    the keys of the mapping in order, with the shape of the nested mappings, and
+    the class of those that are not dicts: the rows of a shape are flattened by
+    the same plan
+    '''
+    shape = []
+    for k, v in mapping.iteritems():
+        cls = v.__class__
+        if cls is dict:
+            shape.append((k, shape_of(v)))
+        elif cls in _LEAF_CLASSES or not isinstance(v, collections.MutableMapping):
+            shape.append(k)
+        else:
+            shape.append((k, cls, shape_of(v)))
+    return tuple(shape)
+
+
+class Flattener(object):
+    '''
+    flattens rows with the plans compiled for their shape, see shape_of. A plan
+    is compiled the second time a shape is seen, the rows of a shape seen once
+    go to `fallback` (Result.flatten). The MAX_PLANS most recently used plans
+    are kept, and beyond the first MAX_PLANS a plan is compiled at most every
+    COMPILE_EVERY rows, so rows of more shapes than that mixed together do not
+    compile a plan for each row
+    '''
+    MAX_PLANS = 256
+    COMPILE_EVERY = 64
+
+    def __init__(self, simplify=False):
+        self.simplify = simplify
+        self.plans = collections.OrderedDict()
+        self.rows = 0
+        self.compiled = 0
+        self._seen = set()
+        self._lock = Lock()
+
+    def flatten(self, row, fallback):
+        self.rows += 1
+        if not isinstance(row, collections.MutableMapping):
+            return fallback(row, simplify=self.simplify)
+        shape = (row.__class__, shape_of(row))
+        plan = self.plans.get(shape)
+        if plan is None:
+            plan = self._compile(shape, row)
+            if plan is None:
+                return fallback(row, simplify=self.simplify)
+        elif self.compiled > self.MAX_PLANS:
+            # least recently used order only matters once plans are evicted
+            self._promote(shape, plan)
+        try:
+            return plan.flatten(row)
+        except (ShapeMismatch, KeyError):
+            return fallback(row, simplify=self.simplify)
+
+    def _compile(self, shape, row):
+        with self._lock:
+            if shape not in self._seen:
+                if len(self._seen) >= 4 * self.MAX_PLANS:
+                    self._seen.clear()
+                self._seen.add(shape)
+                return None
+            if self.compiled >= self.MAX_PLANS and self.compiled * self.COMPILE_EVERY >= self.rows:
+                return None
+            self._seen.discard(shape)
+            self.compiled += 1
+        plan = FlattenPlan(row, simplify=self.simplify)
+        self._promote(shape, plan)
+        return plan
+
+    def _promote(self, shape, plan):
+        with self._lock:
+            self.plans.pop(shape, None)
+            self.plans[shape] = plan
+            while len(self.plans) > self.MAX_PLANS:
+                self.plans.popitem(last=False)
+
+
+_flatteners = {}
+
+
+def get_flattener(datastructure, simplify=False):
+    '''the Flattener of a data structure, shared by all the results of the process'''
+    key = (datastructure, simplify)
+    if key not in _flatteners:
+        _flatteners[key] = Flattener(simplify=simplify)
+    return _flatteners[key]
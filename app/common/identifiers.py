@@ -0,0 +1,91 @@
+import hashlib
+from collections import defaultdict
+
+import numpy as np
+
+from app.common.snapshots import save_arrays, load_arrays, pack_strings, StringTable
+
+
+class IdentifierIndex(object):
+    '''
+    exact, case insensitive, lookup of the identifiers and synonyms of the search
+    index documents (gene symbols, ensembl ids, uniprot accessions, hgnc ids, efo
+    codes, ...). Keys are stored as the first 8 bytes of their md5 in a sorted
+    uint64 array, next to the document and the field they come from.
+
+    Only keys belonging to a single document are kept: a phrase shared by several
+    documents has to be ranked by elasticsearch.
+    '''
+    NAME = 'identifiers'
+
+    def __init__(self, arrays, meta):
+        self.keys = arrays['keys']
+        self.docs = arrays['docs']
+        self.fields = arrays['fields']
+        self.doc_types = arrays['doc_types']
+        self.doc_ids = StringTable(arrays['id_offsets'], arrays['id_blob'])
+        self.field_names = meta['fields']
+        self.type_names = meta['types']
+
+    @classmethod
+    def load(cls):
+        loaded = load_arrays(cls.NAME)
+        if loaded is not None:
+            return cls(*loaded)
+        return None
+
+    @classmethod
+    def build(cls, es_query):
+        field_names = list(es_query.IDENTIFIER_FIELDS)
+        type_names = []
+        doc_ids = []
+        doc_types = []
+        # key -> set of docs and best (first) field it was found in
+        key_docs = defaultdict(set)
+        key_fields = {}
+        for doc_id, doc_type, identifiers in es_query.get_search_identifiers(field_names):
+            doc = len(doc_ids)
+            doc_ids.append(doc_id)
+            if doc_type not in type_names:
+                type_names.append(doc_type)
+            doc_types.append(type_names.index(doc_type))
+            for field, values in identifiers.items():
+                for value in values:
+                    key = cls.hash_key(value)
+                    key_docs[key].add(doc)
+                    field_index = field_names.index(field)
+                    if key_fields.get(key, field_index) >= field_index:
+                        key_fields[key] = field_index
+
+        unique_keys = sorted(key for key, docs in key_docs.items() if len(docs) == 1)
+        id_offsets, id_blob = pack_strings(doc_ids)
+        save_arrays(cls.NAME,
+                    dict(keys=np.array(unique_keys, dtype=np.uint64),
+                         docs=np.array([next(iter(key_docs[key])) for key in unique_keys], dtype=np.int32),
+                         fields=np.array([key_fields[key] for key in unique_keys], dtype=np.uint8),
+                         doc_types=np.array(doc_types, dtype=np.uint8),
+                         id_offsets=id_offsets,
+                         id_blob=id_blob),
+                    meta=dict(fields=field_names,
+                              types=type_names))
+        return cls.load()
+
+    @staticmethod
+    def hash_key(value):
+        if isinstance(value, str):
+            value = value.decode('utf-8')
+        return int(hashlib.md5(unicode(value).strip().lower().encode('utf-8')).hexdigest()[:16], 16)
+
+    def resolve(self, searchphrase):
+        '''
+        :return: (document id, document type, field name) of the only document
+        having `searchphrase` as identifier, or None
+        '''
+        key = np.uint64(self.hash_key(searchphrase))
+        position = self.keys.searchsorted(key)
+        if position < len(self.keys) and self.keys[position] == key:
+            doc = int(self.docs[position])
+            return (self.doc_ids[doc],
+                    self.type_names[int(self.doc_types[doc])],
+                    self.field_names[int(self.fields[position])])
+        return None
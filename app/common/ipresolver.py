@@ -0,0 +1,53 @@
+import csv
+
+import numpy as np
+from ipaddr import IPAddress, IPNetwork
+
+from app.common.snapshots import pack_strings, StringTable
+
+__author__ = 'andreap'
+
+
+class IPResolver(object):
+    '''
+    organisation of an ip address, from the networks of the ip list file.
+
+    IPv4 networks are stored as flat arrays of their first and last address, so
+    the table built in the uwsgi master is shared as it is by the forked workers
+    instead of being a dict of IPNetwork objects copied page by page. The few
+    IPv6 networks are kept in a tuple.
+    '''
+    DEFAULT = 'PUBLIC'
+
+    def __init__(self, networks=()):
+        networks = list(networks)
+        v4 = sorted((int(net.network), int(net.broadcast), org) for net, org in networks if net.version == 4)
+        self.starts = np.array([start for start, _, _ in v4], dtype=np.uint32)
+        self.ends = np.array([end for _, end, _ in v4], dtype=np.uint32)
+        self.orgs = StringTable(*pack_strings([org for _, _, org in v4]))
+        self.v6 = tuple((net, org) for net, org in networks if net.version != 4)
+
+    @classmethod
+    def from_file(cls, ip_list_file):
+        with open(ip_list_file) as csvfile:
+            return cls((IPNetwork(row['ip']), row['org'].decode('utf-8')) for row in csv.DictReader(csvfile))
+
+    def __len__(self):
+        return len(self.starts) + len(self.v6)
+
+    def resolve(self, ip):
+        '''organisation of the most specific network containing `ip`'''
+        address = IPAddress(str(ip).split('/')[0])
+        if address.version == 4:
+            address = int(address)
+            matches = np.flatnonzero((self.starts <= address) & (self.ends >= address))
+            if len(matches):
+                best = matches[np.argmin(self.ends[matches] - self.starts[matches])]
+                return self.orgs[best]
+            return self.DEFAULT
+        matches = [(net.numhosts, org) for net, org in self.v6 if address in net]
+        if matches:
+            return min(matches)[1]
+        return self.DEFAULT
+
+    __getitem__ = resolve
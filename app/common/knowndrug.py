@@ -0,0 +1,95 @@
+import json
+import os
+import sqlite3
+import zlib
+
+from app.common.snapshots import snapshot_path
+
+
+class KnownDrugStore(object):
+    '''
+    precomputed known drug rows and summary facets for every single target and
+    every single disease (indirect, through private.efo_codes) with known drug
+    evidence. The store is materialised once per data version with
+    `python manage.py build_known_drug_store` and only read by the api.
+    '''
+    FILENAME = 'known_drug.sqlite'
+    TARGET = 'target'
+    DISEASE = 'disease'
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self._pid = None
+
+    @classmethod
+    def load(cls):
+        '''returns the store for the current data version, or None if it was never built'''
+        path = snapshot_path(cls.FILENAME)
+        if os.path.exists(path):
+            return cls(path)
+        return None
+
+    @classmethod
+    def build(cls, es_query, path=None):
+        '''
+        :param es_query: an esQuery instance to compute the summaries with
+        :param path: file of the store, the one of the current data version by default
+        :return: the new store, swapped in place of the previous one atomically
+        '''
+        path = path or snapshot_path(cls.FILENAME)
+        tmp_path = '%s.%i.tmp' % (path, os.getpid())
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        connection = sqlite3.connect(tmp_path)
+        connection.execute('CREATE TABLE known_drug ('
+                           'kind TEXT NOT NULL, '
+                           'id TEXT NOT NULL, '
+                           'payload BLOB NOT NULL, '
+                           'PRIMARY KEY (kind, id))')
+        for kind, entity_id in es_query.get_known_drug_entities():
+            if kind == cls.TARGET:
+                data, facets = es_query.compute_known_drug_summary(targets=[entity_id])
+            else:
+                data, facets = es_query.compute_known_drug_summary(diseases=[entity_id])
+            if data:
+                connection.execute('INSERT OR REPLACE INTO known_drug VALUES (?, ?, ?)',
+                                   (kind, entity_id, cls._encode(dict(data=data, facets=facets))))
+        connection.commit()
+        connection.close()
+        os.rename(tmp_path, path)
+        return cls(path)
+
+    def lookup(self, targets=None, diseases=None):
+        '''
+        returns the precomputed dict(data, facets) if the request is for exactly
+        one target or exactly one disease, None if it has to be computed by elasticsearch
+        '''
+        if targets and not diseases and len(targets) == 1:
+            return self.get(self.TARGET, targets[0])
+        if diseases and not targets and len(diseases) == 1:
+            return self.get(self.DISEASE, diseases[0])
+        return None
+
+    def get(self, kind, entity_id):
+        row = self._get_connection().execute('SELECT payload FROM known_drug WHERE kind = ? AND id = ?',
+                                              (kind, entity_id)).fetchone()
+        if row:
+            return self._decode(row[0])
+
+    def _get_connection(self):
+        # sqlite connections must not be shared with the processes forked by uwsgi
+        pid = os.getpid()
+        if self._connection is None or self._pid != pid:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._pid = pid
+        return self._connection
+
+    @staticmethod
+    def _encode(payload):
+        return sqlite3.Binary(zlib.compress(json.dumps(payload, separators=(',', ':'))))
+
+    @staticmethod
+    def _decode(payload):
+        return json.loads(zlib.decompress(payload))
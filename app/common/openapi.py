@@ -0,0 +1,41 @@
+import json
+import os
+
+__author__ = 'andreap'
+
+OPENAPI_TEMPLATE = 'app/static/openapi.template.yaml'
+OPENAPI_COMPILED = 'app/static/openapi.json'
+API_DESCRIPTION = 'api-description.md'
+
+
+def _parse_template(template, description):
+    import yaml
+    with open(template) as f:
+        openapi_def = yaml.load(f)
+    # inject the description into the docs
+    with open(description) as f:
+        openapi_def['info']['description'] = f.read()
+    return openapi_def
+
+
+def compile_openapi(template=OPENAPI_TEMPLATE, description=API_DESCRIPTION, output=OPENAPI_COMPILED):
+    '''parses the yaml template, injects the api description and saves the
+    result as json, so workers do not need to parse yaml when they start
+    '''
+    openapi_def = _parse_template(template, description)
+    tmp_output = '%s.%i.tmp' % (output, os.getpid())
+    with open(tmp_output, 'w') as f:
+        json.dump(openapi_def, f)
+    os.rename(tmp_output, output)
+    return output
+
+
+def load_openapi(template=OPENAPI_TEMPLATE, description=API_DESCRIPTION, compiled=OPENAPI_COMPILED):
+    '''returns the openapi definition from the compiled json, or from the yaml
+    template if the json is missing or older than its sources
+    '''
+    if os.path.exists(compiled) and \
+            os.path.getmtime(compiled) >= max(os.path.getmtime(template), os.path.getmtime(description)):
+        with open(compiled) as f:
+            return json.load(f), compiled
+    return _parse_template(template, description), template
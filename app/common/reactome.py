@@ -0,0 +1,62 @@
+import numpy as np
+
+from app.common.snapshots import save_arrays, load_arrays, pack_strings, StringTable
+
+
+class ReactomeIndex(object):
+    '''
+    labels and types of the reactome pathways, used to decorate the pathway
+    facets: sorted pathway codes with their labels and whether they are top
+    level pathways (type pathway_type, the `pathway_type_code` of the facets)
+    or not (type pathway).
+    '''
+    NAME = 'reactome'
+    CODE_LENGTH = 32
+    PATHWAY_TYPE = 'pathway_type'
+    PATHWAY = 'pathway'
+
+    def __init__(self, arrays, meta):
+        self.codes = arrays['codes']
+        self.labels = StringTable(arrays['label_offsets'], arrays['label_blob'])
+        self.is_root = arrays['is_root']
+
+    @classmethod
+    def load(cls):
+        loaded = load_arrays(cls.NAME)
+        if loaded is not None:
+            return cls(*loaded)
+        return None
+
+    @classmethod
+    def build(cls, es_query):
+        docs = sorted((code.upper(), label or code, is_root)
+                      for code, label, is_root in es_query.get_reactome_nodes())
+        label_offsets, label_blob = pack_strings([label for _, label, _ in docs])
+
+        save_arrays(cls.NAME,
+                    dict(codes=np.array([code.encode('utf-8') for code, _, _ in docs], dtype='S%i' % cls.CODE_LENGTH),
+                         label_offsets=label_offsets,
+                         label_blob=label_blob,
+                         is_root=np.array([bool(is_root) for _, _, is_root in docs], dtype=np.bool_)))
+        return cls.load()
+
+    def _position(self, code):
+        code = code.upper()
+        if isinstance(code, unicode):
+            code = code.encode('utf-8')
+        position = self.codes.searchsorted(code)
+        if position < len(self.codes) and self.codes[position] == code:
+            return int(position)
+        return None
+
+    def get_label(self, code):
+        position = self._position(code)
+        if position is not None:
+            return self.labels[position]
+        return None
+
+    def get_type(self, code):
+        position = self._position(code)
+        if position is not None:
+            return self.PATHWAY_TYPE if self.is_root[position] else self.PATHWAY
+        return None
@@ -96,6 +96,7 @@ class SourceDataStructureOptions():
     GENE_AND_DISEASE_ID = 'gene_and_disease_id'
     CUSTOM = 'custom'
     SCORE = 'score'
+    COLUMNAR = 'columnar'
     SCORE_SUM = ScoringMethods.SUM
     SCORE_MAX = ScoringMethods.MAX
 
@@ -111,6 +112,7 @@ class SourceDataStructureOptions():
         GENE_AND_DISEASE_ID: GeneAndDiseaseIDDataStructure.source,
         COUNT: OutputDataStructure.source,
         SCORE: ScoreDataStructure.source,
+        COLUMNAR: ScoreDataStructure.source,
         CUSTOM: CustomDataStructure.source,
     }
 
@@ -1,13 +1,13 @@
 import json
 
-from app.common.datatypes import DataTypes
+from app.common.columnar import pyarrow_available
 from app.common.scoring_conf import ScoringMethods
 from config import Config
 
 __author__ = 'andreap'
 
 from flask import Flask, Response, current_app, request
-from flask_restful import fields
+from flask_restful import abort, fields
 import pprint
 
 class ResponseType():
@@ -15,6 +15,9 @@ class ResponseType():
     XML='xml'
     TSV= 'tab'
     CSV = 'csv'
+    NDJSON = 'ndjson'
+    ARROW = 'arrow'
+    PARQUET = 'parquet'
 
 
 class CTTVResponse():
@@ -39,7 +42,9 @@ class CTTVResponse():
         accept_header = request.headers.get('Accept')
 
         if type is None and accept_header:
-            if 'application/json' in accept_header:
+            if 'application/x-ndjson' in accept_header:
+                type = ResponseType.NDJSON
+            elif 'application/json' in accept_header:
                 type = ResponseType.JSON
             elif "text/xml"in accept_header:
                 type = ResponseType.XML
@@ -49,20 +54,37 @@ class CTTVResponse():
                 type = ResponseType.CSV
 
 
-        if type == ResponseType.JSON or result.format == ResponseType.JSON:
+        if type in (ResponseType.ARROW, ResponseType.PARQUET) or \
+                result.format in (ResponseType.ARROW, ResponseType.PARQUET):
+            if not pyarrow_available():
+                abort(501, message='arrow and parquet output are not available, pyarrow is not installed')
+            if type == ResponseType.ARROW or result.format == ResponseType.ARROW:
+                resp = Response(response=result.iter_arrow(),
+                                status=status,
+                                mimetype="application/vnd.apache.arrow.stream")
+            else:
+                resp = Response(response=result.iter_parquet(),
+                                status=status,
+                                mimetype="application/vnd.apache.parquet",
+                                headers={'Content-Disposition': 'attachment; filename=data.parquet'})
+        elif type == ResponseType.NDJSON or result.format == ResponseType.NDJSON:
+            resp = Response(response=result.iter_ndjson(),
+                            status=status,
+                            mimetype="application/x-ndjson")
+        elif type == ResponseType.JSON or result.format == ResponseType.JSON:
             resp = Response(response=result.toJSON(),
                             status=status,
                             mimetype="application/json")
         elif type == ResponseType.XML or result.format == ResponseType.XML:
-            resp = Response(response=result.toXML(),
+            resp = Response(response=result.iter_xml(),
                             status=status,
                             mimetype="text/xml")
         elif type == ResponseType.TSV or result.format == ResponseType.TSV:
-            resp = Response(response=result.toCSV(delimiter='\t'),
+            resp = Response(response=result.iter_csv(delimiter='\t'),
                             status=status,
                             mimetype="text/tab-separated-values")
         elif type == ResponseType.CSV or result.format == ResponseType.CSV:
-            resp = Response(response=result.toCSV(delimiter=','),
+            resp = Response(response=result.iter_csv(delimiter=','),
                             status=status,
                             mimetype="text/csv")
         else:
@@ -96,8 +118,6 @@ class Association(object):
         self.data ={}
         self.search_metadata = {}
         self._scoring_method = scoring_method
-        if datatypes is None:
-            datatypes = DataTypes(current_app)
         self._datatypes = datatypes
         self.hit_source = {}
         if '_source' in hit:
@@ -113,18 +133,7 @@ class Association(object):
         self.data = self.hit_source
         # if self.search_metadata:
         #     self.data['search_metadata'] = self.search_metadata
-        if self._scoring_method in self.hit_source:
-            self.data['association_score'] = self.hit_source[self._scoring_method]
-            del self.data[self._scoring_method]
-            if 'overall' in self.data['association_score']:
-                self.data['association_score']['overall'] = self._cap_score(self.data['association_score']['overall'])
-            if 'datatypes' in self.data['association_score']:
-                for dt in self.data['association_score']['datatypes']:
-                    self.data['association_score']['datatypes'][dt] = self._cap_score(self.data['association_score']['datatypes'][dt])
-            if 'datasources' in self.data['association_score']:
-                for ds in self.data['association_score']['datasources']:
-                    self.data['association_score']['datasources'][ds] = self._cap_score(
-                        self.data['association_score']['datasources'][ds])
+        _remap_association_score(self.data, self._scoring_method, self.is_scoring_capped)
 
     def _cap_score(self, score):
         if self.is_scoring_capped:
@@ -137,6 +146,41 @@ class Association(object):
             return 1.
         return score
 
+
+def _remap_association_score(source, scoring_method, cap_scores):
+    '''moves the score of scoring_method to association_score, capping its values to 1 in place'''
+    if scoring_method not in source:
+        return
+    score = source.pop(scoring_method)
+    source['association_score'] = score
+    if not cap_scores:
+        return
+    if score.get('overall') > 1:
+        score['overall'] = 1.
+    for scores in (score.get('datatypes'), score.get('datasources')):
+        if scores:
+            # replacing the values of existing keys while iterating is safe
+            for k, v in scores.iteritems():
+                if v > 1:
+                    scores[k] = 1.
+
+
+def transform_association_hits(hits,
+                               scoring_method=ScoringMethods.DEFAULT,
+                               cap_scores=True):
+    '''
+    the sources of association hits as parsed by Association, in a single
+    pass over the hits and without creating an Association per hit. The
+    sources are changed in place
+    '''
+    sources = []
+    for hit in hits:
+        source = hit.get('_source', {})
+        _remap_association_score(source, scoring_method, cap_scores)
+        sources.append(source)
+    return sources
+
+
 class SearchMetadataObject(object):
 
     def __init__(self,
@@ -4,10 +4,14 @@ import sys
 from io import BytesIO
 
 import unicodecsv as csv
-from dicttoxml import dicttoxml
 
+from app.common.columnar import association_columns, encode_columns, infer_columns, iter_arrow_stream, \
+    select_columns, iter_parquet
+from app.common.encoding import RawJSON, dumps
+from app.common.flattening import get_flattener
 from app.common.request_templates import SourceDataStructureOptions
 from app.common.response_templates import ResponseType
+from app.common.xmlstream import iter_xml
 from config import Config
 
 reload(sys)
@@ -58,29 +62,122 @@ class Result(object):
             return self.toCSV(delimiter = '\t')
         elif self.format == ResponseType.CSV:
             return self.toCSV(delimiter=',')
+        elif self.format == ResponseType.NDJSON:
+            return self.toNDJSON()
+        elif self.format == ResponseType.ARROW:
+            return ''.join(self.iter_arrow())
+        elif self.format == ResponseType.PARQUET:
+            return self.toParquet()
 
     def toJSON(self):
-        return json.dumps(self.toDict())
+        return dumps(self.toDict())
 
     def toXML(self):
-        return dicttoxml(self.toDict(), custom_root='cttv-api-result')
+        return ''.join(self.iter_xml())
+
+    def iter_xml(self):
+        '''yields the xml output in chunks, written while the rows are, see app.common.xmlstream'''
+        return iter_xml(self.toDict(), custom_root='cttv-api-result')
+
+    # rows encoded before a chunk is yielded by iter_ndjson
+    NDJSON_CHUNK_ROWS = 500
+
+    def toNDJSON(self):
+        return ''.join(self.iter_ndjson())
+
+    def iter_ndjson(self):
+        '''
+        yields the rows of data as newline delimited json, a line per row, and
+        then the rest of the response (total, took, next, data_version...) as
+        the last line. Responses without a list of rows are a single line
+        '''
+        response = self.toDict()
+        if not (isinstance(response, dict) and isinstance(response.get('data'), list)):
+            yield dumps(response) + '\n'
+            return
+        lines = []
+        for row in response['data']:
+            lines.append(self._ndjson_line(row))
+            if len(lines) == self.NDJSON_CHUNK_ROWS:
+                yield ''.join(lines)
+                del lines[:]
+        trailer = dict((k, v) for k, v in response.items() if k != 'data')
+        lines.append(dumps(trailer) + '\n')
+        yield ''.join(lines)
+
+    @staticmethod
+    def _ndjson_line(row):
+        if isinstance(row, RawJSON):
+            # sources spliced as elasticsearch sent them, one line unless indexed pretty printed
+            if '\n' not in row:
+                return row + '\n'
+            row = json.loads(row)
+        return dumps(row) + '\n'
+
+    def get_columns(self):
+        '''
+        the columns of the arrow and parquet output: the association score data
+        structure for associations, the leaves of the rows otherwise, restricted
+        to params.fields if requested
+        '''
+        if self.params is not None and self.params.datastructure in [SourceDataStructureOptions.SCORE,
+                                                                     SourceDataStructureOptions.COLUMNAR]:
+            columns = association_columns()
+        else:
+            columns = infer_columns(self._get_tabular_rows())
+        return select_columns(columns, getattr(self.params, 'fields', None))
+
+    def _get_tabular_rows(self):
+        if not self.data:
+            self.toDict()  # populate data if empty
+        return [row for row in self.data or [] if isinstance(row, dict)]
+
+    def iter_arrow(self):
+        '''yields the rows as an arrow ipc stream, a record batch at a time'''
+        columns = self.get_columns()
+        return iter_arrow_stream(self._get_tabular_rows(), columns)
+
+    def toParquet(self):
+        return ''.join(self.iter_parquet())
+
+    def iter_parquet(self):
+        '''yields the rows as a parquet file, a row group at a time'''
+        columns = self.get_columns()
+        return iter_parquet(self._get_tabular_rows(), columns)
+
+    NOT_ALLOWED_FIELDS = ['evidence.evidence_chain', 'search_metadata', 'search_metadata.sort']
+    # rows written to the buffer before it is yielded by iter_csv
+    CSV_CHUNK_ROWS = 500
 
     def toCSV(self, delimiter = '\t'):
-        NOT_ALLOWED_FIELDS = ['evidence.evidence_chain', 'search_metadata', 'search_metadata.sort']
+        return ''.join(self.iter_csv(delimiter=delimiter))
+
+    def iter_csv(self, delimiter = '\t'):
+        '''
+        yields the csv/tsv output a chunk of rows at a time. Columns are
+        params.fields or all the flattened keys of the rows, known before the
+        first row is written, so every row is flattened and written on its own
+        and only the flattened keys are kept in memory. Simplified rows, whose
+        keys depend on the values, are flattened once and kept until written
+        '''
         output = BytesIO()
         if not self.data:
-            self.flatten(self.toDict())  # populate data if empty
+            self.toDict()  # populate data if empty
         if self.data and isinstance(self.data[0], dict):
-            key_set = set()
-            flattened_data = []
-            for row in self.data:
-                flat = self.flatten(row,
-                                    simplify=self.params.datastructure == SourceDataStructureOptions.SIMPLE)
-                for field in NOT_ALLOWED_FIELDS:
-                    flat.pop(field, None)
-                flattened_data.append(flat)
-                key_set.update(flat.keys())
-            ordered_keys=self.params.fields or sorted(list(key_set))
+            simplify = self.params.datastructure == SourceDataStructureOptions.SIMPLE
+            flat_rows = None
+            if self.params.fields:
+                ordered_keys = self.params.fields
+            elif simplify:
+                # simplify drops keys depending on the flattened values, so the rows are
+                # flattened once for the keys and kept until they are written
+                flat_rows = [self._flatten_csv_row(row, simplify) for row in self.data]
+                keys = set()
+                for flat in flat_rows:
+                    keys.update(flat)
+                ordered_keys = sorted(keys)
+            else:
+                ordered_keys = sorted(self._get_flat_keys())
             ordered_keys = map(unicode,ordered_keys)
 
             writer = csv.DictWriter(output,
@@ -94,8 +191,14 @@ class Result(object):
                                     # extrasaction='ignore',
                                     )
             writer.writeheader()
-            for row in flattened_data:
-                writer.writerow(row)
+            for i, row in enumerate(self.data):
+                if flat_rows is None:
+                    flat = self._flatten_csv_row(row, simplify)
+                else:
+                    flat, flat_rows[i] = flat_rows[i], None
+                writer.writerow(flat)
+                if (i + 1) % self.CSV_CHUNK_ROWS == 0:
+                    yield self._drain(output)
 
         if self.data and isinstance(self.data[0], list):
             writer = csv.writer(output,
@@ -106,9 +209,45 @@ class Result(object):
                                 escapechar='\\',
                                 # extrasaction = 'ignore',
                                 )
-            for row in self.data:
+            for i, row in enumerate(self.data):
                 writer.writerow(row)
-        return output.getvalue()
+                if (i + 1) % self.CSV_CHUNK_ROWS == 0:
+                    yield self._drain(output)
+        yield self._drain(output)
+
+    @staticmethod
+    def _drain(output):
+        chunk = output.getvalue()
+        output.seek(0)
+        output.truncate()
+        return chunk
+
+    def _flatten_csv_row(self, row, simplify):
+        flat = self.flatten_row(row, simplify=simplify)
+        for field in self.NOT_ALLOWED_FIELDS:
+            flat.pop(field, None)
+        return flat
+
+    def _get_flat_keys(self):
+        '''the columns flatten produces for the rows of data, without building the rows'''
+        keys = set()
+        for row in self.data:
+            self._collect_flat_keys(row, keys)
+        keys.difference_update(self.NOT_ALLOWED_FIELDS)
+        return keys
+
+    def _collect_flat_keys(self, d, keys, parent_key='', sep='.'):
+        for k, v in d.items():
+            new_key = parent_key + sep + k if parent_key else k
+            if isinstance(v, collections.MutableMapping):
+                self._collect_flat_keys(v, keys, new_key, sep=sep)
+            else:
+                keys.add(unicode(new_key))
+
+    def flatten_row(self, row, simplify=False):
+        '''flatten with the plans compiled for the data structure of the request, see app.common.flattening'''
+        datastructure = getattr(self.params, 'datastructure', None)
+        return get_flattener(datastructure, simplify).flatten(row, self.flatten)
 
     def flatten(self, d, parent_key='', sep='.', simplify=False):
         items = []
@@ -153,10 +292,12 @@ class PaginatedResult(Result):
         '''
 
         :param total: count to return, needs to be passed as kwarg
+        :param facets_pending: the facets are still being computed, needs to be passed as kwarg
         '''
 
         self.total = kwargs.pop('total', None)
         self.took = kwargs.pop('took', None)
+        self.facets_pending = kwargs.pop('facets_pending', False)
         super(self.__class__,self).__init__(*args, **kwargs)
         if self.total is None:
             if self.res:
@@ -177,13 +318,13 @@ class PaginatedResult(Result):
                         'took': self.took
                 }
             elif self.params.datastructure == SourceDataStructureOptions.SIMPLE:
-                self.data = [self.flatten(hit['_source'], simplify=True) for hit in self.res['hits']['hits']]
+                self.data = [self.flatten_row(hit['_source'], simplify=True) for hit in self.res['hits']['hits']]
 
             else:
                 self.data = [hit['_source'] for hit in self.res['hits']['hits']]
         else:
             if self.params and self.params.datastructure == SourceDataStructureOptions.SIMPLE:
-                self.data = [self.flatten(hit['_source'], simplify=True) for hit in self.res['hits']['hits']]
+                self.data = [self.flatten_row(hit['_source'], simplify=True) for hit in self.res['hits']['hits']]
         if self.facets is None:
             if self.res and 'aggregations' in self.res:
                 self.facets = self.res['aggregations']
@@ -198,10 +339,14 @@ class PaginatedResult(Result):
                     }
         if self.facets:
             response[ 'facets'] = self.facets
+        if self.facets_pending:
+            response['facets_pending'] = True
         if self.therapeutic_areas:
             response['therapeutic_areas'] = self.therapeutic_areas
         if hasattr(self.params, 'next_'):
             response['next'] = self.params.next_
+        if self.params.datastructure == SourceDataStructureOptions.COLUMNAR:
+            response['data'] = encode_columns(self._get_tabular_rows(), self.get_columns())
 
         return response
 
@@ -260,7 +405,7 @@ class RawResult(Result):
         return json.loads(self.res)
     def toJSON(self):
         if isinstance(self.res, dict):
-            return json.dumps(self.res)
+            return dumps(self.res)
         return self.res
 
 class EmptySimpleResult(Result):
@@ -0,0 +1,91 @@
+import errno
+import json
+import os
+import shutil
+
+import numpy as np
+
+from config import Config
+
+
+def snapshot_path(filename):
+    '''returns the path of a local file bound to the current DATA_VERSION,
+    creating its directory if needed. Files stored here are derived from the
+    elasticsearch indices and are safe to reuse until the data version changes
+    '''
+    directory = os.path.join(Config.LOCAL_DATA_PATH, Config.DATA_VERSION)
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        # another worker might have created it in the meantime
+        if e.errno != errno.EEXIST:
+            raise
+    return os.path.join(directory, filename)
+
+
+def save_arrays(name, arrays, meta=None):
+    '''saves a dict of numpy arrays, plus a json serialisable `meta` dict, in a
+    per data version directory called `name`, replacing any previous version of
+    it at once
+    '''
+    path = snapshot_path(name)
+    tmp_path = '%s.%i.tmp' % (path, os.getpid())
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+    for key, array in arrays.items():
+        np.save(os.path.join(tmp_path, key + '.npy'), array)
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump(meta or {}, f)
+
+    if os.path.exists(path):
+        old_path = '%s.%i.old' % (path, os.getpid())
+        os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path)
+    else:
+        os.rename(tmp_path, path)
+
+
+def load_arrays(name):
+    '''returns the (arrays, meta) saved with `save_arrays`, or None if they were
+    never built for the current data version. Arrays are memory mapped read only,
+    so the pages are shared by every worker reading the same files
+    '''
+    path = snapshot_path(name)
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    arrays = {}
+    for filename in os.listdir(path):
+        if filename.endswith('.npy'):
+            arrays[filename[:-4]] = np.load(os.path.join(path, filename), mmap_mode='r')
+    return arrays, meta
+
+
+def pack_strings(strings):
+    '''packs a list of unicode strings in an array of offsets and an utf-8 blob,
+    to be read back with StringTable
+    '''
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(s) for s in encoded])
+    blob = np.array(bytearray(b''.join(encoded)), dtype=np.uint8)
+    return offsets, blob
+
+
+class StringTable(object):
+    '''read only list of unicode strings packed with pack_strings'''
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tostring().decode('utf-8')
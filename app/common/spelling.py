@@ -0,0 +1,159 @@
+import re
+import zlib
+from array import array
+from collections import defaultdict
+
+import numpy as np
+
+from app.common.snapshots import save_arrays, load_arrays, pack_strings, StringTable
+
+WORD_SPLITTER = re.compile(r'\w+', re.UNICODE)
+
+
+def _deletes(word, max_distance):
+    '''all the strings obtained removing up to `max_distance` characters from `word`'''
+    deletes = set([word])
+    edge = [word]
+    for _ in range(max_distance):
+        next_edge = []
+        for w in edge:
+            for i in range(len(w)):
+                d = w[:i] + w[i + 1:]
+                if d not in deletes:
+                    deletes.add(d)
+                    next_edge.append(d)
+        edge = next_edge
+    return deletes
+
+
+def _hash(text):
+    return zlib.crc32(text.encode('utf-8')) & 0xffffffff
+
+
+def edit_distance(a, b, max_distance):
+    '''optimal string alignment distance between `a` and `b`, or max_distance + 1 if larger'''
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = range(len(b) + 1)
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1,
+                             current[j - 1] + 1,
+                             previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SpellingIndex(object):
+    '''
+    "did you mean" suggestions for the words of the names and of the target
+    symbols in the search index, using a symmetric delete dictionary (SymSpell):
+    every word is indexed under the strings obtained deleting up to MAX_DISTANCE
+    characters from its first PREFIX_LENGTH characters. Candidates for a
+    misspelled word are the words sharing one of its deletes, then checked
+    with the real edit distance.
+
+    It follows the defaults of the elasticsearch term suggester it replaces:
+    only words not in the dictionary get suggestions, with the same first letter,
+    at most 2 edits away, sorted by distance and then by document frequency.
+    '''
+    NAME = 'spelling'
+    MAX_DISTANCE = 2
+    PREFIX_LENGTH = 7
+    MIN_WORD_LENGTH = 4
+
+    def __init__(self, arrays, meta):
+        self.keys = arrays['keys']
+        self.offsets = arrays['offsets']
+        self.postings = arrays['postings']
+        self.frequencies = arrays['frequencies']
+        self.words = StringTable(arrays['word_offsets'], arrays['word_blob'])
+
+    @classmethod
+    def load(cls):
+        loaded = load_arrays(cls.NAME)
+        if loaded is not None:
+            return cls(*loaded)
+        return None
+
+    @classmethod
+    def build(cls, es_query):
+        frequencies = defaultdict(int)
+        for text in es_query.get_search_words():
+            for word in set(cls.tokenize(text)):
+                frequencies[word] += 1
+        words = sorted(frequencies)
+
+        hashes = array('I')
+        word_ids = array('i')
+        for word_id, word in enumerate(words):
+            for delete in _deletes(word[:cls.PREFIX_LENGTH], cls.MAX_DISTANCE):
+                hashes.append(_hash(delete))
+                word_ids.append(word_id)
+        hashes = np.array(hashes, dtype=np.uint32)
+        word_ids = np.array(word_ids, dtype=np.int32)
+        order = np.argsort(hashes, kind='mergesort')
+        hashes = hashes[order]
+        keys, starts = np.unique(hashes, return_index=True)
+        word_offset, word_blob = pack_strings(words)
+
+        save_arrays(cls.NAME,
+                    dict(keys=keys,
+                         offsets=np.append(starts, len(hashes)).astype(np.int64),
+                         postings=word_ids[order],
+                         frequencies=np.array([frequencies[w] for w in words], dtype=np.int32),
+                         word_offsets=word_offset,
+                         word_blob=word_blob))
+        return cls.load()
+
+    @staticmethod
+    def tokenize(text):
+        if isinstance(text, str):
+            text = text.decode('utf-8')
+        return WORD_SPLITTER.findall(text.lower())
+
+    def _get_word_ids(self, delete):
+        key = _hash(delete)
+        position = self.keys.searchsorted(key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return self.postings[self.offsets[position]:self.offsets[position + 1]]
+        return []
+
+    def contains(self, word):
+        for word_id in self._get_word_ids(word[:self.PREFIX_LENGTH]):
+            if self.words[word_id] == word:
+                return True
+        return False
+
+    def suggest_word(self, word, size=5):
+        if len(word) < self.MIN_WORD_LENGTH or self.contains(word):
+            return []
+        candidates = set()
+        for delete in _deletes(word[:self.PREFIX_LENGTH], self.MAX_DISTANCE):
+            candidates.update(self._get_word_ids(delete))
+
+        scored = []
+        for word_id in candidates:
+            candidate = self.words[word_id]
+            if candidate[0] != word[0]:
+                continue
+            distance = edit_distance(word, candidate, self.MAX_DISTANCE)
+            if distance <= self.MAX_DISTANCE:
+                scored.append((distance, -int(self.frequencies[word_id]), candidate))
+        return [candidate for _, _, candidate in sorted(scored)[:size]]
+
+    def suggest(self, searchphrase, size=5):
+        '''the suggestions for every word of `searchphrase`, in a single list'''
+        suggestions = []
+        for word in self.tokenize(searchphrase):
+            for suggestion in self.suggest_word(word, size):
+                if suggestion not in suggestions:
+                    suggestions.append(suggestion)
+        return suggestions
@@ -0,0 +1,93 @@
+import hashlib
+
+import numpy as np
+
+from app.common.snapshots import save_arrays, load_arrays, pack_strings, StringTable
+
+
+class UniprotKeywordIndex(object):
+    '''
+    inverted index from the uniprot keywords of the gene index to the genes
+    annotated with them: sorted keywords, and the sorted gene positions of each
+    keyword in CSR form.
+
+    When it is built the gene list of every keyword is also stored as a document
+    of the lookup index, so that big lists can be filtered with a terms lookup
+    instead of sending all the ids to elasticsearch.
+    '''
+    NAME = 'uniprot_keywords'
+
+    def __init__(self, arrays, meta):
+        self.offsets = arrays['offsets']
+        self.postings = arrays['postings']
+        self.keywords = StringTable(arrays['keyword_offsets'], arrays['keyword_blob'])
+        self.genes = StringTable(arrays['gene_offsets'], arrays['gene_blob'])
+        self.lookup_index = meta['lookup_index']
+        # few thousands keywords at most, cheap to keep in a dict
+        self._keyword_positions = dict((self.keywords[i], i) for i in range(len(self.keywords)))
+
+    @classmethod
+    def load(cls):
+        loaded = load_arrays(cls.NAME)
+        if loaded is not None:
+            return cls(*loaded)
+        return None
+
+    @classmethod
+    def build(cls, es_query):
+        genes = []
+        keyword_genes = {}
+        for gene_id, keywords in es_query.get_gene_uniprot_keywords():
+            gene = len(genes)
+            genes.append(gene_id)
+            for keyword in set(keywords):
+                keyword_genes.setdefault(keyword, []).append(gene)
+        keywords = sorted(keyword_genes)
+
+        offsets = np.zeros(len(keywords) + 1, dtype=np.int64)
+        if keywords:
+            offsets[1:] = np.cumsum([len(keyword_genes[k]) for k in keywords])
+        postings = np.array([gene for k in keywords for gene in keyword_genes[k]], dtype=np.int32)
+        keyword_offsets, keyword_blob = pack_strings(keywords)
+        gene_offsets, gene_blob = pack_strings(genes)
+
+        lookup_index = es_query.store_uniprot_kw_lookup(
+            (cls.lookup_id(k), dict(keyword=k, genes=[genes[g] for g in keyword_genes[k]]))
+            for k in keywords)
+
+        save_arrays(cls.NAME,
+                    dict(offsets=offsets,
+                         postings=postings,
+                         keyword_offsets=keyword_offsets,
+                         keyword_blob=keyword_blob,
+                         gene_offsets=gene_offsets,
+                         gene_blob=gene_blob),
+                    meta=dict(lookup_index=lookup_index))
+        return cls.load()
+
+    @staticmethod
+    def lookup_id(keyword):
+        if isinstance(keyword, unicode):
+            keyword = keyword.encode('utf-8')
+        return hashlib.md5(keyword).hexdigest()
+
+    def count(self, keyword):
+        position = self._keyword_positions.get(keyword)
+        if position is None:
+            return 0
+        return int(self.offsets[position + 1] - self.offsets[position])
+
+    def get_genes(self, keywords, all_keywords=False):
+        '''ids of the genes annotated with any of `keywords`, or with all of them if `all_keywords`'''
+        positions = [self._keyword_positions.get(k) for k in keywords]
+        if all_keywords and None in positions:
+            return []
+        postings = [self.postings[self.offsets[p]:self.offsets[p + 1]]
+                    for p in positions if p is not None]
+        if not postings:
+            return []
+        if all_keywords:
+            genes = reduce(np.intersect1d, postings)
+        else:
+            genes = np.unique(np.concatenate(postings))
+        return [self.genes[g] for g in genes]
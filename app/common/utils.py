@@ -1,3 +1,5 @@
+import time
+
 from flask import request
 
 __author__ = 'andreap'
@@ -22,3 +24,19 @@ def get_remote_addr():
 
 def fix_empty_strings(l):
     return [i for i in l if l and i]
+
+
+class StartupTimer(object):
+    '''records how long each phase of the app factory takes'''
+    def __init__(self):
+        self.start = self.last = time.time()
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.time()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    @property
+    def total(self):
+        return self.last - self.start
@@ -0,0 +1,156 @@
+'''
+incremental writer of the xml dicttoxml 1.6.0 produces with its default
+options (root element, type attributes, no ids), yielding the document in
+chunks while the items of the lists are written instead of building it all
+in memory.
+'''
+
+from xml.dom.minidom import parseString
+
+__author__ = 'andreap'
+
+XML_DECLARATION = u'<?xml version="1.0" encoding="UTF-8" ?>'
+# fragments appended before the buffer is yielded
+CHUNK_FRAGMENTS = 4096
+
+_ESCAPES = [(u'&', u'&amp;'), (u'"', u'&quot;'), (u"'", u'&apos;'), (u'<', u'&lt;'), (u'>', u'&gt;')]
+_valid_names = {}
+
+
+def _escape(s):
+    for character, escaped in _ESCAPES:
+        if character in s:
+            s = s.replace(character, escaped)
+    return s
+
+
+def _is_valid_name(key):
+    # parsing a document for every key is what makes dicttoxml slow, keys are few
+    valid = _valid_names.get(key)
+    if valid is None:
+        try:
+            parseString(u'<?xml version="1.0" encoding="UTF-8" ?><%s>foo</%s>' % (key, key))
+            valid = True
+        except Exception:
+            valid = False
+        if len(_valid_names) < 100000:
+            _valid_names[key] = valid
+    return valid
+
+
+def _element_name(key):
+    '''the element name of a dict key and the attributes needed to keep the key'''
+    if _is_valid_name(key):
+        return key, {}
+    if key.isdigit():
+        return u'n%s' % key, {}
+    if _is_valid_name(key.replace(u' ', u'_')):
+        return key.replace(u' ', u'_'), {}
+    return u'key', {u'name': key}
+
+
+def _attributes(attr):
+    return u''.join(u' %s="%s"' % (k, v) for k, v in attr.items())
+
+
+def _scalar(value):
+    '''the type attribute and text of a leaf, None if value is not a leaf'''
+    cls = value.__class__
+    if cls is unicode or cls is str:
+        return u'str', _escape(u'%s' % value)
+    if cls is int or cls is long:
+        return u'int', u'%s' % value
+    if cls is float:
+        return u'float', u'%s' % value
+    if cls is bool:
+        return u'bool', u'true' if value else u'false'
+    if value is None:
+        return u'null', u''
+    if hasattr(value, 'isoformat'):
+        return u'str', _escape(u'%s' % value.isoformat())
+    return None
+
+
+class XMLWriter(object):
+    '''writes python objects as dicttoxml does to a list of fragments'''
+
+    def __init__(self):
+        self.parts = []
+
+    def drain(self):
+        chunk = u''.join(self.parts).encode('utf-8')
+        del self.parts[:]
+        return chunk
+
+    def write_dict(self, obj):
+        for key, value in obj.items():
+            self.write_field(key, value)
+
+    def write_field(self, key, value):
+        name, attr = _element_name(key)
+        scalar = _scalar(value)
+        if scalar is not None:
+            attr[u'type'] = scalar[0]
+            self.parts.append(u'<%s%s>%s</%s>' % (name, _attributes(attr), scalar[1], name))
+        elif isinstance(value, dict):
+            attr[u'type'] = u'dict'
+            self.parts.append(u'<%s%s>' % (name, _attributes(attr)))
+            self.write_dict(value)
+            self.parts.append(u'</%s>' % name)
+        else:
+            attr[u'type'] = u'list'
+            self.parts.append(u'<%s%s>' % (name, _attributes(attr)))
+            self.write_list(value)
+            self.parts.append(u'</%s>' % name)
+
+    def write_list(self, items):
+        for item in items:
+            self.write_item(item)
+
+    def write_item(self, item):
+        scalar = _scalar(item)
+        if scalar is not None:
+            self.parts.append(u'<item type="%s">%s</item>' % scalar)
+        elif isinstance(item, dict):
+            self.parts.append(u'<item type="dict">')
+            self.write_dict(item)
+            self.parts.append(u'</item>')
+        else:
+            self.parts.append(u'<item type="list">')
+            self.write_list(item)
+            self.parts.append(u'</item>')
+
+
+def iter_xml(obj, custom_root='root', chunk_fragments=CHUNK_FRAGMENTS):
+    '''
+    yields the xml of `obj` in utf-8 encoded chunks. The lists of the top
+    level dict, the rows of a result, are written an item at a time and a
+    chunk is yielded every `chunk_fragments` fragments
+    '''
+    writer = XMLWriter()
+    parts = writer.parts
+    parts.append(XML_DECLARATION)
+    parts.append(u'<%s>' % custom_root)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if isinstance(value, list):
+                name, attr = _element_name(key)
+                attr[u'type'] = u'list'
+                parts.append(u'<%s%s>' % (name, _attributes(attr)))
+                for item in value:
+                    writer.write_item(item)
+                    if len(parts) >= chunk_fragments:
+                        yield writer.drain()
+                parts.append(u'</%s>' % name)
+            else:
+                writer.write_field(key, value)
+    elif isinstance(obj, list):
+        writer.write_list(obj)
+    else:
+        writer.write_item(obj)
+    parts.append(u'</%s>' % custom_root)
+    yield writer.drain()
+
+
+def to_xml(obj, custom_root='root'):
+    return ''.join(iter_xml(obj, custom_root=custom_root))
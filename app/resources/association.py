@@ -40,6 +40,7 @@ class FilterBy(Resource):
         Test with ENSG00000136997
         """
         parser = boilerplate.get_parser()
+        parser.replace_argument('datastructure', type=str, required=False, help="Type of data structure to return. Can be: 'full','simple','ids', 'count', 'columnar' ",choices=['full','simple','ids', 'count', 'columnar'])
         parser.add_argument('target', type=str, action='append', required=False,)
         # parser.add_argument('gene-bool', type=str, action='store', required=False, help="Boolean operator to combine genes")
         parser.add_argument('disease', type=str, action='append', required=False, )
@@ -72,6 +73,7 @@ class FilterBy(Resource):
         parser.add_argument('direct', type=boolean, required=False,)
         parser.add_argument('facets', type=str, required=False,  default="")
         parser.add_argument('facets_size', type=int, required=False, default=0)
+        parser.add_argument('facets_wait', type=boolean, required=False, help="false to return the hits before the facets are computed, which are then cached for the next request")
         parser.add_argument('sort', type=str,  required=False, action='append',)
         parser.add_argument('search', type=str,  required=False, )
         parser.add_argument('cap_scores', type=boolean, required=False, )
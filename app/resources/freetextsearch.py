@@ -66,7 +66,7 @@ class BestHitSearch(Resource, Paginable):
         kwargs = self.parser.parse_args()
         filter_ = kwargs.pop('filter')
         searchphrases = kwargs.pop('q')
-        if len(searchphrases) > 500:
+        if len(searchphrases) > current_app.config['BEST_HIT_MAX_PHRASES']:
             raise AttributeError('request size too big')
         res = current_app.extensions['esquery'].best_hit_search(searchphrases, doc_filter=filter_, **kwargs)
         return CTTVResponse.OK(res,
@@ -84,7 +84,7 @@ class BestHitSearch(Resource, Paginable):
         else:
             filter_ = None
         searchphrases = kwargs.pop('q')
-        if len(searchphrases) > 500:
+        if len(searchphrases) > current_app.config['BEST_HIT_MAX_PHRASES']:
             raise AttributeError('request size too big')
 
         res = current_app.extensions['esquery'].best_hit_search(searchphrases, doc_filter=filter_, **kwargs)
@@ -1,6 +1,5 @@
 from datetime import datetime
 from flask import current_app, request
-from ipaddr import IPNetwork, IPv4Network, IPv6Network
 
 from app.common.response_templates import CTTVResponse
 from app.common.results import RawResult, SimpleResult
@@ -22,6 +21,14 @@ class Version(Resource):
     def get(self ):
         return CTTVResponse.OK(RawResult(current_app.config['API_VERSION']))
 
+class CompressionStats(Resource):
+    parser = reqparse.RequestParser()
+
+    def get(self ):
+        '''responses compressed by this worker and cpu seconds spent and saved by the cache'''
+        stats = dict(current_app.extensions['compression'].stats)
+        return CTTVResponse.OK(RawResult(stats))
+
 class LogEvent(Resource):
     parser = reqparse.RequestParser()
     parser.add_argument('event', type=str, required=True, help="Event to log")
@@ -31,14 +38,7 @@ class LogEvent(Resource):
         args = self.parser.parse_args()
         event = args['event'][:120]
         ip_resolver = current_app.config['IP_RESOLVER']
-        ip = request.remote_addr
-        ip_net = IPNetwork(ip)
-        resolved_org = ip_resolver['default']
-        for net, org in ip_resolver.items():
-            if isinstance(net, (IPv4Network, IPv6Network)):
-                if net.overlaps(ip_net):
-                    resolved_org = org
-                    break
+        resolved_org = ip_resolver.resolve(request.remote_addr)
         data = dict(org=resolved_org,
                     host=request.host,
                     timestamp=datetime.now(),
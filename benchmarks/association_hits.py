@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+'''
+Times the parsing of a 10,000 hits association page: an Association per hit
+against transform_association_hits, checking that both give the same rows.
+The hits are changed in place, so every run gets its own copy, made before
+timing.
+
+run from the repository root with:  python benchmarks/association_hits.py
+'''
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+import ujson
+
+from app.common.columnar import get_datatypes
+from app.common.response_templates import Association, transform_association_hits
+from app.common.scoring_conf import ScoringMethods
+
+ROWS = 10000
+REPEAT = 5
+
+
+def hit(i, datatypes, datasources):
+    # some scores over 1, as uncapped sums can be
+    return {'_id': 'ENSG%011i-EFO_%07i' % (i % 97, i),
+            '_source': {'id': 'ENSG%011i-EFO_%07i' % (i % 97, i),
+                        'target': {'id': 'ENSG%011i' % (i % 97)},
+                        'disease': {'id': 'EFO_%07i' % i},
+                        ScoringMethods.DEFAULT: {
+                            'overall': i % 150 / 100.,
+                            'datatypes': dict((dt, (i + n) % 150 / 100.) for n, dt in enumerate(datatypes)),
+                            'datasources': dict((ds, (i + n) % 150 / 100.) for n, ds in enumerate(datasources))},
+                        },
+            'sort': [i % 150 / 100.]}
+
+
+def best(run, pages):
+    timings = []
+    for page in pages:
+        start = time.time()
+        run(page)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main():
+    datatypes, datasources = get_datatypes()
+    raw = ujson.dumps([hit(i, datatypes, datasources) for i in range(ROWS)])
+
+    def per_hit(hits):
+        return [a.data for a in (Association(h, ScoringMethods.DEFAULT, datatypes=None) for h in hits) if a.data]
+
+    def batch(hits):
+        return [a for a in transform_association_hits(hits, ScoringMethods.DEFAULT) if a]
+
+    assert per_hit(ujson.loads(raw)) == batch(ujson.loads(raw))
+    for name, run in [('Association', per_hit), ('batch', batch)]:
+        took = best(run, [ujson.loads(raw) for _ in range(REPEAT)])
+        print('%-12s %i hits %7.1f ms, %5.2f us per hit' % (name, ROWS, took * 1000, took * 1e6 / ROWS))
+
+
+if __name__ == '__main__':
+    main()
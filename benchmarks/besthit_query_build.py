@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+'''
+Times the construction of the free text queries needed by a 500 phrases
+/private/besthitsearch request, building every query from scratch (as done
+before the queries were compiled into templates) against rendering the
+compiled template.
+
+run from the repository root with:  python benchmarks/besthit_query_build.py
+'''
+import sys
+import timeit
+
+sys.path.insert(0, '.')
+
+from app.common.elasticsearchclient import esQuery, SearchParams
+
+PHRASES = ['BRAF', 'asthma', 'ENSG00000157764', 'P15056', 'HGNC:1097', 'breast carcinoma',
+           'EFO_0000270', 'rs7412', 'TNF', 'alzheimer disease'] * 50
+REPEAT = 20
+
+
+def build_from_scratch(es, params, doc_types):
+    profile = es._get_free_text_profile(params)
+    return [es._build_free_text_query(phrase.lower(), profile, doc_types) for phrase in PHRASES]
+
+
+def render_template(es, params, doc_types):
+    return [es._get_free_text_query(phrase.lower(), params, doc_types) for phrase in PHRASES]
+
+
+def main():
+    es = esQuery(None, None, None)
+    for search_profile in ['', 'target', 'batch', 'drug']:
+        params = SearchParams(search_profile=search_profile)
+        doc_types = ['target', 'disease']
+        assert build_from_scratch(es, params, doc_types) == render_template(es, params, doc_types)
+        scratch = min(timeit.repeat(lambda: build_from_scratch(es, params, doc_types), number=1, repeat=REPEAT))
+        template = min(timeit.repeat(lambda: render_template(es, params, doc_types), number=1, repeat=REPEAT))
+        print('profile %-8s %i phrases: from scratch %7.2f ms, template %7.2f ms (%.1fx)' % (
+            repr(search_profile), len(PHRASES), scratch * 1000, template * 1000, scratch / template))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+'''
+Compares the json of a 10,000 rows association page as rows and with
+datastructure=columnar: payload size, gzipped size, the time to encode it,
+the columnar time including building the field arrays, and the time a client
+takes to decode it.
+
+run from the repository root with:  python benchmarks/columnar_json.py
+'''
+import gzip
+import sys
+import timeit
+from io import BytesIO
+
+sys.path.insert(0, '.')
+
+import ujson
+
+from app.common.columnar import association_columns, encode_columns, get_datatypes
+from app.common.encoding import dumps
+
+ROWS = 10000
+REPEAT = 5
+
+
+def association(i, datatypes, datasources):
+    target = i % 97
+    disease = i % 2000
+    return {'id': u'ENSG%011i-EFO_%07i' % (target, disease),
+            'is_direct': bool(i % 2),
+            'target': {'id': u'ENSG%011i' % target,
+                       'gene_info': {'symbol': u'GENE%i' % target, 'name': u'gene number %i' % target}},
+            'disease': {'id': u'EFO_%07i' % disease,
+                        'efo_info': {'label': u'disease %i' % disease,
+                                     'therapeutic_area': {'codes': [u'EFO_0000616'], 'labels': [u'neoplasm']}}},
+            'association_score': {'overall': i % 100 / 100.,
+                                  'datatypes': dict((dt, (i + n) % 7 / 10.) for n, dt in enumerate(datatypes)),
+                                  'datasources': dict((ds, (i + n) % 3 / 10.) for n, ds in enumerate(datasources))},
+            'evidence_count': {'total': float(i % 40),
+                               'datatypes': dict((dt, float((i + n) % 5)) for n, dt in enumerate(datatypes)),
+                               'datasources': dict((ds, float((i + n) % 2)) for n, ds in enumerate(datasources))},
+            }
+
+
+def gzipped_size(payload):
+    output = BytesIO()
+    with gzip.GzipFile(fileobj=output, mode='wb', compresslevel=6) as f:
+        f.write(payload)
+    return len(output.getvalue())
+
+
+def main():
+    datatypes, datasources = get_datatypes()
+    rows = [association(i, datatypes, datasources) for i in range(ROWS)]
+    columns = association_columns()
+
+    encodings = [('rows', lambda: dumps({'data': rows})),
+                 ('columnar', lambda: dumps({'data': encode_columns(rows, columns)}))]
+    for name, encode in encodings:
+        payload = encode()
+        took = min(timeit.repeat(encode, number=1, repeat=REPEAT))
+        decode = min(timeit.repeat(lambda: ujson.loads(payload), number=1, repeat=REPEAT))
+        print('%-9s %i rows  %6i kB, gzipped %5i kB, encoded in %6.1f ms, decoded in %6.1f ms' % (
+            name, ROWS, len(payload) / 1024, gzipped_size(payload) / 1024, took * 1000, decode * 1000))
+
+
+if __name__ == '__main__':
+    main()
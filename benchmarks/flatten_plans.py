@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+'''
+Times Result.flatten against the flattening plans compiled by
+app.common.flattening, on association and evidence rows, checking that both
+give the same rows.
+
+Recorded hits can be used in place of the generated rows, e.g. saving the
+response of /public/evidence/filter?size=2000 or
+/public/association/filter?size=2000 as json and running:
+
+    python benchmarks/flatten_plans.py evidence.json association.json
+
+run from the repository root with:  python benchmarks/flatten_plans.py
+'''
+import json
+import sys
+import timeit
+
+sys.path.insert(0, '.')
+
+from app.common.flattening import Flattener
+from app.common.results import Result
+
+ROWS = 2000
+REPEAT = 3
+
+
+def association(i):
+    return {'id': 'ENSG%011i-EFO_%07i' % (i, i),
+            'is_direct': bool(i % 2),
+            'target': {'id': 'ENSG%011i' % i,
+                       'gene_info': {'symbol': u'GENE%i' % i, 'name': u'gene number %i' % i}},
+            'disease': {'id': 'EFO_%07i' % i,
+                        'efo_info': {'label': u'disease %i' % i,
+                                     'therapeutic_area': {'codes': [u'EFO_0000616'], 'labels': [u'neoplasm']},
+                                     'path': [[u'EFO_0000616', u'EFO_%07i' % i]]}},
+            'association_score': {'overall': i % 100 / 100.,
+                                  'datatypes': dict((d, i % 7 / 10.) for d in ['genetic_association',
+                                                                               'somatic_mutation', 'known_drug',
+                                                                               'affected_pathway', 'rna_expression',
+                                                                               'literature', 'animal_model']),
+                                  'datasources': dict(('source%i' % d, i % 3 / 10.) for d in range(20))},
+            'evidence_count': {'total': float(i % 40)},
+            }
+
+
+def evidence(i):
+    return {'id': u'evidence%i' % i,
+            'sourceID': u'europepmc',
+            'type': u'literature',
+            'access_level': u'public',
+            'target': {'id': u'http://identifiers.org/ensembl/ENSG%011i' % i,
+                       'gene_info': {'symbol': u'GENE%i' % i, 'name': u'gene number %i' % i, 'geneid': u'ENSG%i' % i}},
+            'disease': {'id': u'http://www.ebi.ac.uk/efo/EFO_%07i' % i,
+                        'efo_info': {'label': u'disease %i' % i, 'path': [[u'EFO_0000616']]}},
+            'scores': {'association_score': 0.5 + i % 50 / 100.},
+            'unique_association_fields': {'publication_id': u'http://europepmc.org/abstract/MED/%i' % i,
+                                          'target': u'ENSG%i' % i, 'disease_id': u'EFO_%07i' % i},
+            'literature': {'references': [{'lit_id': u'http://europepmc.org/abstract/MED/%i' % i}],
+                           'year': 2000 + i % 20},
+            'evidence': {'date_asserted': u'2020-09-01T00:00:00Z', 'is_associated': True,
+                         'resource_score': {'type': u'probability', 'value': 1.0},
+                         'provenance_type': {'database': {'id': u'EuropePMC', 'version': u'2020'}},
+                         'literature_ref': {'lit_id': u'http://europepmc.org/abstract/MED/%i' % i,
+                                            'mined_sentences': [{'text': u'sentence %i' % i, 'd_start': 10}] * 3}},
+            }
+
+
+def mixed_evidence(i, shapes=200):
+    '''evidence rows of `shapes` datasource specific shapes, interleaved'''
+    row = evidence(i)
+    row['evidence']['source%i' % (i % shapes)] = {'value': i}
+    return row
+
+
+def load_rows(path):
+    with open(path) as f:
+        response = json.load(f)
+    if 'hits' in response:
+        return [hit['_source'] for hit in response['hits']['hits']]
+    return response['data']
+
+
+def main(paths):
+    result = Result(None)
+    if paths:
+        datasets = [(path, load_rows(path)) for path in paths]
+    else:
+        datasets = [('association', [association(i) for i in range(ROWS)]),
+                    ('evidence', [evidence(i) for i in range(ROWS)]),
+                    ('mixed', [mixed_evidence(i) for i in range(ROWS * 2)])]
+    for name, rows in datasets:
+        for simplify in [False, True]:
+            flattener = Flattener(simplify=simplify)
+            generic = [result.flatten(row, simplify=simplify) for row in rows]
+            compiled = [flattener.flatten(row, result.flatten) for row in rows]
+            assert [dict(r) for r in generic] == [dict(r) for r in compiled]
+            flatten = min(timeit.repeat(lambda: [result.flatten(row, simplify=simplify) for row in rows],
+                                        number=1, repeat=REPEAT))
+            plans = min(timeit.repeat(lambda: [flattener.flatten(row, result.flatten) for row in rows],
+                                      number=1, repeat=REPEAT))
+            print('%-12s %i rows simplify=%-5s  Result.flatten %7.1f ms, plans %7.1f ms (%.1fx, %i plans)' % (
+                name, len(rows), simplify, flatten * 1000, plans * 1000, flatten / plans, len(flattener.plans)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
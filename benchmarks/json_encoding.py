@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+'''
+Times the json encoding of a 10,000 rows evidence page: the stdlib encoder,
+ujson, and the raw mode where the `_source` of the hits are spliced as sent by
+elasticsearch, against decoding the elasticsearch response and encoding it
+again.
+
+run from the repository root with:  python benchmarks/json_encoding.py
+'''
+import json
+import sys
+import timeit
+from collections import OrderedDict
+
+sys.path.insert(0, '.')
+
+import ujson
+
+from app.common.encoding import dumps, split_raw_hits
+
+ROWS = 10000
+REPEAT = 5
+
+
+def evidence(i):
+    return {'id': 'evidence%i' % i,
+            'target': {'id': 'ENSG%011i' % i, 'gene_info': {'symbol': 'GENE%i' % i, 'name': 'gene number %i' % i}},
+            'disease': {'id': 'EFO_%07i' % i, 'efo_info': {'label': 'disease %i' % i,
+                                                          'therapeutic_area': {'codes': ['EFO_0000616'],
+                                                                               'labels': ['neoplasm']}}},
+            'scores': {'association_score': 0.5 + i % 50 / 100.},
+            'sourceID': 'europepmc',
+            'type': 'literature',
+            'literature': {'references': [{'lit_id': 'http://europepmc.org/abstract/MED/%i' % i}]},
+            'evidence': {'date_asserted': '2020-09-01T00:00:00Z', 'is_associated': True,
+                         'literature_ref': {'mined_sentences': [{'text': u'sentence %i \u03b1' % i}] * 3}},
+            }
+
+
+def main():
+    # same key order as elasticsearch
+    hits = [OrderedDict([('_source', evidence(i)), ('sort', ['evidence%i' % i])]) for i in range(ROWS)]
+    raw = json.dumps(OrderedDict([('took', 10),
+                                  ('hits', OrderedDict([('total', {'value': ROWS, 'relation': 'eq'}),
+                                                        ('hits', hits)]))]),
+                     separators=(',', ':'))
+    page = {'data': [h['_source'] for h in hits], 'total': ROWS, 'took': 10, 'size': ROWS, 'from': 0}
+
+    def decode_and_encode(encoder):
+        res = ujson.loads(raw)
+        return dumps(dict(page, data=[h['_source'] for h in res['hits']['hits']]), encoder)
+
+    def splice():
+        res, sources, _ = split_raw_hits(raw)
+        return dumps(dict(page, data=sources))
+
+    assert json.loads(splice()) == json.loads(decode_and_encode('json'))
+    timings = [('encode, json', lambda: dumps(page, 'json')),
+               ('encode, ujson', lambda: dumps(page, 'ujson')),
+               ('decode + encode, json', lambda: decode_and_encode('json')),
+               ('decode + encode, ujson', lambda: decode_and_encode('ujson')),
+               ('raw splicing', splice),
+               ]
+    print('%i rows, %.1f MB' % (ROWS, len(raw) / 1e6))
+    for name, run in timings:
+        took = min(timeit.repeat(run, number=1, repeat=REPEAT))
+        print('%-24s %8.1f ms' % (name, took * 1000))
+
+
+if __name__ == '__main__':
+    main()
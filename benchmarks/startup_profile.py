@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+'''
+Profiles the start of a worker: the time spent importing every module (the
+modules imported by each one included, and on their own) and the time of
+each phase of create_app. It must run in a fresh interpreter to see the
+imports, so it is a script rather than a manage.py command body.
+
+run from the repository root with:  python benchmarks/startup_profile.py [config] [top]
+or with:  python manage.py profile_startup
+'''
+import __builtin__
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+_import = __builtin__.__import__
+_stack = []
+# module name -> [time including nested imports, time excluding them]
+timings = {}
+
+
+def timed_import(name, globals=None, locals=None, fromlist=None, level=-1):
+    if name in sys.modules:
+        return _import(name, globals, locals, fromlist, level)
+    _stack.append(0.)
+    start = time.time()
+    try:
+        return _import(name, globals, locals, fromlist, level)
+    finally:
+        took = time.time() - start
+        nested = _stack.pop()
+        if _stack:
+            _stack[-1] += took
+        timing = timings.setdefault(name, [0., 0.])
+        timing[0] += took
+        timing[1] += took - nested
+
+
+def main(config_name='default', top=25):
+    __builtin__.__import__ = timed_import
+    start = time.time()
+    from app import create_app
+    imports = time.time() - start
+    __builtin__.__import__ = _import
+
+    print('imports: %.3fs' % imports)
+    print('  %-40s %10s %10s' % ('module', 'cumulative', 'self'))
+    for name, (cumulative, own) in sorted(timings.items(), key=lambda t: -t[1][0])[:top]:
+        print('  %-40s %9.1fms %9.1fms' % (name, cumulative * 1000, own * 1000))
+
+    start = time.time()
+    app = create_app(config_name)
+    print('create_app: %.3fs' % (time.time() - start))
+    for phase, took in app.extensions.get('startup_phases', []):
+        print('  %-40s %9.1fms' % (phase, took * 1000))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], top=int(sys.argv[2]) if len(sys.argv) > 2 else 25)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+'''
+Times the xml output of an evidence page with app.common.xmlstream against
+dicttoxml, which the api used before, checking that both write the same
+document when dicttoxml is installed. Also reports the size of the biggest
+chunk yielded, the most the streamed response holds besides the rows.
+
+run from the repository root with:  python benchmarks/xml_output.py
+'''
+import sys
+import timeit
+
+sys.path.insert(0, '.')
+
+from app.common.xmlstream import iter_xml, to_xml
+
+ROWS = 2000
+REPEAT = 3
+ROOT = 'cttv-api-result'
+
+
+def evidence(i):
+    return {'id': u'evidence%i' % i,
+            'target': {'id': u'ENSG%011i' % i, 'gene_info': {'symbol': u'GENE%i' % i, 'name': u'gene number %i' % i}},
+            'disease': {'id': u'EFO_%07i' % i, 'efo_info': {'label': u'disease %i' % i,
+                                                           'path': [[u'EFO_0000616', u'EFO_%07i' % i]]}},
+            'scores': {'association_score': 0.5 + i % 50 / 100.},
+            'sourceID': u'europepmc',
+            'is_direct': bool(i % 2),
+            'literature': {'references': [{'lit_id': u'http://europepmc.org/abstract/MED/%i' % i}]},
+            'evidence': {'date_asserted': u'2020-09-01T00:00:00Z', 'is_associated': True, 'unmapped': None,
+                         'literature_ref': {'mined_sentences': [{'text': u'<b>sentence</b> %i & \u03b1' % i,
+                                                                 'd_start': 10}] * 3}},
+            }
+
+
+def main():
+    page = {'data': [evidence(i) for i in range(ROWS)],
+            'total': ROWS,
+            'size': ROWS,
+            'from': 0,
+            'took': 12.5,
+            'query': {'target': [u'ENSG00000157764'], 'datastructure': u'full'}}
+
+    streamed = min(timeit.repeat(lambda: to_xml(page, custom_root=ROOT), number=1, repeat=REPEAT))
+    biggest = max(len(chunk) for chunk in iter_xml(page, custom_root=ROOT))
+    print('xmlstream  %i rows %7.1f ms, biggest chunk %i kB of %i kB' % (
+        ROWS, streamed * 1000, biggest / 1024, len(to_xml(page, custom_root=ROOT)) / 1024))
+    try:
+        from dicttoxml import dicttoxml
+    except ImportError:
+        print('dicttoxml is not installed, skipping the comparison')
+        return
+    assert dicttoxml(page, custom_root=ROOT) == to_xml(page, custom_root=ROOT)
+    whole = min(timeit.repeat(lambda: dicttoxml(page, custom_root=ROOT), number=1, repeat=REPEAT))
+    print('dicttoxml  %i rows %7.1f ms (%.1fx)' % (ROWS, whole * 1000, whole / streamed))
+
+
+if __name__ == '__main__':
+    main()
@@ -56,7 +56,6 @@ class Config:
     DATA_VERSION = env('OPENTARGETS_DATA_VERSION', default='20.09')
     # tagged version from expression_hierarchy repository must have same DATA_VERSION tag
     ES_TISSUE_MAP_URL = 'https://raw.githubusercontent.com/opentargets/expression_hierarchy/{0}/process/map_with_efos.json'
-    ES_TISSUE_MAP = None
     ## logic to point to custom indices in ES
     ES_CUSTOM_IDXS_FILENAME = basedir + os.path.sep + 'es_custom_idxs.ini'
     ES_CUSTOM_IDXS = ast.literal_eval(env('OPENTARGETS_ES_CUSTOM_IDXS',default='False'))
@@ -90,6 +89,8 @@ class Config:
     ELASTICSEARCH_DATA_SEARCH_DOC_NAME = 'search-object'
     ELASTICSEARCH_DATA_RELATION_INDEX_NAME = ES_PREFIX(name='relation-data')
     ELASTICSEARCH_DATA_RELATION_DOC_NAME = 'relation'
+    # written by `python manage.py build_reference_indexes`, one gene list per uniprot keyword
+    ELASTICSEARCH_UNIPROT_KW_LOOKUP_INDEX_NAME = ES_PREFIX(name='uniprot-kw-lookup')
     ELASTICSEARCH_LOG_EVENT_INDEX_NAME = '!eventlog'
 
     DEBUG = env('API_DEBUG', cast=bool, default=False)
@@ -139,6 +140,22 @@ class Config:
                                                   'beta.targetvalidation.org', 'localhost', '127.0.0.1'],
                       }
     REDIS_SERVER_PATH = env('REDIS_SERVER_PATH', default='/tmp/api_redis.db')
+    # local files precomputed from the indices, kept in a subfolder per DATA_VERSION
+    LOCAL_DATA_PATH = env('LOCAL_DATA_PATH', default='/tmp/api_local_data')
+    # build the missing reference indexes (autocomplete, ...) from elasticsearch when the app starts,
+    # instead of waiting for `python manage.py build_reference_indexes`
+    REFERENCE_INDEXES_BUILD_ON_START = env('REFERENCE_INDEXES_BUILD_ON_START', cast=bool, default=False)
+    # uwsgi cache2 shared by the workers for the internal cache, used in place of redis when
+    # running under uwsgi with `--cache2 name=<UWSGI_CACHE>,...`; values bigger than the limit are not cached
+    UWSGI_CACHE = env('UWSGI_CACHE', default='api')
+    UWSGI_CACHE_MAX_ITEM_SIZE = env('UWSGI_CACHE_MAX_ITEM_SIZE', cast=int, default=8 * 1024 * 1024)
+    # save the redis internal cache to a file per data and api version when the app exits, and load
+    # it back in a background thread when it starts, so restarts and deploys do not start with an
+    # empty cache. Off by default, as create_app also runs for tests and manage.py commands; under
+    # uwsgi the thread needs --enable-threads. The uwsgi cache is persisted by the `store` option of
+    # --cache2 instead, see docker/supervisord.conf
+    CACHE_SNAPSHOT_ON_EXIT = env('CACHE_SNAPSHOT_ON_EXIT', cast=bool, default=False)
+    CACHE_SNAPSHOT_RESTORE_ON_START = env('CACHE_SNAPSHOT_RESTORE_ON_START', cast=bool, default=False)
 
     SECRET_PATH = env('SECRET_PATH', default='app/authconf/')
     SECRET_IP_RESOLVER_FILE = env('SECRET_IP_RESOLVER_FILE', default='ip_list.csv')
@@ -146,6 +163,61 @@ class Config:
 
     NO_CACHE_PARAMS = 'no_cache'
 
+    # best hit search: max phrases per request, phrases per msearch chunk,
+    # chunks searched at the same time and seconds allowed to each chunk
+    BEST_HIT_MAX_PHRASES = env('BEST_HIT_MAX_PHRASES', cast=int, default=2000)
+    BEST_HIT_CHUNK_SIZE = env('BEST_HIT_CHUNK_SIZE', cast=int, default=50)
+    BEST_HIT_CONCURRENCY = env('BEST_HIT_CONCURRENCY', cast=int, default=8)
+    BEST_HIT_CHUNK_TIMEOUT = env('BEST_HIT_CHUNK_TIMEOUT', cast=int, default=30)
+
+    # seconds the association facets are cached for, keyed by the filters and not by the page or sort
+    ASSOCIATION_FACETS_CACHE_TTL = env('ASSOCIATION_FACETS_CACHE_TTL', cast=int, default=60 * 60)
+    # compute the association facets in concurrent sub-requests, a group of facets each and
+    # every other facet on its own, stopped after ASSOCIATION_FACET_TIMEOUT seconds or the
+    # budget of the facet in ASSOCIATION_FACET_TIMEOUTS. Facets out of time come back incomplete
+    ASSOCIATION_FACETS_SPLIT = env('ASSOCIATION_FACETS_SPLIT', cast=bool, default=False)
+    ASSOCIATION_FACET_GROUPS = [['direct', 'scorevalue_range', 'therapeutic_area', 'datatype'],
+                                ['rna_expression_level', 'rna_expression_tissue',
+                                 'zscore_expression_level', 'zscore_expression_tissue',
+                                 'protein_expression_level', 'protein_expression_tissue'],
+                                ]
+    ASSOCIATION_FACET_TIMEOUT = env('ASSOCIATION_FACET_TIMEOUT', cast=int, default=10)
+    ASSOCIATION_FACET_TIMEOUTS = {'go': 20,
+                                  'pathway': 20,
+                                  }
+
+    # uniprotkw filters matching more genes than this use a terms lookup instead of listing the genes
+    UNIPROT_KW_LOOKUP_THRESHOLD = env('UNIPROT_KW_LOOKUP_THRESHOLD', cast=int, default=1024)
+
+    # json encoder of the responses, one of app.common.encoding.ENCODERS
+    JSON_ENCODER = env('JSON_ENCODER', default='ujson')
+    # serve evidence pages by splicing the _source of the hits as returned by elasticsearch,
+    # without decoding and encoding them again (json and ndjson output only)
+    ES_RAW_SOURCE_SPLICING = env('ES_RAW_SOURCE_SPLICING', cast=bool, default=False)
+
+    # response compression, see app.common.compression: encodings in order of preference, bodies
+    # smaller than COMPRESS_MIN_SIZE are not compressed, bigger than COMPRESS_LARGE_SIZE and
+    # streamed ones are compressed at the faster levels
+    COMPRESS_ENCODINGS = ['zstd', 'br', 'gzip']
+    COMPRESS_MIMETYPES = ['application/json',
+                          'application/x-ndjson',
+                          'application/vnd.apache.arrow.stream',
+                          'text/xml',
+                          'text/csv',
+                          'text/tab-separated-values',
+                          'text/html',
+                          'text/css',
+                          'application/javascript',
+                          ]
+    COMPRESS_MIN_SIZE = env('COMPRESS_MIN_SIZE', cast=int, default=500)
+    COMPRESS_LARGE_SIZE = env('COMPRESS_LARGE_SIZE', cast=int, default=1024 * 1024)
+    COMPRESS_LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+    COMPRESS_FAST_LEVELS = {'zstd': 1, 'br': 1, 'gzip': 1}
+    COMPRESS_STREAMS = env('COMPRESS_STREAMS', cast=bool, default=True)
+    # compressed bodies of at least COMPRESS_CACHE_MIN_SIZE are kept in the internal cache, 0 to disable
+    COMPRESS_CACHE_TTL = env('COMPRESS_CACHE_TTL', cast=int, default=60 * 60)
+    COMPRESS_CACHE_MIN_SIZE = env('COMPRESS_CACHE_MIN_SIZE', cast=int, default=8 * 1024)
+
     MIXPANEL_TOKEN = env('MIXPANEL_TOKEN', default=None)
 
     @staticmethod
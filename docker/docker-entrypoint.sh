@@ -5,6 +5,10 @@ sysctl -w net.core.somaxconn=65535 || echo "Could not increase maximum connectio
 OUTPUT="$(sysctl net.core.somaxconn)"
 echo $OUTPUT
 export SOCKET_MAX_CONN="${OUTPUT##* }"
+
+# the uwsgi cache is kept in a file per data version, so a restart starts with the cache it left
+export UWSGI_CACHE_STORE="${LOCAL_DATA_PATH:-/tmp/api_local_data}/${OPENTARGETS_DATA_VERSION:-20.09}/uwsgi_cache_api.store"
+mkdir -p "$(dirname "$UWSGI_CACHE_STORE")"
 #cp -r /pipeline/source/* /var/www/app/ || echo "no source to copy"
 
 exec "$@"
\ No newline at end of file
@@ -21,6 +21,8 @@ if os.environ.get('FLASK_COVERAGE'):
 
 
 from app import create_app
+from app.common import load_tissue_map, TISSUE_MAP_CACHE
+from app.common.snapshots import snapshot_path
 # from app.models import User, Follow, Role, Permission, Post, Comment
 from flask_script import Manager, Shell
 
@@ -134,5 +136,56 @@ def list_routes():
     for line in sorted(output):
         print line
 
+@manager.command
+def build_known_drug_store():
+    """Precompute the known drug summaries for every target and disease of the current data version."""
+    from app.common.knowndrug import KnownDrugStore
+    store = KnownDrugStore.build(app.extensions['esquery'])
+    app.extensions['esquery'].known_drug_store = store
+    print('known drug store for data version %s saved in %s' % (app.config['DATA_VERSION'], store.path))
+
+@manager.command
+def build_reference_indexes():
+    """Build the local indexes used in place of elasticsearch (autocomplete, ...) and cache the tissue map for the current data version."""
+    es = app.extensions['esquery']
+    for attribute, index_class in es.REFERENCE_INDEXES:
+        setattr(es, attribute, index_class.build(es))
+        print('%s for data version %s built' % (attribute, app.config['DATA_VERSION']))
+    load_tissue_map()
+    if os.path.exists(snapshot_path(TISSUE_MAP_CACHE)):
+        print('tissue map for data version %s cached' % app.config['DATA_VERSION'])
+
+@manager.command
+def profile_startup(config_name='default', top=25):
+    """Time the imports and the app factory phases of a worker start, in a fresh interpreter."""
+    import subprocess
+    sys.exit(subprocess.call([sys.executable, 'benchmarks/startup_profile.py', config_name, str(top)]))
+
+@manager.command
+def compile_openapi():
+    """Precompile the openapi yaml template into the json served by the app."""
+    from app.common.openapi import compile_openapi as compile_spec
+    print('openapi definition saved in %s' % compile_spec())
+
+@manager.command
+def snapshot_cache():
+    """Save the internal cache to a file bound to the current data and api version."""
+    cache = app.extensions['esquery'].cache
+    saved = cache.snapshot()
+    if saved is None:
+        print('the internal cache does not support snapshots')
+    else:
+        print('%i keys saved in %s' % (saved, cache.get_snapshot_path()))
+
+@manager.command
+def restore_cache():
+    """Load the last snapshot of the internal cache for the current data and api version."""
+    cache = app.extensions['esquery'].cache
+    restored = cache.restore()
+    if restored is None:
+        print('no snapshot to restore')
+    else:
+        print('%i keys restored from %s' % (restored, cache.get_snapshot_path()))
+
 if __name__ == '__main__':
     manager.run()
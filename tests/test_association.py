@@ -1,8 +1,12 @@
+import shutil
+import tempfile
 import ujson as json
 import unittest
 
 from config import Config
 from app import create_app
+from app.common.columnar import association_columns, pyarrow_available
+from app.common.reactome import ReactomeIndex
 from app.common.request_templates import FilterTypes
 from tests import GenericTestCase
 
@@ -206,6 +210,38 @@ class AssociationTestCase(GenericTestCase):
         self.assertTrue('disease' in json_response['facets'])
         self.assertEqual(len(json_response['facets']['disease']['buckets']), facets_size)
 
+    def testAssociationFacetsIndependentOfPage(self):
+        target = 'ENSG00000157764'
+        facets = []
+        for page in [{'from': 0, 'size': 10},
+                     {'from': 10, 'size': 10, 'sort': 'association_score.datatypes.literature'},
+                     ]:
+            data = {'target': target, 'facets': "true"}
+            data.update(page)
+            response = self._make_request('/platform/public/association/filter',
+                                          data=data,
+                                          token=self._AUTO_GET_TOKEN)
+            self.assertTrue(response.status_code == 200)
+            json_response = json.loads(response.data.decode('utf-8'))
+            self.assertNotIn('facets_pending', json_response)
+            facets.append(json_response['facets'])
+        self.assertEqual(facets[0], facets[1])
+
+    def testAssociationFacetsSplit(self):
+        target = 'ENSG00000157764'
+        facets = {}
+        try:
+            for split in [False, True]:
+                self.app.config['ASSOCIATION_FACETS_SPLIT'] = split
+                response = self._make_request('/platform/public/association/filter',
+                                              data={'target': target, 'facets': "true", 'no_cache': True},
+                                              token=self._AUTO_GET_TOKEN)
+                self.assertTrue(response.status_code == 200)
+                facets[split] = json.loads(response.data.decode('utf-8'))['facets']
+        finally:
+            self.app.config['ASSOCIATION_FACETS_SPLIT'] = False
+        self.assertEqual(facets[False], facets[True])
+
     def testAssociationFilterDiseaseGet(self):
         disease = 'EFO_0000311'
         response = self._make_request('/platform/public/association/filter',
@@ -217,6 +253,40 @@ class AssociationTestCase(GenericTestCase):
         self.assertGreaterEqual(len(json_response['data']),10, 'minimum default returned')
         self.assertEqual(json_response['data'][0]['disease']['id'], disease)
 
+    def testAssociationFilterDiseasePathwayFacet(self):
+        disease = 'EFO_0000311'
+        es = self.app.extensions['esquery']
+        local_data_path = Config.LOCAL_DATA_PATH
+        previous_index = es.reactome_index
+        Config.LOCAL_DATA_PATH = tempfile.mkdtemp()
+        try:
+            reactome_index = ReactomeIndex.build(es)
+            facets = []
+            for index in [None, reactome_index]:
+                es.reactome_index = index
+                response = self._make_request('/platform/public/association/filter',
+                                              data={'disease': disease,
+                                                    'facets': FilterTypes.PATHWAY,
+                                                    'size': 0,
+                                                    'no_cache': True,
+                                                    },
+                                              token=self._AUTO_GET_TOKEN)
+                self.assertTrue(response.status_code == 200)
+                json_response = json.loads(response.data.decode('utf-8'))
+                first_filter = json_response['facets'][FilterTypes.PATHWAY]['buckets'][0]
+                self.assertNotEqual(first_filter['label'], first_filter['key'])
+                self.assertEqual(first_filter['type'], 'pathway_type')
+                for sub_bucket in first_filter['pathway']['buckets']:
+                    self.assertTrue(sub_bucket['label'])
+                    self.assertEqual(sub_bucket['type'], 'pathway')
+                facets.append(json_response['facets'][FilterTypes.PATHWAY])
+            # labels and types from the local index are the ones read from elasticsearch
+            self.assertEqual(facets[0], facets[1])
+        finally:
+            es.reactome_index = previous_index
+            shutil.rmtree(Config.LOCAL_DATA_PATH)
+            Config.LOCAL_DATA_PATH = local_data_path
+
     def testAssociationFilterDiseaseTargetClassFacet(self):
         disease = 'EFO_0000311'
         response = self._make_request('/platform/public/association/filter',
@@ -611,6 +681,103 @@ class AssociationTestCase(GenericTestCase):
         '''check response size is equal to requeste size +header and empty final line'''
         self.assertEqual(len(full_response.split('\n')), (size + 2))
 
+    def testAssociationNdjsonExport(self):
+
+        disease = 'EFO_0000311'
+        size = 100
+        response = self._make_request('/platform/public/association/filter',
+                                      data={'disease': disease,
+                                            'size': size,
+                                            'format': 'ndjson',
+                                            },
+                                      token=self._AUTO_GET_TOKEN)
+        self.assertTrue(response.status_code == 200)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = response.data.decode('utf-8').split('\n')
+        '''one line per row, the trailer and the empty final line'''
+        self.assertEqual(len(lines), size + 2)
+        self.assertEqual(lines[-1], '')
+        for line in lines[:size]:
+            self.assertIn('association_score', json.loads(line))
+        trailer = json.loads(lines[size])
+        self.assertNotIn('data', trailer)
+        self.assertEqual(trailer['size'], size)
+        self.assertGreaterEqual(trailer['total'], size)
+        self.assertIn('data_version', trailer)
+
+    def testAssociationColumnar(self):
+        target = 'ENSG00000157764'
+        response = self._make_request('/platform/public/association/filter',
+                                      data={'target': target,
+                                            'size': 20,
+                                            'datastructure': 'columnar',
+                                            },
+                                      token=self._AUTO_GET_TOKEN)
+        self.assertTrue(response.status_code == 200)
+        json_response = json.loads(response.data.decode('utf-8'))
+        columns = json_response['data']['columns']
+        dictionaries = json_response['data']['dictionaries']
+        self.assertEqual(json_response['data']['fields'], [c.name for c in association_columns()])
+        self.assertEqual(len(columns['association_score.overall']), json_response['size'])
+        self.assertEqual(dictionaries['target.id'], [target])
+        self.assertEqual(set(columns['target.id']), set([0]))
+
+    @unittest.skipUnless(pyarrow_available(), "needs pyarrow")
+    def testAssociationArrowExport(self):
+        import pyarrow
+
+        disease = 'EFO_0000311'
+        size = 100
+        response = self._make_request('/platform/public/association/filter',
+                                      data={'disease': disease,
+                                            'size': size,
+                                            'format': 'arrow',
+                                            },
+                                      token=self._AUTO_GET_TOKEN)
+        self.assertTrue(response.status_code == 200)
+        table = pyarrow.ipc.open_stream(pyarrow.py_buffer(response.data)).read_all()
+        self.assertEqual(table.num_rows, size)
+        self.assertEqual(table.schema.names, [c.name for c in association_columns()])
+        for score in table.column('association_score.overall').to_pylist():
+            self.assertLessEqual(score, 1)
+
+    @unittest.skipUnless(pyarrow_available(), "needs pyarrow")
+    def testAssociationArrowExportWithAcceptHeader(self):
+        import pyarrow
+
+        disease = 'EFO_0000311'
+        size = 10
+        response = self._make_request('/platform/public/association/filter',
+                                      data={'disease': disease,
+                                            'size': size,
+                                            'format': 'arrow',
+                                            },
+                                      headers={'Accept': 'application/json'},
+                                      token=self._AUTO_GET_TOKEN)
+        self.assertTrue(response.status_code == 200)
+        self.assertEqual(response.mimetype, 'application/vnd.apache.arrow.stream')
+        table = pyarrow.ipc.open_stream(pyarrow.py_buffer(response.data)).read_all()
+        self.assertEqual(table.num_rows, size)
+
+    @unittest.skipUnless(pyarrow_available(), "needs pyarrow")
+    def testAssociationParquetExport(self):
+        import pyarrow
+        import pyarrow.parquet as pq
+
+        disease = 'EFO_0000311'
+        size = 100
+        response = self._make_request('/platform/public/association/filter',
+                                      data={'disease': disease,
+                                            'size': size,
+                                            'format': 'parquet',
+                                            },
+                                      token=self._AUTO_GET_TOKEN)
+        self.assertTrue(response.status_code == 200)
+        self.assertEqual(response.mimetype, 'application/vnd.apache.parquet')
+        table = pq.read_table(pyarrow.BufferReader(response.data))
+        self.assertEqual(table.num_rows, size)
+        self.assertEqual(table.schema.names, [c.name for c in association_columns()])
+
     # @unittest.skip("testAssociationScoreCap")
     def testAssociationScoreCap(self):
         response = self._make_request('/platform/public/association/filter',
@@ -0,0 +1,89 @@
+import shutil
+import tempfile
+import types
+import unittest
+
+from app.common.autocomplete import AutocompleteIndex
+from app.common.elasticsearchclient import esQuery
+from config import Config
+
+__author__ = 'andreap'
+
+
+class StubQuery(object):
+    _index_search = 'search-data'
+
+    def __init__(self, suggestions):
+        self.suggestions = suggestions
+
+    def get_search_suggestions(self):
+        return iter(self.suggestions)
+
+
+class AutocompleteTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._local_data_path = Config.LOCAL_DATA_PATH
+        Config.LOCAL_DATA_PATH = tempfile.mkdtemp()
+        self.index = AutocompleteIndex.build(StubQuery([
+            ('ENSG00000012048', [{'input': [u'BRCA1', u'breast cancer 1'], 'weight': 50}]),
+            ('ENSG00000139618', [{'input': [u'BRCA2', u'breast cancer 2'], 'weight': 40}]),
+            ('EFO_0000305', {'input': u'Breast  Carcinoma', 'weight': 100}),
+            ('EFO_0000483', [u'breastfeeding']),
+            ('ENSG00000141510', [{'input': u'TP53', 'weight': 70}]),
+        ]))
+
+    def tearDown(self):
+        shutil.rmtree(Config.LOCAL_DATA_PATH)
+        Config.LOCAL_DATA_PATH = self._local_data_path
+
+    def _ids(self, prefix, size=10):
+        return [option['_id'] for option in self.index.complete(prefix, size)]
+
+    def testPrefixLookup(self):
+        self.assertEqual(self._ids(u'tp'), ['ENSG00000141510'])
+        self.assertEqual(self._ids(u'TP53'), ['ENSG00000141510'])
+        self.assertEqual(sorted(self._ids(u'brca')), ['ENSG00000012048', 'ENSG00000139618'])
+        option = self.index.complete(u'tp5', 1)[0]
+        self.assertEqual(option, {'text': u'TP53', '_index': 'search-data',
+                                  '_id': 'ENSG00000141510', '_score': 70.0})
+
+    def testTopByWeight(self):
+        self.assertEqual(self._ids(u'breast'),
+                         ['EFO_0000305', 'ENSG00000012048', 'ENSG00000139618', 'EFO_0000483'])
+        self.assertEqual(self._ids(u'breast', size=2), ['EFO_0000305', 'ENSG00000012048'])
+        # a document matching with several inputs is returned once
+        self.assertEqual(self._ids(u'b'), self._ids(u'breast'))
+
+    def testTrailingSpace(self):
+        self.assertEqual(AutocompleteIndex.normalise(u' Breast   Cancer '), u'breast cancer ')
+        self.assertEqual(AutocompleteIndex.normalise(u'breast'), u'breast')
+        self.assertEqual(AutocompleteIndex.normalise(u'  '), u'')
+        self.assertNotIn('EFO_0000483', self._ids(u'breast '))
+        self.assertEqual(self._ids(u'breast  c'), ['EFO_0000305', 'ENSG00000012048', 'ENSG00000139618'])
+
+    def testMiss(self):
+        self.assertEqual(self.index.complete(u'zzz', 10), [])
+        self.assertEqual(self.index.complete(u'tp53 ', 10), [])
+        self.assertEqual(self.index.complete(u'tp', 0), [])
+
+    def testFallbackOnMiss(self):
+        es = types.InstanceType(esQuery)
+        es.autocomplete_index = self.index
+        es._index_search = 'search-data'
+        searches = []
+        es_option = {'text': u'zebrafish', '_id': 'zfin'}
+
+        def cached_search(**kwargs):
+            searches.append(kwargs)
+            return {'suggest': {'autocomplete': [{'options': [es_option]}]}}
+        es._cached_search = cached_search
+
+        self.assertEqual(es.autocomplete(u'TP', size=3).data[0]['_id'], 'ENSG00000141510')
+        self.assertEqual(searches, [])
+        self.assertEqual(es.autocomplete(u'Zebra', size=3).data, [es_option])
+        self.assertEqual(searches[0]['body']['suggest']['autocomplete']['prefix'], u'zebra')
+
+
+if __name__ == "__main__":
+    unittest.main()
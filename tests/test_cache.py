@@ -3,6 +3,7 @@ import unittest
 import ujson as json
 import requests
 import time
+import zlib
 
 from flask import url_for
 
@@ -47,6 +48,24 @@ class InternalCacheTestCase(GenericTestCase):
         self.assertTrue(response.status_code == 200)
         self.assertGreater(third_time, second_time)
 
+    def testCompressedResponseCacheWorks(self):
+        response = self._make_request('/platform/swagger',
+                                      headers={'Accept-Encoding': 'gzip'})
+        self.assertTrue(response.status_code == 200)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        swagger = json.loads(zlib.decompress(response.data, 31))
+        self.assertIn('paths', swagger)
+        response = self._make_request('/platform/swagger',
+                                      headers={'Accept-Encoding': 'gzip'})
+        self.assertTrue(response.status_code == 200)
+        '''same body, compressed once'''
+        self.assertEqual(float(response.headers['X-API-Compress-Took']), 0.)
+        self.assertGreater(float(response.headers['X-API-Compress-Saved']), 0.)
+        self.assertEqual(json.loads(zlib.decompress(response.data, 31)), swagger)
+        response = self._make_request('/platform/swagger',
+                                      headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(json.loads(response.data), swagger)
 
 
 
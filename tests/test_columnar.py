@@ -0,0 +1,55 @@
+import unittest
+
+from app.common.columnar import infer_columns, iter_arrow_stream, iter_parquet, pyarrow_available
+
+__author__ = 'andreap'
+
+
+def _rows(n):
+    return [{'target': {'id': u'ENSG%011i' % i, 'symbols': [u'S%i' % i]},
+             'score': i / float(n),
+             'count': i,
+             'direct': bool(i % 2)}
+            for i in range(n)]
+
+
+@unittest.skipUnless(pyarrow_available(), "needs pyarrow")
+class ColumnarTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = _rows(25)
+        self.columns = infer_columns(self.rows)
+
+    def testArrowStream(self):
+        import pyarrow
+        chunks = list(iter_arrow_stream(self.rows, self.columns, batch_rows=10))
+        # schema, a chunk per record batch and the end of stream
+        self.assertEqual(len(chunks), 5)
+        table = pyarrow.ipc.open_stream(pyarrow.py_buffer(''.join(chunks))).read_all()
+        self.assertEqual(table.num_rows, 25)
+        self.assertEqual(table.column('target.id').to_pylist(), [r['target']['id'] for r in self.rows])
+
+    def testParquetStreamedByRowGroup(self):
+        import pyarrow
+        import pyarrow.parquet as pq
+        chunks = list(iter_parquet(self.rows, self.columns, batch_rows=10))
+        # a chunk per row group and the footer
+        self.assertEqual(len(chunks), 4)
+        self.assertTrue(all(chunks))
+        parquet_file = pq.ParquetFile(pyarrow.BufferReader(''.join(chunks)))
+        self.assertEqual(parquet_file.num_row_groups, 3)
+        table = parquet_file.read()
+        self.assertEqual(table.num_rows, 25)
+        self.assertEqual(table.column('count').to_pylist(), range(25))
+        self.assertEqual(table.column('target.symbols').to_pylist(), [r['target']['symbols'] for r in self.rows])
+
+    def testParquetWithoutRows(self):
+        import pyarrow
+        import pyarrow.parquet as pq
+        table = pq.read_table(pyarrow.BufferReader(''.join(iter_parquet([], self.columns))))
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.schema.names, [c.name for c in self.columns])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import zlib
+import unittest
+
+from flask import Flask, Response
+
+from app.common.compression import ResponseCompressor, choose_encoding, compress, iter_compressed
+from config import Config
+
+__author__ = 'andreap'
+
+ENCODINGS = ['zstd', 'br', 'gzip']
+
+
+def _body(n):
+    return ''.join('{"id":"ENSG%011i","score":%r}\n' % (i, i / 7.) for i in range(n))
+
+
+class ChooseEncodingTestCase(unittest.TestCase):
+
+    def testPreferenceAmongEqualQualities(self):
+        self.assertEqual(choose_encoding('gzip, deflate, br', ENCODINGS), 'br')
+        self.assertEqual(choose_encoding('gzip, zstd, br', ENCODINGS), 'zstd')
+        self.assertEqual(choose_encoding('GZIP', ENCODINGS), 'gzip')
+
+    def testQualities(self):
+        self.assertEqual(choose_encoding('br;q=0.5, gzip', ENCODINGS), 'gzip')
+        self.assertEqual(choose_encoding('br;q=0.5, gzip;q=0.4', ENCODINGS), 'br')
+        self.assertEqual(choose_encoding('br; q=0.1 ,gzip ; q = 0.2', ENCODINGS), 'gzip')
+        self.assertEqual(choose_encoding('br;q=bad, gzip;q=0.9', ENCODINGS), 'br')
+
+    def testQualityAfterOtherParameters(self):
+        self.assertEqual(choose_encoding('br;level=5;q=0.2, gzip;q=0.3', ENCODINGS), 'gzip')
+        self.assertEqual(choose_encoding('br;level=5;q=0, gzip;x=y', ENCODINGS), 'gzip')
+
+    def testIdentity(self):
+        self.assertIsNone(choose_encoding('', ENCODINGS))
+        self.assertIsNone(choose_encoding('identity', ENCODINGS))
+        self.assertIsNone(choose_encoding('deflate, ,', ENCODINGS))
+        self.assertIsNone(choose_encoding('gzip;q=0, br;q=0', ENCODINGS))
+        self.assertIsNone(choose_encoding('gzip', []))
+
+    def testWildcard(self):
+        self.assertEqual(choose_encoding('*', ENCODINGS), 'zstd')
+        self.assertEqual(choose_encoding('*;q=0.1, gzip', ENCODINGS), 'gzip')
+        self.assertEqual(choose_encoding('*, zstd;q=0', ENCODINGS), 'br')
+
+
+class CompressionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config.from_object(Config)
+        self.app.config['COMPRESS_ENCODINGS'] = ['gzip']
+        self.app.config['COMPRESS_CACHE_TTL'] = 0
+        self.compressor = ResponseCompressor(self.app)
+        body = _body(20000)
+
+        @self.app.route('/stream')
+        def stream():
+            return Response((body[i:i + 4096] for i in range(0, len(body), 4096)), mimetype='application/x-ndjson')
+
+        @self.app.route('/body')
+        def plain():
+            return Response(body, mimetype='application/json')
+
+        self.body = body
+
+    def testIterCompressedStats(self):
+        stats = {'cpu': 0., 'bytes': 0, 'compressed_bytes': 0}
+        chunks = list(iter_compressed([self.body[:1000], '', self.body[1000:]], 'gzip', 1, stats))
+        self.assertEqual(zlib.decompress(''.join(chunks), 31), self.body)
+        self.assertEqual(stats['bytes'], len(self.body))
+        self.assertEqual(stats['compressed_bytes'], len(''.join(chunks)))
+        self.assertGreater(stats['cpu'], 0)
+
+    def testStreamedResponseInStats(self):
+        with self.app.test_client() as client:
+            response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+            data = response.get_data()
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('X-API-Compress-Took', response.headers)
+        self.assertEqual(zlib.decompress(data, 31), self.body)
+        stats = self.compressor.stats
+        self.assertEqual(stats['streamed'], 1)
+        self.assertEqual(stats['bytes'], len(self.body))
+        self.assertEqual(stats['compressed_bytes'], len(data))
+        self.assertGreater(stats['cpu'], 0)
+
+    def testBodyResponse(self):
+        with self.app.test_client() as client:
+            response = client.get('/body', headers={'Accept-Encoding': 'br;q=1, gzip;level=1;q=0.5'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('X-API-Compress-Took', response.headers)
+        self.assertEqual(response.get_data(), compress(self.body, 'gzip', Config.COMPRESS_LEVELS['gzip']))
+        self.assertEqual(response.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(self.compressor.stats['compressed'], 1)
+
+    def testNotAccepted(self):
+        with self.app.test_client() as client:
+            response = client.get('/body', headers={'Accept-Encoding': 'gzip;level=1;q=0'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.get_data(), self.body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import shutil
+import tempfile
+import unittest
+
+from app.common.efograph import EfoGraph
+from config import Config
+
+__author__ = 'andreap'
+
+DISEASE = 'EFO_0000408'
+CANCER = 'EFO_0000311'
+RESPIRATORY = 'EFO_0000684'
+LUNG_CARCINOMA = 'EFO_0001071'
+NSCLC = 'EFO_0003060'
+ASTHMA = 'EFO_0000270'
+
+
+class StubQuery(object):
+    '''a small DAG: lung carcinoma has two parents, and so two therapeutic areas'''
+
+    def get_efo_nodes(self):
+        return [(NSCLC, u'non-small cell lung carcinoma',
+                 [[DISEASE, CANCER, LUNG_CARCINOMA, NSCLC], [DISEASE, RESPIRATORY, LUNG_CARCINOMA, NSCLC]],
+                 [CANCER, RESPIRATORY]),
+                (LUNG_CARCINOMA, u'lung carcinoma',
+                 [[DISEASE, CANCER, LUNG_CARCINOMA], [DISEASE, RESPIRATORY, LUNG_CARCINOMA]],
+                 [CANCER, RESPIRATORY]),
+                (ASTHMA, u'asthma', [[DISEASE, RESPIRATORY, ASTHMA]], [RESPIRATORY]),
+                (CANCER, u'cancer', [[DISEASE, CANCER]], [CANCER]),
+                (RESPIRATORY, u'respiratory system disease', [[DISEASE, RESPIRATORY]], [RESPIRATORY]),
+                (DISEASE, None, [[DISEASE]], []),
+                ]
+
+
+class EfoGraphTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._local_data_path = Config.LOCAL_DATA_PATH
+        Config.LOCAL_DATA_PATH = tempfile.mkdtemp()
+        self.graph = EfoGraph.build(StubQuery())
+
+    def tearDown(self):
+        shutil.rmtree(Config.LOCAL_DATA_PATH)
+        Config.LOCAL_DATA_PATH = self._local_data_path
+
+    def testGetLabel(self):
+        self.assertEqual(self.graph.get_label(NSCLC), u'non-small cell lung carcinoma')
+        self.assertEqual(self.graph.get_label(u'EFO_0000270'), u'asthma')
+        # terms without a label are labelled with their code
+        self.assertEqual(self.graph.get_label(DISEASE), DISEASE)
+
+    def testGetAncestors(self):
+        self.assertEqual(self.graph.get_ancestors(NSCLC), sorted([DISEASE, CANCER, RESPIRATORY, LUNG_CARCINOMA]))
+        self.assertEqual(self.graph.get_ancestors(ASTHMA), sorted([DISEASE, RESPIRATORY]))
+        self.assertEqual(self.graph.get_ancestors(DISEASE), [])
+
+    def testGetDescendants(self):
+        self.assertEqual(self.graph.get_descendants(DISEASE),
+                         sorted([CANCER, RESPIRATORY, LUNG_CARCINOMA, NSCLC, ASTHMA]))
+        self.assertEqual(self.graph.get_descendants(RESPIRATORY), sorted([LUNG_CARCINOMA, NSCLC, ASTHMA]))
+        self.assertEqual(self.graph.get_descendants(CANCER), sorted([LUNG_CARCINOMA, NSCLC]))
+        self.assertEqual(self.graph.get_descendants(NSCLC), [])
+
+    def testGetTherapeuticAreas(self):
+        self.assertEqual(self.graph.get_therapeutic_areas(NSCLC), sorted([CANCER, RESPIRATORY]))
+        self.assertEqual(self.graph.get_therapeutic_areas(ASTHMA), [RESPIRATORY])
+        self.assertEqual(self.graph.get_therapeutic_areas(DISEASE), [])
+
+    def testUnknownCodes(self):
+        for code in ['EFO_9999999', u'', 'ZZZ']:
+            self.assertNotIn(code, self.graph)
+            self.assertIsNone(self.graph.get_label(code))
+            self.assertEqual(self.graph.get_ancestors(code), [])
+            self.assertEqual(self.graph.get_descendants(code), [])
+            self.assertEqual(self.graph.get_therapeutic_areas(code), [])
+        self.assertIn(ASTHMA, self.graph)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import unittest
+
+import ujson
+
+from app.common.encoding import RawJSON, dumps, split_raw_hits
+
+__author__ = 'andreap'
+
+
+def _raw_response(hits):
+    '''compact json in the key order of elasticsearch: _source first in the hits, hits last'''
+    def compact(obj):
+        return json.dumps(obj, separators=(',', ':'), sort_keys=True)
+
+    encoded_hits = []
+    for hit in hits:
+        encoded = '{"_source":%s' % compact(hit['_source'])
+        if 'sort' in hit:
+            encoded += ',"sort":%s' % compact(hit['sort'])
+        encoded_hits.append(encoded + '}')
+    return '{"took":3,"hits":{"total":{"value":%i,"relation":"eq"},"hits":[%s]}}' % (len(hits),
+                                                                                    ','.join(encoded_hits))
+
+
+class EncodingTestCase(unittest.TestCase):
+
+    def testUjsonRoundTrip(self):
+        obj = {'score': 0.123456789012345678,
+               'url': 'http://identifiers.org/efo/EFO_0000311'}
+        encoded = dumps(obj, encoder='ujson')
+        self.assertEqual(json.loads(encoded), obj)
+        self.assertIn('http://identifiers.org', encoded)
+        # encoded by ujson, not by the json fallback
+        self.assertEqual(encoded, ujson.dumps(obj, escape_forward_slashes=False))
+
+    def testRawJSONSpliced(self):
+        encoded = dumps({'data': [RawJSON('{"id":1}'), RawJSON('{"id":2}')], 'total': 2})
+        self.assertEqual(json.loads(encoded), {'data': [{'id': 1}, {'id': 2}], 'total': 2})
+
+    def testSplitRawHitsEmpty(self):
+        response, sources, sort = split_raw_hits(_raw_response([]))
+        self.assertEqual(sources, [])
+        self.assertIsNone(sort)
+        self.assertEqual(response['hits']['total']['value'], 0)
+
+    def testSplitRawHitsSingle(self):
+        hits = [{'_source': {'id': 'a', 'scores': {'association_score': 0.5}}, 'sort': [0.5, 'a']}]
+        response, sources, sort = split_raw_hits(_raw_response(hits))
+        self.assertEqual([json.loads(s) for s in sources], [hits[0]['_source']])
+        self.assertEqual(sort, [0.5, 'a'])
+        self.assertEqual(response['hits']['hits'], [])
+        self.assertEqual(response['took'], 3)
+
+    def testSplitRawHitsMulti(self):
+        hits = [{'_source': {'id': str(i), 'nested': {'list': [{'a': i}, {'b': [i]}]}}, 'sort': [i, str(i)]}
+                for i in range(3)]
+        response, sources, sort = split_raw_hits(_raw_response(hits))
+        self.assertEqual([json.loads(s) for s in sources], [h['_source'] for h in hits])
+        self.assertEqual(sort, [2, '2'])
+
+    def testSplitRawHitsWithoutSort(self):
+        hits = [{'_source': {'id': str(i)}} for i in range(2)]
+        _, sources, sort = split_raw_hits(_raw_response(hits))
+        self.assertEqual([json.loads(s) for s in sources], [h['_source'] for h in hits])
+        self.assertIsNone(sort)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,9 @@
+import os
+import shutil
+import tempfile
 import unittest, json
 from tests import GenericTestCase
+from app.common.knowndrug import KnownDrugStore
 
 import pytest
 from config import Config
@@ -312,6 +316,62 @@ class EvidenceTestCase(GenericTestCase):
         self.assertEqual(response['data'],[])
         self.assertEqual(response['total'], 0)
 
+    def testEvidenceFilterUniprotKeyword(self):
+        response = self._make_request('/platform/public/evidence/filter',
+                                      data={'uniprotkw': 'Proto-oncogene',
+                                            'size': 10},
+                                      token=self._AUTO_GET_TOKEN)
+        self.assertTrue(response.status_code == 200)
+        json_response = json.loads(response.data.decode('utf-8'))
+        self.assertGreater(json_response['total'], 0)
+
+    def testKnownDrugSingleTarget(self):
+        target = 'ENSG00000157764'
+        response = self._make_request('/platform/public/evidence/known_drug',
+                                      data={'target': target},
+                                      token=self._AUTO_GET_TOKEN)
+        self.assertTrue(response.status_code == 200)
+        json_response = json.loads(response.data.decode('utf-8'))
+        self.assertGreater(len(json_response['data']), 0)
+        for row in json_response['data']:
+            self.assertEqual(row['target_id'], target)
+        self.assertIn('unique_drugs', json_response['facets'])
+        self.assertIn('clinical_trials', json_response['facets'])
+
+    def testKnownDrugStoreMatchesElasticsearch(self):
+        target = 'ENSG00000157764'
+        disease = 'EFO_0000756'
+        es = self.app.extensions['esquery']
+
+        class SingleEntities(object):
+            '''the test index, enumerating only the entities of the test'''
+            def get_known_drug_entities(self):
+                return [(KnownDrugStore.TARGET, target), (KnownDrugStore.DISEASE, disease)]
+
+            def compute_known_drug_summary(self, **kwargs):
+                return es.compute_known_drug_summary(**kwargs)
+
+        directory = tempfile.mkdtemp()
+        previous_store = es.known_drug_store
+        try:
+            store = KnownDrugStore.build(SingleEntities(), path=os.path.join(directory, KnownDrugStore.FILENAME))
+            for data in [{'target': target}, {'disease': disease}]:
+                data['no_cache'] = True
+                responses = []
+                for known_drug_store in [None, store]:
+                    es.known_drug_store = known_drug_store
+                    response = self._make_request('/platform/public/evidence/known_drug',
+                                                  data=data,
+                                                  token=self._AUTO_GET_TOKEN)
+                    self.assertTrue(response.status_code == 200)
+                    json_response = json.loads(response.data.decode('utf-8'))
+                    responses.append((json_response['data'], json_response['facets']))
+                self.assertGreater(len(responses[0][0]), 0)
+                self.assertEqual(responses[0], responses[1])
+        finally:
+            es.known_drug_store = previous_store
+            shutil.rmtree(directory)
+
 
 
 
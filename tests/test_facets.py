@@ -0,0 +1,109 @@
+import time
+import types
+import unittest
+
+import gevent
+from elasticsearch.exceptions import ConnectionTimeout
+
+from app.common.elasticsearchclient import esQuery, canonical_json
+
+__author__ = 'andreap'
+
+
+class StubCache(object):
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.values[key] = value
+
+
+class StubHandler(object):
+    '''answers each facet group after `delay` seconds, unless it is told to time out or fail'''
+
+    def __init__(self, timed_out=(), failing=(), delay=0.):
+        self.timed_out = set(timed_out)
+        self.failing = set(failing)
+        self.delay = delay
+        self.searches = []
+
+    def search(self, index, body, request_timeout, request_cache):
+        self.searches.append((sorted(body['aggs']), request_timeout))
+        gevent.sleep(self.delay)
+        aggs = set(body['aggs'])
+        if aggs & self.failing:
+            raise ConnectionTimeout('TIMEOUT', 'read timed out', None)
+        return {'timed_out': bool(aggs & self.timed_out),
+                'aggregations': dict((agg, {'buckets': [{'key': agg, 'doc_count': 1}]}) for agg in body['aggs'])}
+
+
+def _body(*aggs):
+    return {'query': {'match_all': {}},
+            'size': 0,
+            'aggs': dict((agg, {'terms': {'field': agg}}) for agg in aggs)}
+
+
+class FacetsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.es = types.InstanceType(esQuery)
+        self.es._index_association = 'association-data'
+        self.es.cache = StubCache()
+        self.bodies = [_body('direct', 'datatype'), _body('go'), _body('pathway')]
+
+    def testFailingGroupOnlyMarksItsFacets(self):
+        self.es.handler = StubHandler(failing=['go'])
+        aggregations, incomplete = self.es._cached_facets(self.bodies, request_timeouts=[15, 25, 25],
+                                                          allow_partial=True)
+        self.assertEqual(sorted(aggregations), ['datatype', 'direct', 'pathway'])
+        self.assertEqual(incomplete, ['go'])
+        # each group is sent on its own, with its own timeout
+        self.assertEqual(sorted(self.es.handler.searches),
+                         [(['datatype', 'direct'], 15), (['go'], 25), (['pathway'], 25)])
+        # only the complete groups are cached
+        self.assertEqual(sorted(self.es.cache.values),
+                         sorted('facets:association-data:%s' % canonical_json(body)
+                                for body in [self.bodies[0], self.bodies[2]]))
+
+    def testTimedOutGroupKeepsPartialBuckets(self):
+        self.es.handler = StubHandler(timed_out=['pathway'])
+        aggregations, incomplete = self.es._cached_facets(self.bodies, allow_partial=True)
+        self.assertEqual(sorted(aggregations), ['datatype', 'direct', 'go', 'pathway'])
+        self.assertEqual(incomplete, ['pathway'])
+        self.assertEqual(len(self.es.cache.values), 2)
+
+    def testGroupsRunConcurrently(self):
+        self.es.handler = StubHandler(delay=0.2)
+        start = time.time()
+        aggregations, incomplete = self.es._cached_facets(self.bodies, allow_partial=True)
+        self.assertLess(time.time() - start, 0.2 * len(self.bodies))
+        self.assertEqual(incomplete, [])
+        self.assertEqual(len(aggregations), 4)
+
+    def testCachedGroupsAreNotSearched(self):
+        self.es.handler = StubHandler()
+        self.es._cached_facets(self.bodies)
+        self.es.handler = StubHandler(failing=['go', 'pathway', 'direct'])
+        aggregations, incomplete = self.es._cached_facets(self.bodies)
+        self.assertEqual(self.es.handler.searches, [])
+        self.assertEqual(len(aggregations), 4)
+        # unless caching is disabled
+        aggregations, incomplete = self.es._cached_facets(self.bodies, no_cache=True, allow_partial=True)
+        self.assertEqual(incomplete, ['datatype', 'direct', 'go', 'pathway'])
+        self.assertEqual(aggregations, {})
+
+    def testFailureRaisesWithoutPartial(self):
+        self.es.handler = StubHandler(failing=['go'])
+        with self.assertRaises(ConnectionTimeout):
+            self.es._cached_facets(self.bodies)
+        self.es.handler = StubHandler(timed_out=['go'])
+        with self.assertRaises(Exception):
+            self.es._cached_facets(self.bodies, no_cache=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
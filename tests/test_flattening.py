@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import collections
+import unittest
+
+from app.common.flattening import FlattenPlan, Flattener, ShapeMismatch, shape_of
+from app.common.results import Result
+
+__author__ = 'andreap'
+
+
+def _evidence(i, source=None):
+    row = {'id': u'evidence%i' % i,
+           'sourceID': u'europepmc',
+           'target': {'id': u'http://identifiers.org/ensembl/ENSG%011i' % i,
+                      'gene_info': {'symbol': u'GENE%i' % i, 'name': u'g\xe8ne %i' % i}},
+           'disease': {'id': u'EFO_%07i' % i,
+                       'efo_info': {'label': 'disease %i' % i, 'path': [[u'EFO_0000616', u'EFO_%07i' % i]]}},
+           'scores': {'association_score': 0.123456789012345678 * i},
+           'evidence': {'is_associated': bool(i % 2),
+                        'year': 2000 + i,
+                        'codes': [u'ECO_0000213', u'ECO_0000205'],
+                        'single': [7],
+                        'missing': None,
+                        'provenance': {'database': {'id': u'EuropePMC', 'version': u'2020'}},
+                        'sentences': [{'text': u'sentence %i' % i}]},
+           'biological_object': {'properties': {'url': u'http://identifiers.org/x/%i' % i}},
+           }
+    if source is not None:
+        row['evidence'][source] = {'value': i}
+    return row
+
+
+class FlatteningTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.result = Result(None)
+
+    def assertSameAsResultFlatten(self, rows, simplify):
+        flattener = Flattener(simplify=simplify)
+        for row in rows:
+            expected = self.result.flatten(row, simplify=simplify)
+            flat = flattener.flatten(row, self.result.flatten)
+            self.assertEqual(flat, expected)
+            self.assertEqual(list(flat), list(expected))
+
+    def testPlanMatchesResultFlatten(self):
+        for simplify in [False, True]:
+            plan = FlattenPlan(_evidence(1), simplify=simplify)
+            for i in range(5):
+                row = _evidence(i)
+                self.assertEqual(plan.flatten(row), self.result.flatten(row, simplify=simplify))
+
+    def testPlanRejectsOtherShapes(self):
+        plan = FlattenPlan(_evidence(1))
+        with self.assertRaises((ShapeMismatch, KeyError)):
+            plan.flatten(_evidence(2, source='source2'))
+        row = _evidence(3)
+        row['disease'] = u'EFO_0000311'
+        with self.assertRaises(ShapeMismatch):
+            plan.flatten(row)
+
+    def testFlattenerMixedShapes(self):
+        rows = [_evidence(i, source='source%i' % (i % 5)) for i in range(30)]
+        rows.append({'id': u'1', 'nested': collections.OrderedDict([('b', 1), ('a', [u'x'])])})
+        rows.append({'id': u'1', 'nested': {'b': 1, 'a': [u'x']}})
+        for simplify in [False, True]:
+            self.assertSameAsResultFlatten(rows, simplify)
+
+    def testFlattenerCompilesRecurringShapes(self):
+        flattener = Flattener()
+        rows = [_evidence(i, source='source%i' % (i % 3)) for i in range(12)]
+        for row in rows:
+            flattener.flatten(row, self.result.flatten)
+        self.assertEqual(len(flattener.plans), 3)
+        self.assertEqual(flattener.compiled, 3)
+
+    def testFlattenerKeepsRecentPlans(self):
+        flattener = Flattener()
+        flattener.MAX_PLANS = 4
+        rows = [_evidence(i, source='source%i' % (i % 10)) for i in range(100)]
+        self.assertSameAsResultFlatten(rows, False)
+        for row in rows:
+            flattener.flatten(row, self.result.flatten)
+        self.assertLessEqual(len(flattener.plans), 4)
+        self.assertLessEqual(flattener.compiled, 4 + len(rows) // flattener.COMPILE_EVERY + 1)
+
+    def testFlatKeysMatchResultFlatten(self):
+        rows = [_evidence(i, source='source%i' % (i % 3)) for i in range(6)]
+        result = Result(None, data=rows)
+        expected = set()
+        for row in rows:
+            expected.update(self.result.flatten(row))
+        self.assertEqual(result._get_flat_keys(), expected - set(Result.NOT_ALLOWED_FIELDS))
+
+    def testShapeOf(self):
+        self.assertEqual(shape_of(_evidence(1)), shape_of(_evidence(2)))
+        self.assertNotEqual(shape_of(_evidence(1)), shape_of(_evidence(1, source='source1')))
+
+
+if __name__ == "__main__":
+    unittest.main()
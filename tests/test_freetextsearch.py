@@ -1,6 +1,9 @@
 import json
+import shutil
+import tempfile
 import unittest
 from tests import GenericTestCase
+from app.common.identifiers import IdentifierIndex
 import pytest
 from config import Config
 pytestmark = pytest.mark.skipif(
@@ -1698,6 +1701,53 @@ class FreeTextSearchTestCase(GenericTestCase):
         for result in json_response['data']:
             self.assertIsNotNone(result)
 
+    def testBestHitSearchMixedIdentifiersKeepOrder(self):
+        searchphrases = ['BRAF', 'ENSG00000157764', 'P15056', 'breast carcinom', 'ESR1']
+        es = self.app.extensions['esquery']
+
+        class BrafIdentifiers(object):
+            '''the test index, enumerating only the identifiers of BRAF'''
+            IDENTIFIER_FIELDS = es.IDENTIFIER_FIELDS
+
+            def get_search_identifiers(self, fields):
+                return [identifiers for identifiers in es.get_search_identifiers(fields)
+                        if identifiers[0] == 'ENSG00000157764']
+
+        local_data_path = Config.LOCAL_DATA_PATH
+        previous_index = es.identifier_index
+        Config.LOCAL_DATA_PATH = tempfile.mkdtemp()
+        try:
+            index = IdentifierIndex.build(BrafIdentifiers())
+            self.assertEqual(index.resolve('p15056')[0], 'ENSG00000157764')
+            responses = []
+            for identifier_index in [None, index]:
+                es.identifier_index = identifier_index
+                response = self._make_request('/platform/private/besthitsearch',
+                                              data=json.dumps({
+                                                  'q': searchphrases,
+                                                  'no_cache': True,
+                                                  'highlight': True,
+                                              }, ),
+                                              content_type='application/json',
+                                              method='POST',
+                                              token=self._AUTO_GET_TOKEN)
+
+                self.assertTrue(response.status_code == 200)
+                json_response = json.loads(response.data.decode('utf-8'))
+
+                self.assertEqual([result['q'] for result in json_response['data']], searchphrases)
+                for result in json_response['data'][:3]:
+                    self.assertEqual(result['id'], 'ENSG00000157764')
+                    self.assertTrue(result['exact'])
+                responses.append([(result['id'], result.get('score'), result.get('highlight'))
+                                  for result in json_response['data']])
+            # scores and highlights of the resolved phrases are the ones of the full text query
+            self.assertEqual(responses[0], responses[1])
+        finally:
+            es.identifier_index = previous_index
+            shutil.rmtree(Config.LOCAL_DATA_PATH)
+            Config.LOCAL_DATA_PATH = local_data_path
+
     #@unittest.skip("testAsthma")
     def testAsthma(self):
         response= self._make_request('/platform/public/search',
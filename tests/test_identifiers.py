@@ -0,0 +1,112 @@
+import shutil
+import tempfile
+import types
+import unittest
+
+from app.common.elasticsearchclient import esQuery
+from app.common.identifiers import IdentifierIndex
+from config import Config
+
+__author__ = 'andreap'
+
+
+class StubQuery(object):
+    IDENTIFIER_FIELDS = ['name', 'id', 'approved_symbol', 'symbol_synonyms', 'uniprot_accessions']
+
+    def get_search_identifiers(self, fields):
+        self.fields = fields
+        yield ('ENSG00000157764', 'target', {'id': [u'ENSG00000157764'],
+                                            'approved_symbol': [u'BRAF'],
+                                            'symbol_synonyms': [u'BRAF1', u'B-RAF1'],
+                                            'uniprot_accessions': [u'P15056']})
+        yield ('ENSG00000091831', 'target', {'id': [u'ENSG00000091831'],
+                                            'approved_symbol': [u'ESR1'],
+                                            'symbol_synonyms': [u'ESR', u'NR3A1', u'shared']})
+        yield ('EFO_0000305', 'disease', {'id': [u'EFO_0000305'],
+                                         'name': [u'breast carcinoma', u'ESR'],
+                                         'symbol_synonyms': [u'SHARED']})
+
+
+def _response(doc_id=None, score=1.):
+    hits = []
+    if doc_id is not None:
+        hits.append({'_id': doc_id, '_score': score, '_source': {'id': doc_id},
+                     'highlight': {'approved_symbol': [u'<em>%s</em>' % doc_id]}})
+    return {'hits': {'total': {'value': len(hits), 'relation': 'eq'}, 'hits': hits}}
+
+
+class IdentifierIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._local_data_path = Config.LOCAL_DATA_PATH
+        Config.LOCAL_DATA_PATH = tempfile.mkdtemp()
+        self.stub = StubQuery()
+        self.index = IdentifierIndex.build(self.stub)
+
+    def tearDown(self):
+        shutil.rmtree(Config.LOCAL_DATA_PATH)
+        Config.LOCAL_DATA_PATH = self._local_data_path
+
+    def testBuild(self):
+        self.assertEqual(self.stub.fields, StubQuery.IDENTIFIER_FIELDS)
+        self.assertEqual(self.index.type_names, ['target', 'disease'])
+        # ESR and shared belong to two documents each
+        self.assertEqual(len(self.index.keys), 10)
+        self.assertEqual(list(self.index.keys), sorted(self.index.keys))
+
+    def testResolveUniqueKeys(self):
+        self.assertEqual(self.index.resolve(u'BRAF'), ('ENSG00000157764', 'target', 'approved_symbol'))
+        self.assertEqual(self.index.resolve(' braf '), ('ENSG00000157764', 'target', 'approved_symbol'))
+        self.assertEqual(self.index.resolve(u'b-raf1'), ('ENSG00000157764', 'target', 'symbol_synonyms'))
+        self.assertEqual(self.index.resolve(u'P15056'), ('ENSG00000157764', 'target', 'uniprot_accessions'))
+        self.assertEqual(self.index.resolve(u'Breast Carcinoma'), ('EFO_0000305', 'disease', 'name'))
+
+    def testResolveSharedAndUnknownKeys(self):
+        self.assertIsNone(self.index.resolve(u'ESR'))
+        self.assertIsNone(self.index.resolve(u'shared'))
+        self.assertIsNone(self.index.resolve(u'breast'))
+        self.assertIsNone(self.index.resolve(u''))
+
+    def _es(self, responses):
+        es = types.InstanceType(esQuery)
+        es.identifier_index = self.index
+        es.queries = []
+
+        def best_hit_query(searchphrases, doc_types, params, doc_ids=None):
+            es.queries.append((list(searchphrases), doc_ids))
+            return {'responses': [responses[phrase](doc_ids[i] if doc_ids else None)
+                                  for i, phrase in enumerate(searchphrases)],
+                    'failed': 0}
+        es._best_hit_query = best_hit_query
+        return es
+
+    def testBestHitSearchFiltersResolvedDocuments(self):
+        es = self._es({'BRAF': lambda doc_id: _response(doc_id, 120.),
+                       'breast': lambda doc_id: _response('EFO_0000305', 3.),
+                       'breast carcinoma': lambda doc_id: _response(doc_id, 150.)})
+        result = es.best_hit_search(['BRAF', 'breast', 'breast carcinoma'], None, size=1)
+        self.assertEqual(es.queries, [(['BRAF', 'breast', 'breast carcinoma'],
+                                       ['ENSG00000157764', None, 'EFO_0000305'])])
+        self.assertEqual([(d['q'], d['id'], d['score'], d['exact']) for d in result.data],
+                         [('BRAF', 'ENSG00000157764', 120., True),
+                          ('breast', 'EFO_0000305', 3., False),
+                          ('breast carcinoma', 'EFO_0000305', 150., True)])
+
+    def testBestHitSearchDocTypeFilter(self):
+        es = self._es({'BRAF': lambda doc_id: _response('ENSG00000157764'),
+                       'breast carcinoma': lambda doc_id: _response(None)})
+        result = es.best_hit_search(['BRAF', 'breast carcinoma'], ['target'], size=1)
+        self.assertEqual(es.queries, [(['BRAF', 'breast carcinoma'], ['ENSG00000157764', None])])
+        self.assertEqual(result.data[1], {'id': None, 'q': 'breast carcinoma'})
+
+    def testBestHitSearchOutOfSync(self):
+        # the resolved document is not in elasticsearch anymore
+        es = self._es({'P15056': lambda doc_id: _response(None if doc_id else 'ENSG00000099999')})
+        result = es.best_hit_search(['P15056'], None, size=1)
+        self.assertEqual(es.queries, [(['P15056'], ['ENSG00000157764']), (['P15056'], None)])
+        self.assertEqual(result.data[0]['id'], 'ENSG00000099999')
+        self.assertFalse(result.data[0]['exact'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ipaddr import IPNetwork
+
+from app.common.ipresolver import IPResolver
+
+__author__ = 'andreap'
+
+
+class IPResolverTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.resolver = IPResolver([(IPNetwork('10.0.0.0/8'), u'INTERNAL'),
+                                    (IPNetwork('10.1.0.0/16'), u'CAMPUS'),
+                                    (IPNetwork('10.1.2.0/24'), u'LAB'),
+                                    (IPNetwork('193.62.192.0/21'), u'EBI'),
+                                    (IPNetwork('2001:630::/32'), u'JANET'),
+                                    (IPNetwork('2001:630:206::/48'), u'SANGER'),
+                                    ])
+
+    def testLen(self):
+        self.assertEqual(len(self.resolver), 6)
+        self.assertEqual(len(IPResolver()), 0)
+
+    def testMostSpecificNetwork(self):
+        self.assertEqual(self.resolver.resolve('10.1.2.3'), u'LAB')
+        self.assertEqual(self.resolver.resolve('10.1.3.3'), u'CAMPUS')
+        self.assertEqual(self.resolver.resolve('10.2.0.1'), u'INTERNAL')
+        self.assertEqual(self.resolver.resolve('10.1.2.255'), u'LAB')
+        self.assertEqual(self.resolver.resolve('10.1.255.255'), u'CAMPUS')
+        self.assertEqual(self.resolver.resolve('193.62.199.255'), u'EBI')
+        self.assertEqual(self.resolver['10.1.2.3/32'], u'LAB')
+
+    def testNoMatch(self):
+        self.assertEqual(self.resolver.resolve('9.255.255.255'), IPResolver.DEFAULT)
+        self.assertEqual(self.resolver.resolve('11.0.0.0'), IPResolver.DEFAULT)
+        self.assertEqual(self.resolver.resolve('193.62.200.0'), IPResolver.DEFAULT)
+        self.assertEqual(self.resolver.resolve('2001:631::1'), IPResolver.DEFAULT)
+        self.assertEqual(IPResolver().resolve('127.0.0.1'), 'PUBLIC')
+
+    def testIPv6(self):
+        self.assertEqual(self.resolver.resolve('2001:630:206::1'), u'SANGER')
+        self.assertEqual(self.resolver.resolve('2001:630:1::1'), u'JANET')
+
+    def testFromFile(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'ip_list.csv')
+            with open(path, 'w') as f:
+                f.write('ip,org\n10.0.0.0/8,INTERNAL\n10.1.0.0/16,CAMPUS\n2001:630::/32,JANET\n')
+            resolver = IPResolver.from_file(path)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(len(resolver), 3)
+        self.assertEqual(resolver.resolve('10.1.0.1'), u'CAMPUS')
+        self.assertEqual(resolver.resolve('2001:630::1'), u'JANET')
+
+
+if __name__ == "__main__":
+    unittest.main()
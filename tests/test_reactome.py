@@ -0,0 +1,77 @@
+import copy
+import shutil
+import tempfile
+import types
+import unittest
+
+from app.common.elasticsearchclient import esQuery
+from app.common.reactome import ReactomeIndex
+from config import Config
+
+__author__ = 'andreap'
+
+NODES = [('R-HSA-162582', u'Signal Transduction', True),
+         ('R-HSA-5683057', u'MAPK family signaling cascades', False),
+         ('R-HSA-1643685', u'Disease', True),
+         ('R-HSA-9999999', None, False)]
+
+
+class StubQuery(object):
+
+    def get_reactome_nodes(self):
+        return NODES
+
+    def _cached_search(self, index, body):
+        hits = [{'_id': code, '_source': {'label': label, 'is_root': is_root}}
+                for code, label, is_root in NODES if code in body['query']['ids']['values']]
+        return {'hits': {'total': {'value': len(hits)}, 'hits': hits}}
+
+
+class ReactomeIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._local_data_path = Config.LOCAL_DATA_PATH
+        Config.LOCAL_DATA_PATH = tempfile.mkdtemp()
+        self.index = ReactomeIndex.build(StubQuery())
+
+    def tearDown(self):
+        shutil.rmtree(Config.LOCAL_DATA_PATH)
+        Config.LOCAL_DATA_PATH = self._local_data_path
+
+    def testLabelsAndTypes(self):
+        self.assertEqual(self.index.get_label('R-HSA-162582'), u'Signal Transduction')
+        self.assertEqual(self.index.get_label(u'r-hsa-5683057'), u'MAPK family signaling cascades')
+        self.assertEqual(self.index.get_label('R-HSA-9999999'), u'R-HSA-9999999')
+        self.assertEqual(self.index.get_type('R-HSA-162582'), ReactomeIndex.PATHWAY_TYPE)
+        self.assertEqual(self.index.get_type('R-HSA-5683057'), ReactomeIndex.PATHWAY)
+        self.assertIsNone(self.index.get_label('R-HSA-0'))
+        self.assertIsNone(self.index.get_type('R-HSA-0'))
+
+    def testDecoratedLikeElasticsearch(self):
+        buckets = [{'key': code, 'doc_count': 1} for code, _, _ in NODES] + [{'key': 'R-HSA-0', 'doc_count': 1}]
+        stub = StubQuery()
+        es = types.InstanceType(esQuery)
+        es._index_reactome = 'reactome'
+        es._cached_search = stub._cached_search
+
+        decorated = []
+        for index in [None, self.index]:
+            es.reactome_index = index
+            labels, types_ = {}, {}
+            if index is None:
+                labels, types_ = es._get_reactome_nodes_for_ids([bucket['key'] for bucket in buckets])
+            copied = copy.deepcopy(buckets)
+            for bucket in copied:
+                es._decorate_pathway_bucket(bucket, labels, types_)
+            decorated.append(copied)
+
+        self.assertEqual(decorated[0], decorated[1])
+        self.assertEqual(decorated[1][0], {'key': 'R-HSA-162582', 'doc_count': 1,
+                                           'label': u'Signal Transduction', 'type': 'pathway_type'})
+        self.assertEqual(decorated[1][1]['type'], 'pathway')
+        # unknown pathways are labelled with their code and have no type
+        self.assertEqual(decorated[1][4], {'key': 'R-HSA-0', 'doc_count': 1, 'label': 'R-HSA-0'})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import shutil
+import tempfile
+import types
+import unittest
+
+from app.common.elasticsearchclient import esQuery
+from app.common.results import EmptyPaginatedResult
+from app.common.spelling import SpellingIndex, edit_distance, _deletes
+from config import Config
+
+__author__ = 'andreap'
+
+
+class StubQuery(object):
+
+    def get_search_words(self):
+        return [u'asthma', u'Asthma attack', u'asthma severe', u'astrocytoma',
+                u'breast carcinoma', u'breast cancer', u'bronchitis',
+                u'BRAF', u'BRCA1', u'BRCA2', u'carcinoma', u'carcinoid tumor']
+
+
+class SpellingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._local_data_path = Config.LOCAL_DATA_PATH
+        Config.LOCAL_DATA_PATH = tempfile.mkdtemp()
+        self.index = SpellingIndex.build(StubQuery())
+
+    def tearDown(self):
+        shutil.rmtree(Config.LOCAL_DATA_PATH)
+        Config.LOCAL_DATA_PATH = self._local_data_path
+
+    def testDeletes(self):
+        self.assertEqual(_deletes(u'abc', 1), set([u'abc', u'bc', u'ac', u'ab']))
+        self.assertEqual(_deletes(u'abc', 2), set([u'abc', u'bc', u'ac', u'ab', u'a', u'b', u'c']))
+
+    def testEditDistance(self):
+        self.assertEqual(edit_distance(u'asthma', u'asthma', 2), 0)
+        self.assertEqual(edit_distance(u'astma', u'asthma', 2), 1)
+        self.assertEqual(edit_distance(u'asthmma', u'asthma', 2), 1)
+        self.assertEqual(edit_distance(u'asthna', u'asthma', 2), 1)
+        self.assertEqual(edit_distance(u'ashtma', u'asthma', 2), 1)
+        self.assertEqual(edit_distance(u'ashtna', u'asthma', 2), 2)
+        self.assertEqual(edit_distance(u'asth', u'asthma', 2), 2)
+        self.assertEqual(edit_distance(u'as', u'asthma', 2), 3)
+        self.assertEqual(edit_distance(u'zzzzzz', u'asthma', 2), 3)
+
+    def testContains(self):
+        self.assertTrue(self.index.contains(u'asthma'))
+        self.assertTrue(self.index.contains(u'brca1'))
+        self.assertFalse(self.index.contains(u'astma'))
+        # shares the indexed prefix of carcinoma
+        self.assertFalse(self.index.contains(u'carcinomas'))
+
+    def testDistanceOne(self):
+        self.assertEqual(self.index.suggest_word(u'astma'), [u'asthma'])
+        self.assertEqual(self.index.suggest_word(u'brest'), [u'breast'])
+        self.assertEqual(self.index.suggest_word(u'cacner'), [u'cancer'])
+
+    def testDistanceTwo(self):
+        self.assertEqual(self.index.suggest_word(u'asmha'), [u'asthma'])
+        self.assertEqual(self.index.suggest_word(u'carcinomaaa'), [u'carcinoma'])
+
+    def testRanking(self):
+        # by distance first, then by the number of texts containing the word
+        self.assertEqual(self.index.suggest_word(u'brca3'), [u'brca1', u'brca2', u'braf'])
+        self.assertEqual(self.index.suggest_word(u'brca3', size=2), [u'brca1', u'brca2'])
+        self.assertEqual(self.index.suggest_word(u'astha'), [u'asthma'])
+        self.assertEqual(self.index.suggest_word(u'carcinomb'), [u'carcinoma', u'carcinoid'])
+
+    def testUnknownWords(self):
+        self.assertEqual(self.index.suggest_word(u'asthma'), [])
+        self.assertEqual(self.index.suggest_word(u'xyzzy'), [])
+        self.assertEqual(self.index.suggest_word(u'zsthma'), [])
+        self.assertEqual(self.index.suggest_word(u'aaaaaaaa'), [])
+        self.assertEqual(self.index.suggest_word(u'bra'), [])
+
+    def testSuggestPhrase(self):
+        self.assertEqual(self.index.suggest(u'Brest Cacner'), [u'breast', u'cancer'])
+        self.assertEqual(self.index.suggest(u'breast cancer'), [])
+
+    def testEmptyResultCarriesSuggestions(self):
+        es = types.InstanceType(esQuery)
+        es.spelling_index = self.index
+        es._free_text_query = lambda searchphrase, doc_filter, params: \
+            {'hits': {'total': {'value': 0, 'relation': 'eq'}, 'hits': []}}
+        result = es.free_text_search(u'Astma brest', None)
+        self.assertIsInstance(result, EmptyPaginatedResult)
+        response = result.toDict()
+        self.assertEqual(response['suggest'], [u'asthma', u'breast'])
+        self.assertEqual(response['data'], [])
+        self.assertEqual(response['total'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from app.common import load_tissue_map, TISSUE_MAP_CACHE
+from app.common.snapshots import snapshot_path
+from config import Config
+
+__author__ = 'andreap'
+
+
+class TissueMapTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._local_data_path = Config.LOCAL_DATA_PATH
+        self._tissue_map_url = Config.ES_TISSUE_MAP_URL
+        Config.LOCAL_DATA_PATH = tempfile.mkdtemp()
+        self.maps_path = tempfile.mkdtemp()
+        Config.ES_TISSUE_MAP_URL = os.path.join(self.maps_path, '{}.json')
+
+    def tearDown(self):
+        shutil.rmtree(Config.LOCAL_DATA_PATH)
+        shutil.rmtree(self.maps_path)
+        Config.LOCAL_DATA_PATH = self._local_data_path
+        Config.ES_TISSUE_MAP_URL = self._tissue_map_url
+
+    def _write_map(self, tag, label):
+        with open(Config.ES_TISSUE_MAP_URL.format(tag), 'w') as f:
+            json.dump({'tissues': {'UBERON_0002107': {'efo_code': 'UBERON_0002107', 'label': label}}}, f)
+
+    def testTaggedMapIsCached(self):
+        self._write_map(Config.DATA_VERSION, 'liver')
+        tmap = load_tissue_map()
+        self.assertEqual(tmap['codes']['UBERON_0002107']['label'], 'liver')
+        self.assertTrue(os.path.exists(snapshot_path(TISSUE_MAP_CACHE)))
+
+        # read from the cache from now on
+        os.remove(Config.ES_TISSUE_MAP_URL.format(Config.DATA_VERSION))
+        self.assertEqual(load_tissue_map(), tmap)
+
+    def testMasterFallbackIsNotCached(self):
+        self._write_map('master', 'master liver')
+        tmap = load_tissue_map()
+        self.assertEqual(tmap['codes']['UBERON_0002107']['label'], 'master liver')
+        self.assertFalse(os.path.exists(snapshot_path(TISSUE_MAP_CACHE)))
+
+        # the tagged map is picked up once it is published
+        self._write_map(Config.DATA_VERSION, 'liver')
+        self.assertEqual(load_tissue_map()['codes']['UBERON_0002107']['label'], 'liver')
+        self.assertTrue(os.path.exists(snapshot_path(TISSUE_MAP_CACHE)))
+
+    def testNotAvailable(self):
+        self.assertIsNone(load_tissue_map())
+        self.assertFalse(os.path.exists(snapshot_path(TISSUE_MAP_CACHE)))
+
+
+if __name__ == "__main__":
+    unittest.main()
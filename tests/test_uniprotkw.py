@@ -0,0 +1,95 @@
+import shutil
+import tempfile
+import types
+import unittest
+
+from flask import Flask
+
+from app.common.elasticsearchclient import esQuery, BooleanFilterOperator
+from app.common.uniprotkw import UniprotKeywordIndex
+from config import Config
+
+__author__ = 'andreap'
+
+
+class StubQuery(object):
+
+    def get_gene_uniprot_keywords(self):
+        return [('ENSG00000157764', [u'Kinase', u'ATP-binding', u'Kinase']),
+                ('ENSG00000091831', [u'Receptor', u'DNA-binding']),
+                ('ENSG00000141510', [u'DNA-binding', u'Tumor suppressor']),
+                ('ENSG00000012048', [u'DNA-binding', u'Tumor suppressor', u'ATP-binding'])]
+
+    def store_uniprot_kw_lookup(self, documents):
+        self.lookup = dict(documents)
+        return 'uniprot-kw-lookup'
+
+
+class UniprotKeywordTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._local_data_path = Config.LOCAL_DATA_PATH
+        Config.LOCAL_DATA_PATH = tempfile.mkdtemp()
+        self.stub = StubQuery()
+        self.index = UniprotKeywordIndex.build(self.stub)
+        self.es = types.InstanceType(esQuery)
+        self.es.uniprot_kw_index = self.index
+        self.app = Flask(__name__)
+
+    def tearDown(self):
+        shutil.rmtree(Config.LOCAL_DATA_PATH)
+        Config.LOCAL_DATA_PATH = self._local_data_path
+
+    def _filter(self, kw, bol, threshold):
+        self.app.config['UNIPROT_KW_LOOKUP_THRESHOLD'] = threshold
+        with self.app.app_context():
+            return self.es._get_complex_uniprot_kw_filter(kw, bol)
+
+    def testBuild(self):
+        self.assertEqual(self.index.count(u'DNA-binding'), 3)
+        self.assertEqual(self.index.count(u'Kinase'), 1)
+        self.assertEqual(self.index.count(u'Unknown'), 0)
+        self.assertEqual(self.stub.lookup[UniprotKeywordIndex.lookup_id(u'Tumor suppressor')],
+                         {'keyword': u'Tumor suppressor', 'genes': ['ENSG00000141510', 'ENSG00000012048']})
+        self.assertEqual(self.index.lookup_index, 'uniprot-kw-lookup')
+
+    def testGetGenes(self):
+        self.assertEqual(self.index.get_genes([u'Kinase', u'Receptor', u'Unknown']),
+                         ['ENSG00000157764', 'ENSG00000091831'])
+        self.assertEqual(self.index.get_genes([u'DNA-binding', u'Tumor suppressor'], all_keywords=True),
+                         ['ENSG00000141510', 'ENSG00000012048'])
+        self.assertEqual(self.index.get_genes([u'DNA-binding', u'Unknown'], all_keywords=True), [])
+        self.assertEqual(self.index.get_genes([u'Unknown']), [])
+
+    def testLocalLookup(self):
+        kw = [u'Kinase', u'Receptor']
+        self.assertEqual(self._filter(kw, BooleanFilterOperator.OR, 1024),
+                         {'terms': {'target.id': ['ENSG00000157764', 'ENSG00000091831']}})
+        self.assertEqual(self._filter([u'DNA-binding', u'ATP-binding'], BooleanFilterOperator.AND, 1024),
+                         {'terms': {'target.id': ['ENSG00000012048']}})
+        self.assertEqual(self._filter(kw, BooleanFilterOperator.AND, 1024),
+                         {'terms': {'target.id': []}})
+        self.assertEqual(self._filter(kw, BooleanFilterOperator.NOT, 1024),
+                         {'bool': {'must_not': [{'terms': {'target.id': ['ENSG00000157764']}},
+                                                {'terms': {'target.id': ['ENSG00000091831']}}]}})
+        self.assertEqual(self._filter([u'Unknown'], BooleanFilterOperator.OR, 1024), {})
+        self.assertEqual(self._filter([], BooleanFilterOperator.OR, 1024), {})
+
+    def testTermsLookup(self):
+        kw = [u'DNA-binding', u'ATP-binding']
+
+        def lookup(keyword):
+            return {'terms': {'target.id': {'index': 'uniprot-kw-lookup',
+                                            'id': UniprotKeywordIndex.lookup_id(keyword),
+                                            'path': 'genes'}}}
+
+        for bol in [BooleanFilterOperator.OR, BooleanFilterOperator.AND, BooleanFilterOperator.NOT]:
+            self.assertEqual(self._filter(kw, bol, 4),
+                             {'bool': {bol: [lookup(u'DNA-binding'), lookup(u'ATP-binding')]}})
+        # at the threshold the genes are still sent
+        self.assertEqual(self._filter(kw, BooleanFilterOperator.AND, 5),
+                         {'terms': {'target.id': ['ENSG00000012048']}})
+
+
+if __name__ == "__main__":
+    unittest.main()